@@ -1,351 +1,410 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from faker import Faker
-import random
-
-# Set seed for reproducibility
-fake = Faker()
-Faker.seed(0)
-np.random.seed(42)
-# Define size of table
-num_accounts = 500  # Adjust as needed
-
-#BUIDLING THE PARTY TABLE
-# Generate 500 party_ids
-party_ids = np.random.choice(range(100000, 999999), size=num_accounts, replace=False)
-
-# Generate random names
-names = [f"Name_{i}" for i in party_ids]
-
-# Generate unique emails
-emails = [f"user{i}@example.com" for i in party_ids]
-
-# Randomly assign party_type
-party_types = np.random.choice(['customer', 'merchant'], size=num_accounts, replace=True)
-
-# Random created_at datetime within the last 2 years
-def random_datetime(start, end):
-    return start + timedelta(
-        seconds=random.randint(0, int((end - start).total_seconds()))
-    )
-
-start_date = datetime.now() - timedelta(days=730)
-end_date = datetime.now()
-created_at = [random_datetime(start_date, end_date) for _ in range(500)]
-
-# Create DataFrame
-party_df = pd.DataFrame({
-    'party_id': party_ids,
-    'name': names,
-    'email': emails,
-    'party_type': party_types,
-    'created_at': created_at
-})
-
-# Preview
-print(party_df.head())
-
-#save to CSV
-party_df.to_csv("party_table.csv", index=False)
-
-import os
-print("Saved to:", os.path.abspath("party_data.csv"))
-
-# BUILDING THE CUSTOMER TABLE
-#Filter for customers
-customer_df = party_df[party_df["party_type"] == "customer"].copy()
-
-#Add customer-specific fields
-customer_df["dob"] = [fake.date_of_birth(minimum_age=18, maximum_age=70) for _ in range(len(customer_df))]
-customer_df["phone_number"] = [fake.phone_number() for _ in range(len(customer_df))]
-customer_df["registration_date"] = [fake.date_between(start_date='-2y', end_date='today') for _ in range(len(customer_df))]
-
-#Keep only required columns
-customer_df = customer_df[["party_id", "dob", "phone_number", "registration_date"]]
-#Save to CSV
-customer_df.to_csv("customer_data.csv", index=False)
-
-print("Party and Customer tables saved as 'party_table.csv' and 'customer_data.csv'.")
-
-#BUILDING THE MERCHANT TABLE
-#Filter for merchants
-merchant_df = party_df[party_df["party_type"] == "merchant"].copy()
-
-#Define some example merchant category codes
-category_codes = [
-    'electronics', 'clothing', 'food', 'books', 'beauty',
-    'furniture', 'sports', 'automotive', 'health', 'travel'
-]
-
-#Assign random category codes
-merchant_df["category_code"] = np.random.choice(category_codes, size=len(merchant_df))
-merchant_df["category_code"] = merchant_df["category_code"].str[:10]  #enforce VARCHAR(10)
-
-
-#Keep only required columns
-merchant_df = merchant_df[["party_id", "category_code"]]
-
-#Save to CSV
-merchant_df.to_csv("merchant_data.csv", index=False)
-
-print("Merchant table saved as 'merchant_data.csv'.")
-
-
-# Generate unique account IDs (6-digit numbers)
-account_ids = np.random.choice(range(100000, 999999), size=num_accounts, replace=False)
-
-# Generate random opened dates (within last 3 years)
-start_date = datetime.now() - timedelta(days=3*365)
-opened_dates = [fake.date_between(start_date=start_date, end_date='today') for _ in range(num_accounts)]
-
-# Define possible statuses
-statuses = ['active', 'suspended', 'closed', 'pending']
-status_values = np.random.choice(statuses, size=num_accounts)
-
-# Build DataFrame
-account_df = pd.DataFrame({
-    'account_id': account_ids,
-    'opened_date': opened_dates,
-    'status': status_values
-})
-
-#Save to CSV
-account_df.to_csv("account_data.csv", index=False)
-
-# BUILDING THE CUSTOMERACCOUNT TABLE
-#Filter only customer party_ids
-customer_ids = customer_df["party_id"].values
-
-#You can choose how many relationships to create.
-#For simplicity, assume each customer has 1-3 accounts (with reuse allowed)
-relationship_count = 600  # total number of customer-account links
-
-#Sample customer and account IDs
-customer_account_links = pd.DataFrame({
-    "party_id": np.random.choice(customer_ids, size=relationship_count, replace=True),
-    "account_id": np.random.choice(account_ids, size=relationship_count, replace=True),
-    "role": np.random.choice(["primary", "joint"], size=relationship_count)
-})
-
-#Drop duplicates if a customer is accidentally assigned the same account more than once with the same role
-customer_account_links = customer_account_links.drop_duplicates(subset=["party_id", "account_id"])
-
-# Save to CSV
-customer_account_links.to_csv("customer_account_data.csv", index=False)
-print("CustomerAccount table saved as 'customer_account_data.csv'.")
-
-# BUILDING THE CARD TABLE
-#Load account_ids from CustomerAccount table
-customer_account_df = pd.read_csv("customer_account_data.csv")
-account_ids_from_links = customer_account_df["account_id"].unique()
-
-#Define number of cards
-num_cards = 700  # adjust as needed
-
-#Generate unique card IDs
-def generate_unique_card_ids(n):
-    card_ids = set()
-    while len(card_ids) < n:
-        card_id = random.randint(10**15, 10**16 - 1)  # ensures it's 16 digits
-        card_ids.add(card_id)
-    return list(card_ids)
-card_ids = generate_unique_card_ids(num_cards)
-
-#Randomly select account_ids for cards
-card_account_ids = np.random.choice(account_ids_from_links, size=num_cards, replace=True)
-
-#Generate issue dates within the last 3 years
-issue_dates = [fake.date_between(start_date='-3y', end_date='today') for _ in range(num_cards)]
-
-#Generate expiration dates 3–5 years after issue
-expiration_dates = [
-    issue_date + timedelta(days=random.randint(365*3, 365*5))
-    for issue_date in issue_dates
-]
-
-#Define card statuses
-card_statuses = ['active', 'blocked', 'expired']
-statuses = np.random.choice(card_statuses, size=num_cards)
-
-#Build DataFrame
-card_df = pd.DataFrame({
-    'card_id': card_ids,
-    'account_id': card_account_ids,
-    'issue_date': issue_dates,
-    'expiration_date': expiration_dates,
-    'status': statuses
-})
-
-#Save to CSV
-card_df.to_csv("card_data.csv", index=False)
-print("Card table saved as 'card_data.csv'.")
-
-#BUILDING THE TRANSACTION TABLE
-#Number of transactions
-num_transactions = 2000
-
-#Get list of party_ids
-party_ids = party_df["party_id"].tolist()
-
-#Generate transaction IDs
-transaction_ids = list(range(1, num_transactions + 1))
-
-#Generate payer and payee IDs (ensuring they're different)
-payer_ids = []
-payee_ids = []
-
-while len(payer_ids) < num_transactions:
-    payer = np.random.choice(party_ids)
-    payee = np.random.choice(party_ids)
-    if payer != payee:
-        payer_ids.append(payer)
-        payee_ids.append(payee)
-
-#Generate random amounts between 1 and 10,000 (2 decimal places)
-amounts = np.round(np.random.uniform(1.00, 10000.00, size=num_transactions), 2)
-
-#Set currency codes
-currencies = ['USD', 'EUR', 'GBP', 'JPY', 'CAD']
-currency_values = np.random.choice(currencies, size=num_transactions)
-
-#Generate timestamps in the past 2 years
-start_date = datetime.now() - timedelta(days=730)
-timestamps = [fake.date_time_between(start_date=start_date, end_date='now') for _ in range(num_transactions)]
-
-#Generate is_fraud (e.g., 5% fraud rate)
-is_fraud_flags = np.random.choice([False, True], size=num_transactions, p=[0.95, 0.05])
-
-#Fraud score: higher if fraud, lower otherwise
-fraud_scores = [
-    round(np.random.uniform(70, 100), 2) if is_fraud else round(np.random.uniform(0, 50), 2)
-    for is_fraud in is_fraud_flags
-]
-
-#Build DataFrame
-transaction_df = pd.DataFrame({
-    'transaction_id': transaction_ids,
-    'payer_party_id': payer_ids,
-    'payee_party_id': payee_ids,
-    'amount': amounts,
-    'currency': currency_values,
-    'timestamp': timestamps,
-    'is_fraud': is_fraud_flags,
-    'fraud_score': fraud_scores
-})
-
-#Save to CSV
-transaction_df.to_csv("transaction_data.csv", index=False)
-
-print("Transaction table saved as 'transaction_data.csv'.")
-
-#BUILDING THE DEVICE TABLE
-num_devices = 1000
-device_ids = list(range(1, num_devices + 1))
-device_types = ['mobile', 'desktop', 'tablet']
-oses = ['Windows', 'macOS', 'Linux', 'iOS', 'Android']
-ip_addresses = [fake.ipv4() for _ in range(num_devices)]
-fingerprints = [fake.sha1() for _ in range(num_devices)]
-
-device_df = pd.DataFrame({
-    'device_id': device_ids,
-    'device_type': np.random.choice(device_types, num_devices),
-    'os': np.random.choice(oses, num_devices),
-    'ip_address': ip_addresses,
-    'browser_fingerprint': fingerprints
-})
-device_df.to_csv("device_data.csv", index=False)
-print("Device table saved as 'device_data.csv'.")
-
-#BUILDING THE LOCATION TABLE
-num_locations = 500
-location_ids = list(range(1, num_locations + 1))
-latitudes = np.round(np.random.uniform(-90, 90, num_locations), 6)
-longitudes = np.round(np.random.uniform(-180, 180, num_locations), 6)
-cities = [fake.city() for _ in range(num_locations)]
-countries = [fake.country() for _ in range(num_locations)]
-
-location_df = pd.DataFrame({
-    'location_id': location_ids,
-    'latitude': latitudes,
-    'longitude': longitudes,
-    'city': cities,
-    'country': countries
-})
-location_df.to_csv("location_data.csv", index=False)
-print("Location table saved as 'location_data.csv'.")
-
-#BUILDING THE LOGININSTANCE TABLE
-num_logins = 1500
-login_ids = list(range(1, num_logins + 1))
-party_sample = party_df['party_id'].sample(num_logins, replace=True).tolist()
-device_sample = np.random.choice(device_ids, num_logins).tolist()
-location_sample = np.random.choice(location_ids, num_logins).tolist()
-login_times = [fake.date_time_between(start_date='-2y', end_date='now') for _ in range(num_logins)]
-success_flags = np.random.choice([True, False], size=num_logins, p=[0.95, 0.05])
-
-login_df = pd.DataFrame({
-    'login_id': login_ids,
-    'party_id': party_sample,
-    'device_id': device_sample,
-    'location_id': location_sample,
-    'timestamp': login_times,
-    'successful': success_flags
-})
-login_df.to_csv("login_instance_data.csv", index=False)
-print("LoginInstance table saved as 'login_instance_data.csv'.")
-
-#BUILDING THE ANALYST TABLE
-num_analysts = 50
-analyst_ids = list(range(1, num_analysts + 1))
-analyst_names = [fake.name() for _ in range(num_analysts)]
-analyst_emails = [fake.email() for _ in range(num_analysts)]
-teams = ['Red', 'Blue', 'Green', 'Yellow']
-analyst_df = pd.DataFrame({
-    'analyst_id': analyst_ids,
-    'name': analyst_names,
-    'email': analyst_emails,
-    'team': np.random.choice(teams, num_analysts)
-})
-analyst_df.to_csv("analyst_data.csv", index=False)
-print("Analyst table saved as 'analyst_data.csv'.")
-
-#BUILDING THE FRAUDALERT TABLE
-num_alerts = 300
-alert_ids = list(range(1, num_alerts + 1))
-sample_transactions = transaction_df[transaction_df['is_fraud'] == True].sample(num_alerts, replace=True)
-generated_by = np.random.choice(['analyst', 'system', 'model'], num_alerts)
-alert_levels = np.random.choice(['low', 'medium', 'high'], num_alerts)
-status_options = ['open', 'dismissed', 'investigated']
-created_ats = [fake.date_time_between(start_date='-1y', end_date='now') for _ in range(num_alerts)]
-
-fraud_alert_df = pd.DataFrame({
-    'alert_id': alert_ids,
-    'transaction_id': sample_transactions['transaction_id'].tolist(),
-    'generated_by': generated_by,
-    'alert_level': alert_levels,
-    'status': np.random.choice(status_options, num_alerts),
-    'created_at': created_ats
-})
-fraud_alert_df.to_csv("fraud_alert_data.csv", index=False)
-print("FraudAlert table saved as 'fraud_alert_data.csv'.")
-
-#BUILDING THE INVESTIGATION TABLE
-num_investigations = 200
-investigation_ids = list(range(1, num_investigations + 1))
-sample_alerts = fraud_alert_df.sample(num_investigations, replace=False)
-analyst_ids_sample = np.random.choice(analyst_ids, size=num_investigations)
-start_dates = [fake.date_between(start_date='-1y', end_date='-30d') for _ in range(num_investigations)]
-end_dates = [start + timedelta(days=random.randint(1, 60)) for start in start_dates]
-conclusions = np.random.choice(['fraudulent', 'legitimate', 'inconclusive'], size=num_investigations)
-
-investigation_df = pd.DataFrame({
-    'investigation_id': investigation_ids,
-    'alert_id': sample_alerts['alert_id'].tolist(),
-    'analyst_id': analyst_ids_sample,
-    'start_date': start_dates,
-    'end_date': end_dates,
-    'conclusion': conclusions
-})
-investigation_df.to_csv("investigation_data.csv", index=False)
-print("Investigation table saved as 'investigation_data.csv'.")
+import os
+import time
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from faker import Faker
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import schema
+
+# Output format: 'parquet' (typed to match bank_fraud.sql, zstd-compressed) or 'csv'
+output_format = 'parquet'
+
+# Rows per table at scale factor 1 (TPC style: SF10 is ten times SF1).
+# SF 0.005 reproduces the original sample: 500 parties, 2000 transactions, 1500 logins.
+base_sizes = {
+    'party_table': 100_000,
+    'account_data': 100_000,
+    'customer_account_data': 120_000,   # links drawn before de-duplication
+    'card_data': 140_000,
+    'transaction_data': 400_000,
+    'device_data': 200_000,
+    'location_data': 100_000,
+    'login_instance_data': 300_000,
+    'analyst_data': 10_000,
+    'fraud_alert_data': 60_000,
+    'investigation_data': 40_000
+}
+default_scale_factor = 0.005
+
+# Faker is only used to fill small pools that rows are then sampled from
+pool_size = 1000
+
+# Tables that can be split into shards generated by separate processes
+sharded_tables = ['transaction_data', 'login_instance_data']
+
+# Enumerated column values
+party_types = ['customer', 'merchant']
+category_codes = ['electronics', 'clothing', 'food', 'books', 'beauty',
+                  'furniture', 'sports', 'automotive', 'health', 'travel']
+account_statuses = ['active', 'suspended', 'closed', 'pending']
+card_statuses = ['active', 'blocked', 'expired']
+currencies = ['USD', 'EUR', 'GBP', 'JPY', 'CAD']
+device_types = ['mobile', 'desktop', 'tablet']
+oses = ['Windows', 'macOS', 'Linux', 'iOS', 'Android']
+teams = ['Red', 'Blue', 'Green', 'Yellow']
+
+def table_sizes(scale_factor):
+    sizes = {table: max(1, int(round(rows * scale_factor))) for table, rows in base_sizes.items()}
+    # A transaction needs a payer and a different payee
+    sizes['party_table'] = max(sizes['party_table'], 2)
+    return sizes
+
+def shard_file_stem(table_name, shard=0, num_shards=1):
+    """File name without extension: <table> for one shard, <table>.part-00003 otherwise"""
+    return table_name if num_shards == 1 else f"{table_name}.part-{shard:05d}"
+
+def save_table(df, table_name, output_dir='.', file_format=None, file_stem=None):
+    """Write a generated table as <table_name>.parquet or .csv and return the file name"""
+    file_format = file_format or output_format
+    file_stem = file_stem or table_name
+    if file_format == 'csv':
+        file_name = os.path.join(output_dir, f"{file_stem}.csv")
+        df.to_csv(file_name, index=False)
+        return file_name
+    file_name = os.path.join(output_dir, f"{file_stem}.parquet")
+    target = schema.arrow_schema(schema.parse_schema()[table_name], list(df.columns))
+    table = pa.Table.from_pandas(df, preserve_index=False).cast(target)
+    # Dictionary-encode only the pooled (categorical) columns; ids and timestamps are near-unique
+    pooled = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    pq.write_table(table, file_name, compression='zstd', use_dictionary=pooled)
+    return file_name
+
+# -------------------
+# Vectorized helpers
+# -------------------
+def table_rng(seed, table_name, shard=0):
+    """Random generator seeded from (global seed, table, shard index).
+
+    Every table and shard gets its own stream, so the output only depends on
+    the seed and the number of shards, never on how many workers ran them.
+    """
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(table_name.encode()), shard]))
+
+def shard_ranges(total_rows, num_shards):
+    """(first_id, rows) of each shard; ids are contiguous across shards"""
+    rows = [total_rows // num_shards + (1 if i < total_rows % num_shards else 0) for i in range(num_shards)]
+    first_ids = np.concatenate(([1], 1 + np.cumsum(rows)[:-1]))
+    return [(int(first_id), n) for first_id, n in zip(first_ids, rows)]
+
+def distinct(values):
+    """Sorted distinct values (a plain sort is much faster than np.unique here)"""
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+def unique_ids(rng, n, low, high):
+    """n distinct random integers in [low, high)"""
+    ids = distinct(rng.integers(low, high, size=int(n * 1.05) + 16))
+    while len(ids) < n:
+        ids = distinct(np.concatenate((ids, rng.integers(low, high, size=n - len(ids) + 16))))
+    return rng.permutation(ids)[:n]
+
+def random_timestamps(rng, n, now, days_back, days_until=0):
+    """n uniform timestamps between now - days_back and now - days_until (second resolution)"""
+    seconds = rng.integers(days_until * 86400, days_back * 86400 + 1, size=n)
+    return now - seconds.astype('timedelta64[s]')
+
+def random_dates(rng, n, today, days_back, days_until=0):
+    """n uniform dates between today - days_back and today - days_until"""
+    return today - rng.integers(days_until, days_back + 1, size=n).astype('timedelta64[D]')
+
+def sample(rng, values, n, p=None):
+    """n values drawn from a pool, as a Categorical so strings are not copied per row"""
+    # Faker pools can repeat a value, and categories have to be unique
+    pool_codes, categories = pd.factorize(np.asarray(values))
+    return pd.Categorical.from_codes(pool_codes[rng.choice(len(values), size=n, p=p)], categories=categories)
+
+_hex_digits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+def random_hex(rng, n, n_bytes):
+    """n random lowercase hex strings of n_bytes bytes (e.g. 20 for a SHA-1)"""
+    raw = rng.integers(0, 256, size=(n, n_bytes), dtype=np.uint8)
+    text = np.empty((n, 2 * n_bytes), dtype=np.uint8)
+    text[:, 0::2] = _hex_digits[raw >> 4]
+    text[:, 1::2] = _hex_digits[raw & 15]
+    # Every string has the same width, so the Arrow offsets are a plain range
+    offsets = np.arange(0, (n + 1) * 2 * n_bytes, 2 * n_bytes, dtype=np.int64)
+    return pa.LargeStringArray.from_buffers(n, pa.py_buffer(offsets), pa.py_buffer(text)).to_pandas()
+
+_octets = pa.array([str(i) for i in range(256)])
+
+def random_ipv4(rng, n):
+    octets = [_octets.take(pa.array(column)) for column in rng.integers(1, 255, size=(4, n))]
+    return pc.binary_join_element_wise(*octets, '.').to_pandas()
+
+def faker_pools(seed):
+    """Pre-sampled Faker values that rows are drawn from instead of per-row Faker calls"""
+    fake = Faker()
+    Faker.seed(seed)
+    return {
+        'phone_number': [fake.phone_number() for _ in range(pool_size)],
+        'city': [fake.city() for _ in range(pool_size)],
+        'country': [fake.country() for _ in range(pool_size)],
+        'name': [fake.name() for _ in range(pool_size)],
+        'email': [fake.email() for _ in range(pool_size)]
+    }
+
+# -------------------
+# Table builders
+# -------------------
+def build_party(rng, n, now):
+    # Original id range was 100000-999999; it grows with the scale factor
+    party_ids = unique_ids(rng, n, 100000, max(999999, 100000 + 10 * n))
+    id_text = pd.Series(party_ids).astype(str)
+    return pd.DataFrame({
+        'party_id': party_ids,
+        'name': ('Name_' + id_text).to_numpy(),
+        'email': ('user' + id_text + '@example.com').to_numpy(),
+        'party_type': sample(rng, party_types, n),
+        'created_at': random_timestamps(rng, n, now, 730)
+    })
+
+def build_customer(rng, party_df, today, pools):
+    customer_df = party_df.loc[party_df['party_type'] == 'customer', ['party_id']].reset_index(drop=True)
+    n = len(customer_df)
+    customer_df['dob'] = random_dates(rng, n, today, 70 * 365, 18 * 365)
+    customer_df['phone_number'] = sample(rng, pools['phone_number'], n)
+    customer_df['registration_date'] = random_dates(rng, n, today, 730)
+    return customer_df
+
+def build_merchant(rng, party_df):
+    merchant_df = party_df.loc[party_df['party_type'] == 'merchant', ['party_id']].reset_index(drop=True)
+    merchant_df['category_code'] = sample(rng, category_codes, len(merchant_df))
+    return merchant_df
+
+def build_account(rng, n, today):
+    return pd.DataFrame({
+        'account_id': unique_ids(rng, n, 100000, max(999999, 100000 + 10 * n)),
+        'opened_date': random_dates(rng, n, today, 3 * 365),
+        'status': sample(rng, account_statuses, n)
+    })
+
+def build_customer_account(rng, n, customer_ids, account_ids):
+    # A tiny scale factor can leave no customers to link
+    n = n if len(customer_ids) and len(account_ids) else 0
+    links = pd.DataFrame({
+        'party_id': customer_ids[rng.integers(0, len(customer_ids), size=n)],
+        'account_id': account_ids[rng.integers(0, len(account_ids), size=n)],
+        'role': sample(rng, ['primary', 'joint'], n)
+    })
+    # A customer holds an account at most once
+    return links.drop_duplicates(subset=['party_id', 'account_id']).reset_index(drop=True)
+
+def build_card(rng, n, linked_account_ids, today):
+    n = n if len(linked_account_ids) else 0
+    issue_dates = random_dates(rng, n, today, 3 * 365)
+    return pd.DataFrame({
+        'card_id': unique_ids(rng, n, 10**15, 10**16),   # 16 digits
+        'account_id': linked_account_ids[rng.integers(0, len(linked_account_ids), size=n)],
+        'issue_date': issue_dates,
+        'expiration_date': issue_dates + rng.integers(3 * 365, 5 * 365 + 1, size=n).astype('timedelta64[D]'),
+        'status': sample(rng, card_statuses, n)
+    })
+
+def build_transactions(rng, n, party_ids, now, first_id=1):
+    # Payee is the payer shifted by a non-zero offset, so payer != payee without redraws
+    payer = rng.integers(0, len(party_ids), size=n)
+    payee = (payer + rng.integers(1, len(party_ids), size=n)) % len(party_ids)
+    is_fraud = rng.random(n) < 0.05
+    # Fraud score: 70-100 for fraud, 0-50 otherwise
+    fraud_scores = np.where(is_fraud, rng.uniform(70, 100, size=n), rng.uniform(0, 50, size=n))
+    return pd.DataFrame({
+        'transaction_id': np.arange(first_id, first_id + n),
+        'payer_party_id': party_ids[payer],
+        'payee_party_id': party_ids[payee],
+        'amount': np.round(rng.uniform(1.00, 10000.00, size=n), 2),
+        'currency': sample(rng, currencies, n),
+        'timestamp': random_timestamps(rng, n, now, 730),
+        'is_fraud': is_fraud,
+        'fraud_score': np.round(fraud_scores, 2)
+    })
+
+def build_device(rng, n):
+    return pd.DataFrame({
+        'device_id': np.arange(1, n + 1),
+        'device_type': sample(rng, device_types, n),
+        'os': sample(rng, oses, n),
+        'ip_address': random_ipv4(rng, n),
+        'browser_fingerprint': random_hex(rng, n, 20)
+    })
+
+def build_location(rng, n, pools):
+    return pd.DataFrame({
+        'location_id': np.arange(1, n + 1),
+        'latitude': np.round(rng.uniform(-90, 90, size=n), 6),
+        'longitude': np.round(rng.uniform(-180, 180, size=n), 6),
+        'city': sample(rng, pools['city'], n),
+        'country': sample(rng, pools['country'], n)
+    })
+
+def build_logins(rng, n, party_ids, num_devices, num_locations, now, first_id=1):
+    return pd.DataFrame({
+        'login_id': np.arange(first_id, first_id + n),
+        'party_id': party_ids[rng.integers(0, len(party_ids), size=n)],
+        'device_id': rng.integers(1, num_devices + 1, size=n),
+        'location_id': rng.integers(1, num_locations + 1, size=n),
+        'timestamp': random_timestamps(rng, n, now, 730),
+        'successful': rng.random(n) < 0.95
+    })
+
+def build_analyst(rng, n, pools):
+    return pd.DataFrame({
+        'analyst_id': np.arange(1, n + 1),
+        'name': sample(rng, pools['name'], n),
+        'email': sample(rng, pools['email'], n),
+        'team': sample(rng, teams, n)
+    })
+
+def build_fraud_alert(rng, n, fraud_transaction_ids, now):
+    # Without fraudulent transactions there is nothing to raise alerts on
+    n = n if len(fraud_transaction_ids) else 0
+    return pd.DataFrame({
+        'alert_id': np.arange(1, n + 1),
+        'transaction_id': fraud_transaction_ids[rng.integers(0, len(fraud_transaction_ids), size=n)],
+        'generated_by': sample(rng, ['analyst', 'system', 'model'], n),
+        'alert_level': sample(rng, ['low', 'medium', 'high'], n),
+        'status': sample(rng, ['open', 'dismissed', 'investigated'], n),
+        'created_at': random_timestamps(rng, n, now, 365)
+    })
+
+def build_investigation(rng, n, alert_ids, num_analysts, today):
+    n = min(n, len(alert_ids))
+    start_dates = random_dates(rng, n, today, 365, 30)
+    return pd.DataFrame({
+        'investigation_id': np.arange(1, n + 1),
+        'alert_id': rng.choice(alert_ids, size=n, replace=False),
+        'analyst_id': rng.integers(1, num_analysts + 1, size=n),
+        'start_date': start_dates,
+        'end_date': start_dates + rng.integers(1, 61, size=n).astype('timedelta64[D]'),
+        'conclusion': sample(rng, ['fraudulent', 'legitimate', 'inconclusive'], n)
+    })
+
+# -------------------
+# Sharded generation
+# -------------------
+# Parent key space shared by every shard, set once per worker process
+_shard_party_ids = None
+
+def init_shard_worker(party_ids):
+    global _shard_party_ids
+    _shard_party_ids = party_ids
+
+def generate_shard(task):
+    """Build and save one shard of a sharded table in a worker process.
+
+    Returns (file name, rows, fraud transaction ids) so the parent can build
+    fraud_alert_data without holding the transactions in memory.
+    """
+    table_name, shard, num_shards, first_id, rows, settings = task
+    rng = table_rng(settings['seed'], table_name, shard)
+    now = settings['now']
+    if table_name == 'transaction_data':
+        df = build_transactions(rng, rows, _shard_party_ids, now, first_id)
+        fraud_ids = df.loc[df['is_fraud'], 'transaction_id'].to_numpy()
+    else:
+        df = build_logins(rng, rows, _shard_party_ids, settings['num_devices'],
+                          settings['num_locations'], now, first_id)
+        fraud_ids = None
+    file_name = save_table(df, table_name, settings['output_dir'], settings['format'],
+                           shard_file_stem(table_name, shard, num_shards))
+    return file_name, len(df), fraud_ids
+
+# -------------------
+# Generation
+# -------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the synthetic bank fraud dataset")
+    parser.add_argument('--scale-factor', '--sf', type=float, default=default_scale_factor,
+                        help="dataset size relative to SF1 (400k transactions); "
+                             f"default {default_scale_factor} matches the original sample")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=output_format)
+    parser.add_argument('--shards', type=int, default=1,
+                        help=f"files each of {', '.join(sharded_tables)} is split into "
+                             "(<table>.part-NNNNN); fixed by the seed, independent of --workers")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="processes generating shards in parallel")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global output_format
+    args = parse_args(argv)
+    output_format = args.format
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    sizes = table_sizes(args.scale_factor)
+    pools = faker_pools(args.seed)
+    now = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    today = now.astype('datetime64[D]')
+    print(f"Generating SF{args.scale_factor:g}: {sizes['transaction_data']:,} transactions, "
+          f"{sizes['login_instance_data']:,} logins, {sizes['party_table']:,} parties")
+    start = time.perf_counter()
+
+    def save(df, table_name):
+        file_name = save_table(df, table_name, args.output_dir)
+        print(f"{table_name}: {len(df):,} rows saved as '{file_name}' ({time.perf_counter() - start:.1f}s)")
+
+    def rng(table_name):
+        return table_rng(args.seed, table_name)
+
+    #BUILDING THE PARTY, CUSTOMER AND MERCHANT TABLES
+    party_df = build_party(rng('party_table'), sizes['party_table'], now)
+    save(party_df, 'party_table')
+    customer_df = build_customer(rng('customer_data'), party_df, today, pools)
+    save(customer_df, 'customer_data')
+    save(build_merchant(rng('merchant_data'), party_df), 'merchant_data')
+
+    #BUILDING THE ACCOUNT, CUSTOMERACCOUNT AND CARD TABLES
+    account_df = build_account(rng('account_data'), sizes['account_data'], today)
+    save(account_df, 'account_data')
+    customer_account_df = build_customer_account(rng('customer_account_data'), sizes['customer_account_data'],
+                                                 customer_df['party_id'].to_numpy(),
+                                                 account_df['account_id'].to_numpy())
+    save(customer_account_df, 'customer_account_data')
+    save(build_card(rng('card_data'), sizes['card_data'], customer_account_df['account_id'].unique(), today),
+         'card_data')
+
+    #BUILDING THE DEVICE AND LOCATION TABLES
+    save(build_device(rng('device_data'), sizes['device_data']), 'device_data')
+    save(build_location(rng('location_data'), sizes['location_data'], pools), 'location_data')
+
+    #BUILDING THE TRANSACTION AND LOGININSTANCE TABLES
+    # Shards only reference the party/device/location id spaces built above,
+    # so referential integrity holds however the shards are scheduled
+    party_ids = party_df['party_id'].to_numpy()
+    settings = {'seed': args.seed, 'now': now, 'output_dir': args.output_dir, 'format': output_format,
+                'num_devices': sizes['device_data'], 'num_locations': sizes['location_data']}
+    tasks = [(table_name, shard, args.shards, first_id, rows, settings)
+             for table_name in sharded_tables
+             for shard, (first_id, rows) in enumerate(shard_ranges(sizes[table_name], args.shards))]
+    if args.workers > 1 and len(tasks) > 2:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_shard_worker,
+                                 initargs=(party_ids,)) as executor:
+            results = list(executor.map(generate_shard, tasks))
+    else:
+        init_shard_worker(party_ids)
+        results = [generate_shard(task) for task in tasks]
+    for (table_name, *_), (file_name, rows, _) in zip(tasks, results):
+        print(f"{table_name}: {rows:,} rows saved as '{file_name}' ({time.perf_counter() - start:.1f}s)")
+
+    #BUILDING THE ANALYST, FRAUDALERT AND INVESTIGATION TABLES
+    save(build_analyst(rng('analyst_data'), sizes['analyst_data'], pools), 'analyst_data')
+    # Results come back in shard order, so the alert sample does not depend on the workers
+    fraud_transaction_ids = np.concatenate([fraud_ids for _, _, fraud_ids in results if fraud_ids is not None])
+    fraud_alert_df = build_fraud_alert(rng('fraud_alert_data'), sizes['fraud_alert_data'],
+                                       fraud_transaction_ids, now)
+    save(fraud_alert_df, 'fraud_alert_data')
+    save(build_investigation(rng('investigation_data'), sizes['investigation_data'],
+                             fraud_alert_df['alert_id'].to_numpy(), sizes['analyst_data'], today),
+         'investigation_data')
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,53 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
+import os
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import matplotlib.pyplot as plt
-from mysql.connector import Error
+from streamlit.errors import StreamlitSecretNotFoundError
+from db_pool import ConnectionPool
+from query_cache import QueryCache
+from fraud_queries import query_map, page_keys, query_params, default_values, bind, render
+from result_export import keyset_page_sql, page_key_values
+from result_frames import for_statistics
+from query_backends import QueryError, MySQLBackend, DuckDBBackend
+import link_graph
+import query_metrics
+
+# -------------------
+# Result cache settings
+# -------------------
+cache_ttl_seconds = 600         # cached results expire after this long
+cache_max_mb = 256              # memory budget for cached results, LRU evicted beyond it
+version_check_seconds = 5       # how often load_log is polled for a finished load
+
+# -------------------
+# Connection pool settings (overridable in the [mysql] section of secrets.toml)
+# -------------------
+pool_size = 5                   # connections shared by every session
+pool_timeout_seconds = 10       # give up waiting for a free connection after this long
+pool_ping_after_seconds = 30    # ping connections idle longer than this on checkout
+
+# -------------------
+# Result browsing settings
+# -------------------
+page_size_options = (50, 100, 500, 1000)
+cluster_member_rows = 500       # members listed for a looked-up device-account cluster
+
+# -------------------
+# Performance instrumentation settings (metrics_dir and metrics_port in secrets.toml)
+# -------------------
+recent_requests_shown = 20      # latest requests listed in the Performance panel
+
+# -------------------
+# Overview settings
+# -------------------
+overview_concurrency = 4        # analyses running at once, shared by every session
+overview_timeout_seconds = 60   # an analysis is stopped (or never started) this long after it was submitted
+overview_grace_seconds = 2      # extra wait for stopped analyses to report back
+overview_rows = 100             # rows shown per tile
+overview_columns = 2            # tiles per row
 
 # -------------------
 # Layout
@@ -13,95 +58,31 @@ st.set_page_config(page_title="Bank Fraud Detection", layout="wide")
 # Sidebar - Query Selector
 # -------------------
 st.title("Bank Fraud Analytics Dashboard")
+view_mode = st.sidebar.radio("View:", ("Single analysis", "Overview (all analyses)"))
 query_option = st.sidebar.selectbox(
     "Choose an analysis to run:",
-    (
-        "Top Failed Logins (7 days)",
-        "Accounts with >5 Failures (1 day)",
-        "High Device Failures",
-        "Multi-Account Access via Device",
-        "Multi-Location Access (60 mins)",
-        "Blacklisted Devices Access",
-        "Parties with Active Fraud Alerts",
-        "Multiple Alerts per Party"
-    )
+    tuple(query_map)
 )
 
-# -------------------
-# SQL Query Definitions
-# -------------------
-query_map = {
-"Top Failed Logins (7 days)": """
-    SELECT cd.party_id, cd.phone_number, COUNT(*) AS failed_logins
-    FROM customer_data cd
-    JOIN login_instance_data lid ON cd.party_id = lid.party_id
-    WHERE lid.successful = FALSE
-    GROUP BY cd.party_id, cd.phone_number
-    HAVING COUNT(*) > 1
-    ORDER BY failed_logins DESC
-    LIMIT 10
-""",
-
-    "Accounts with >5 Failures (1 day)": """
-        SELECT cad.account_id, COUNT(*) AS failed_attempts, MAX(lid.timestamp) AS last_failed_attempt
-        FROM login_instance_data lid
-        JOIN customer_account_data cad ON lid.party_id = cad.party_id
-        WHERE lid.successful = FALSE AND lid.timestamp >= NOW() - INTERVAL 1 DAY
-        GROUP BY cad.account_id
-        HAVING failed_attempts > 5
-        ORDER BY failed_attempts DESC
-    """,
-    "High Device Failures": """
-        SELECT lid.device_id, COUNT(*) AS failure_count
-        FROM login_instance_data lid
-        WHERE lid.successful = FALSE AND lid.timestamp >= NOW() - INTERVAL 7 DAY
-        GROUP BY lid.device_id
-        HAVING failure_count > 10
-        ORDER BY failure_count DESC
-    """,
-    "Multi-Account Access via Device": """
-        SELECT lid.device_id, COUNT(DISTINCT cad.account_id) AS distinct_accounts_accessed
-        FROM login_instance_data lid
-        JOIN customer_account_data cad ON lid.party_id = cad.party_id
-        WHERE lid.timestamp >= NOW() - INTERVAL 7 DAY
-        GROUP BY lid.device_id
-        HAVING COUNT(DISTINCT cad.account_id) > 3
-        ORDER BY distinct_accounts_accessed DESC
-    """,
-    "Multi-Location Access (60 mins)": """
-        SELECT lid.party_id, COUNT(DISTINCT lid.location_id) AS location_count,
-               MIN(lid.timestamp) AS first_access, MAX(lid.timestamp) AS last_access
-        FROM login_instance_data lid
-        WHERE lid.timestamp >= NOW() - INTERVAL 1 DAY
-        GROUP BY lid.party_id
-        HAVING location_count > 1 AND TIMESTAMPDIFF(MINUTE, first_access, last_access) <= 60
-        ORDER BY location_count DESC
-    """,
-    "Blacklisted Devices Access": """
-        SELECT '⚠️ No blacklist flag available in device_data' AS message
-    """,
-    "Parties with Active Fraud Alerts": """
-        SELECT DISTINCT ca.party_id
-        FROM fraud_alert_data fa
-        JOIN transaction_data td ON fa.transaction_id = td.transaction_id
-        JOIN customer_account_data ca 
-          ON td.payer_party_id = ca.party_id OR td.payee_party_id = ca.party_id 
-        WHERE fa.status IN ('active', 'open')
-    """,
-    "Multiple Alerts per Party": """
-        SELECT ca.party_id,
-               GROUP_CONCAT(DISTINCT ca.account_id ORDER BY ca.account_id) AS associated_accounts,
-               COUNT(*) AS fraud_alert_count
-        FROM fraud_alert_data fa
-        JOIN transaction_data td ON fa.transaction_id = td.transaction_id
-        JOIN customer_account_data ca 
-          ON td.payer_party_id = ca.party_id OR td.payee_party_id = ca.party_id 
-        WHERE fa.status IN ('active', 'open')
-        GROUP BY ca.party_id
-        HAVING fraud_alert_count > 1
-        ORDER BY fraud_alert_count DESC
-    """
-}
+
+def param_values(query_name):
+    """Parameter values an analysis runs with: the sidebar settings, else its defaults"""
+    return {**default_values(query_name), **st.session_state.get("param_values", {}).get(query_name, {})}
+
+
+def param_controls(query_name):
+    """Sidebar inputs for an analysis's parameters; the values are kept per analysis for the session"""
+    stored = st.session_state.setdefault("param_values", {}).setdefault(query_name, {})
+    for param in query_params.get(query_name, []):
+        key = f"param:{query_name}:{param.name}"
+        if key not in st.session_state:
+            st.session_state[key] = stored.get(param.name, param.default)
+        stored[param.name] = st.sidebar.number_input(param.label, min_value=param.min_value,
+                                                     max_value=param.max_value, step=1, key=key)
+
+
+if view_mode == "Single analysis":
+    param_controls(query_option)
 
 # -------------------
 # Main Header
@@ -110,58 +91,349 @@ st.title("🧫 Bank Fraud Detection Report")
 st.markdown("Use this dashboard to explore patterns that may indicate fraudulent behavior across customer activity.")
 
 # -------------------
-# Database Connector
+# Query Backend
 # -------------------
-def get_connection():
+def setting(section, name, default):
+    """A value from secrets.toml, or the default when it (or the whole file) is missing"""
     try:
-        return mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=st.secrets["mysql"]["port"],  
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"]
-        )
-    except Error as e:
-        st.error(f"Error connecting to MySQL DB: {e}")
-        return None
+        return st.secrets[section].get(name, default) if section else st.secrets.get(name, default)
+    except (KeyError, FileNotFoundError, StreamlitSecretNotFoundError):
+        return default
+
+
+@st.cache_resource
+def get_backend():
+    """One query backend for the whole Streamlit process, shared by every session.
+
+    backend = "duckdb" in secrets.toml (or FRAUD_BACKEND=duckdb) runs the analyses
+    over the generated files in data_dir instead of MySQL.
+    """
+    backend_name = os.environ.get("FRAUD_BACKEND") or setting(None, "backend", "mysql")
+    if backend_name == "duckdb":
+        return DuckDBBackend(os.environ.get("FRAUD_DATA_DIR") or setting(None, "data_dir", "."))
+    mysql_secrets = st.secrets["mysql"]
+    pool = ConnectionPool(
+        mysql_secrets.get("pool_size", pool_size),
+        ping_after=mysql_secrets.get("pool_ping_after_seconds", pool_ping_after_seconds),
+        host=mysql_secrets["host"],
+        port=mysql_secrets["port"],
+        user=mysql_secrets["user"],
+        password=mysql_secrets["password"],
+        database=mysql_secrets["database"],
+        # Every query sees the latest data instead of a snapshot kept open by the reused connection
+        autocommit=True
+    )
+    return MySQLBackend(pool, mysql_secrets.get("pool_timeout_seconds", pool_timeout_seconds))
 
 
 # -------------------
 # Run Query 
 # -------------------
-def run_query(sql_query, params=None):
-    conn = get_connection()
-    cursor = None
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute(sql_query, params or ())
-            result = cursor.fetchall()
-            columns = cursor.column_names
-            df = pd.DataFrame(result, columns=columns)
-            return df
-        except Error as e:
-            st.error(f"Query failed: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-            conn.close()
-    else:
-        st.warning("Connection to the database could not be established.")
+@st.cache_resource
+def get_query_cache():
+    """One result cache for the whole Streamlit process, shared by every session"""
+    return QueryCache(ttl=cache_ttl_seconds, max_bytes=cache_max_mb * 1024 * 1024)
+
+
+def check_data_version(cache, backend):
+    """Drop cached results once the data changed (a new load_log row, or rewritten files)"""
+    if not cache.version_is_stale(version_check_seconds):
+        return
+    # Without a version the results still expire through the TTL
+    cache.set_version(backend.data_version())
+
+
+def fetch_result(backend, cache, sql_query, params=None, trace=None, timeout=None):
+    """Result from the shared cache, or from the backend (raises QueryError).
+
+    Makes no Streamlit calls, so the overview can run it on worker threads.
+    With a timeout in seconds, the backend stops the query then.
+    """
+    with query_metrics.timed(trace, 'cache'):
+        check_data_version(cache, backend)
+        key = QueryCache.key(sql_query, params)
+        version = cache.version
+        df = cache.get(key)
+    if trace is not None:
+        trace.sql_query, trace.params, trace.cache_hit = sql_query, params, df is not None
+    if df is None:
+        df = backend.run(sql_query, params, trace, timeout)
+        cache.put(key, df, version)
+    return df
+
+
+def run_query(sql_query, params=None, trace=None):
+    """Run a query, serving repeated views from the shared result cache"""
+    try:
+        return fetch_result(get_backend(), get_query_cache(), sql_query, params, trace)
+    except QueryError as e:
+        if trace is not None:
+            trace.error = str(e)
+        st.error(str(e))
     return pd.DataFrame()
 
 
-selected_query = query_map.get(query_option)
+if st.sidebar.button("Clear cached results"):
+    get_query_cache().clear()
+
+pool_stats = get_backend().stats()
+if pool_stats:
+    with st.sidebar.expander("Connection pool"):
+        st.write(f"In use: {pool_stats['in_use']} of {pool_stats['opened']} open (max {pool_stats['size']})")
+        st.write(f"Wait for a connection: avg {pool_stats['wait_avg_ms']:.1f} ms, "
+                 f"max {pool_stats['wait_max_ms']:.1f} ms over {pool_stats['checkouts']} checkouts")
+        st.write(f"Reconnects: {pool_stats['reconnects']}")
+        st.write(f"Prepared statements: {pool_stats['statements']} cached, "
+                 f"{pool_stats['statement_hits']} reused, {pool_stats['prepares']} prepared")
+else:
+    st.sidebar.caption(f"Running on the embedded {get_backend().name} backend over local files")
+
+# -------------------
+# Pagination
+# -------------------
+def page_cursors(query_name):
+    """Start key of every page visited so far for a query; the last one is the current page"""
+    return st.session_state.setdefault("page_cursors", {}).setdefault(query_name, [None])
+
+
+def next_page(query_name, after):
+    page_cursors(query_name).append(after)
+
+
+def previous_page(query_name):
+    cursors = page_cursors(query_name)
+    if len(cursors) > 1:
+        cursors.pop()
+
 
-st.subheader(f"📊 Results: {query_option}")
+def run_page(query_name, sql_query, page_rows, trace=None, params=None):
+    """Fetch the current page of a query (plus one row to know whether another page follows)"""
+    keys = page_keys.get(query_name)
+    params = list(params or [])
+    # Other parameter values are another result, browsed from its first page
+    if st.session_state.setdefault("page_params", {}).get(query_name) != params:
+        st.session_state["page_params"][query_name] = params
+        st.session_state.setdefault("page_cursors", {}).pop(query_name, None)
+    if not keys:
+        return run_query(sql_query, params, trace), False
+    paged_sql, page_params = keyset_page_sql(sql_query, keys, page_cursors(query_name)[-1], page_rows + 1)
+    df = run_query(paged_sql, params + page_params, trace)
+    return df.iloc[:page_rows], len(df) > page_rows
 
-if selected_query:
+
+# -------------------
+# Export
+# -------------------
+def export_result(sql_query, file_format):
+    """Stream the full result of a query into a temporary file and return its path"""
+    suffix = '.parquet' if file_format == 'parquet' else '.csv'
+    fd, path = tempfile.mkstemp(prefix='fraud_export_', suffix=suffix)
+    os.close(fd)
+    rows = None
+    try:
+        rows = get_backend().export(sql_query, path, file_format)
+    except QueryError as e:
+        st.error(str(e))
+    finally:
+        # Whatever stopped the export, its partial file is not kept
+        if rows is None:
+            os.remove(path)
+    if rows is None:
+        return None
+    st.success(f"Exported {rows:,} rows.")
+    return path
+
+
+# -------------------
+# Performance
+# -------------------
+@st.cache_resource
+def get_query_metrics():
+    """One set of request metrics for the whole Streamlit process, shared by every session.
+
+    With metrics_port in secrets.toml, Prometheus can also scrape them from
+    http://<host>:<metrics_port>/metrics.
+    """
+    metrics = query_metrics.QueryMetrics(setting(None, "metrics_dir", query_metrics.metrics_dir))
+    port = setting(None, "metrics_port", None)
+    if port:
+        try:
+            query_metrics.serve(metrics, int(port))
+        except OSError as e:
+            print(f"Warning: could not serve metrics on port {port}: {e}")
+    return metrics
+
+
+def show_performance(trace):
+    """Collapsible breakdown of the request just served, recent requests and the last table loads"""
+    metrics = get_query_metrics()
+    with st.expander("⏱️ Performance"):
+        total_col, returned_col, examined_col, source_col = st.columns(4)
+        total_col.metric("Total", f"{trace.total * 1000:,.1f} ms")
+        returned_col.metric("Rows returned", f"{trace.rows_returned:,}")
+        examined_col.metric("Rows examined", "n/a" if trace.rows_examined is None else f"{trace.rows_examined:,}")
+        source_col.metric("Served from", "result cache" if trace.cache_hit else trace.backend)
+        phase_names = [name for name in query_metrics.phases if name in trace.phases]
+        st.dataframe(pd.DataFrame({'phase': phase_names,
+                                   'ms': [round(trace.phases[name] * 1000, 2) for name in phase_names]}),
+                     hide_index=True)
+
+        if trace.sql_query and st.button("Capture EXPLAIN plan"):
+            try:
+                plan = get_backend().explain(trace.sql_query, trace.params)
+                query_metrics.log_event({'event': 'explain', 'query': trace.query_name, 'plan': plan},
+                                        metrics.directory)
+                st.code(plan)
+            except QueryError as e:
+                st.error(str(e))
+
+        recent = pd.DataFrame([{'query': r['query'], 'outcome': r['outcome'], 'rows': r['rows_returned'],
+                                'total_ms': r['total_ms'], **r['phases_ms']}
+                               for r in metrics.recent_records()])
+        if not recent.empty:
+            st.markdown("**Latency by analysis** (recent requests, ms)")
+            st.dataframe(recent.groupby('query')['total_ms']
+                         .agg(requests='count', p50='median', p95=lambda ms: ms.quantile(0.95)).round(1))
+            st.markdown("**Latest requests**")
+            st.dataframe(recent.tail(recent_requests_shown).iloc[::-1], hide_index=True)
+
+        loads = query_metrics.table_load_timings(metrics.directory)
+        if loads:
+            st.markdown("**Last table loads** (bulk_loader)")
+            st.dataframe(pd.DataFrame([
+                {'table': table, 'mode': mode, 'seconds': round(values.get('fraud_load_seconds', 0), 2),
+                 'rows': values.get('fraud_load_rows'),
+                 'rows/s': round(values['fraud_load_rows'] / values['fraud_load_seconds'])
+                 if values.get('fraud_load_rows') is not None and values.get('fraud_load_seconds') else None}
+                for (table, mode), values in sorted(loads.items())]), hide_index=True)
+
+
+# -------------------
+# Overview
+# -------------------
+@st.cache_resource
+def get_overview_executor():
+    """Worker threads running overview analyses, shared by every session so the limit is global"""
+    return ThreadPoolExecutor(max_workers=overview_concurrency, thread_name_prefix='overview')
+
+
+def overview_task(backend, cache, query_name, values, deadline):
+    """Run one analysis for its overview tile; returns (result or None, trace).
+
+    The backend stops the query at deadline (time.monotonic()), counted from
+    when the task was submitted, so time spent queued behind other analyses
+    counts too.
+    """
+    trace = query_metrics.QueryTrace(query_name, backend.name)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        trace.error = f"Waited {overview_timeout_seconds}s for a free worker, skipped."
+        return None, trace
+    sql_query, params = bind(query_name, values)
+    if query_name in page_keys:
+        # Only the first rows are shown, so only those are fetched
+        sql_query, page_params = keyset_page_sql(sql_query, page_keys[query_name], None, overview_rows)
+        params += page_params
+    try:
+        df = fetch_result(backend, cache, sql_query, params, trace, remaining)
+    except QueryError as e:
+        trace.error = str(e)
+        return None, trace
+    trace.rows_returned = len(df)
+    return df, trace
+
+
+def show_tile(placeholder, df, trace):
+    render_start = time.perf_counter()
+    with placeholder.container():
+        if trace.error:
+            st.error(trace.error)
+        elif df.empty:
+            st.caption(f"No rows ({trace.total * 1000:,.0f} ms)")
+        else:
+            source = "cached" if trace.cache_hit else f"{trace.total * 1000:,.0f} ms"
+            st.caption(f"{len(df):,} rows shown ({source})")
+            st.dataframe(df.head(overview_rows), use_container_width=True, height=250)
+    trace.add('render', time.perf_counter() - render_start)
+    get_query_metrics().record(trace)
+
+
+def run_overview():
+    """Run every analysis at once and fill each tile as soon as its own query finishes.
+
+    Seeing everything takes about as long as the slowest analysis instead of
+    the sum of all of them. overview_timeout_seconds after submitting, the
+    analyses still queued are cancelled and the running ones are stopped by
+    the backend, which frees their worker and connection for the next view.
+    """
+    backend, cache = get_backend(), get_query_cache()
+    columns = st.columns(overview_columns)
+    placeholders = {}
+    for i, query_name in enumerate(query_map):
+        with columns[i % overview_columns].container(border=True):
+            st.markdown(f"**{query_name}**")
+            placeholders[query_name] = st.empty()
+            placeholders[query_name].caption("Running...")
+
+    start = time.monotonic()
+    deadline = start + overview_timeout_seconds
+    executor = get_overview_executor()
+    futures = {executor.submit(overview_task, backend, cache, query_name, param_values(query_name), deadline):
+               query_name for query_name in query_map}
+    pending = set(futures)
+    finished = 0
+    while pending:
+        done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        for future in done:
+            df, trace = future.result()
+            finished += trace.error is None
+            show_tile(placeholders[futures[future]], df, trace)
+        now = time.monotonic()
+        if now < deadline:
+            continue
+        for future in [f for f in pending if f.cancel()]:
+            pending.discard(future)
+            placeholders[futures[future]].warning(
+                f"Did not start within {overview_timeout_seconds}s, skipped.")
+        if now >= deadline + overview_grace_seconds:
+            for future in pending:
+                placeholders[futures[future]].warning(
+                    f"Still running after {overview_timeout_seconds}s, skipped.")
+            break
+    st.caption(f"{finished} of {len(query_map)} analyses in "
+               f"{time.monotonic() - start:.1f}s, at most {overview_concurrency} at a time")
+
+
+page_rows = st.sidebar.selectbox("Rows per page:", page_size_options, index=1)
+
+selected_query = query_map.get(query_option)
+
+if view_mode == "Overview (all analyses)":
+    st.subheader("📊 Overview: all analyses")
+    run_overview()
+elif selected_query:
+    st.subheader(f"📊 Results: {query_option}")
+    trace = query_metrics.QueryTrace(query_option, get_backend().name)
+    selected_sql, selected_params = bind(query_option, param_values(query_option))
     with st.spinner("Running query..."):
-        result_df = run_query(selected_query)
+        result_df, has_next_page = run_page(query_option, selected_sql, page_rows, trace, selected_params)
+    trace.rows_returned = len(result_df)
+    render_start = time.perf_counter()
 
+    page_number = len(page_cursors(query_option))
     if not result_df.empty:
         st.dataframe(result_df, use_container_width=True)
 
+        if query_option in page_keys:
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            prev_col.button("⬅️ Previous page", disabled=page_number == 1,
+                            on_click=previous_page, args=(query_option,))
+            page_col.write(f"Page {page_number} (rows {(page_number - 1) * page_rows + 1:,}"
+                           f"–{(page_number - 1) * page_rows + len(result_df):,})")
+            if has_next_page:
+                next_col.button("Next page ➡️", on_click=next_page,
+                                args=(query_option, page_key_values(result_df, page_keys[query_option])))
+
         st.subheader("📈 Visual Summary")
 
         if query_option == "Top Failed Logins (7 days)":
@@ -214,20 +486,78 @@ if selected_query:
         st.markdown("### 📌 Summary Stats")
         with st.expander("Show Summary"):
             st.write("🔢 Row count:", len(result_df))
-            numeric_cols = result_df.select_dtypes(include='number').columns
+            stats_df = for_statistics(result_df)
+            numeric_cols = stats_df.select_dtypes(include='number').columns
             if len(numeric_cols) > 0:
-                st.dataframe(result_df[numeric_cols].describe())
+                st.dataframe(stats_df[numeric_cols].describe())
             else:
                 st.info("No numeric columns to summarize.")
 
         with st.expander("📈 Summary Statistics"):
-            st.write(result_df.describe(include='all'))
-
-        st.download_button(
-            label="📅 Download results as CSV",
-            data=result_df.to_csv(index=False).encode('utf-8'),
-            file_name='fraud_detection_results.csv',
-            mime='text/csv'
-        )
+            st.write(for_statistics(result_df).describe(include='all'))
+
+        st.markdown("### 📅 Export")
+        export_format = st.radio("Export format:", ("csv", "parquet"), horizontal=True)
+        if st.button("Prepare full export"):
+            previous_export = st.session_state.get("export")
+            if previous_export and os.path.exists(previous_export[1]):
+                os.remove(previous_export[1])
+            with st.spinner("Exporting all rows..."):
+                st.session_state["export"] = (query_option, export_result(render(query_option, param_values(query_option)),
+                                                                            export_format))
+        export_query_name, export_path = st.session_state.get("export", (None, None))
+        if export_query_name == query_option and export_path and os.path.exists(export_path):
+            with open(export_path, 'rb') as f:
+                st.download_button(
+                    label="📅 Download results",
+                    data=f,
+                    file_name='fraud_detection_results' + os.path.splitext(export_path)[1],
+                    mime='application/octet-stream' if export_path.endswith('.parquet') else 'text/csv'
+                )
+    elif page_number > 1:
+        st.info("No more rows.")
+        st.button("⬅️ Previous page", on_click=previous_page, args=(query_option,))
     else:
         st.warning("⚠️ No results found for this query.")
+
+    trace.add('render', time.perf_counter() - render_start)
+    get_query_metrics().record(trace)
+    show_performance(trace)
+
+# -------------------
+# Device-Account Clusters
+# -------------------
+@st.cache_resource(max_entries=1)
+def get_link_graph(path, modified):
+    """The persisted link graph, reloaded whenever the file is rewritten (modified is its mtime).
+
+    Only the latest load is kept, so a rebuilt graph replaces the old one in memory.
+    """
+    return link_graph.LinkGraph.load(path)
+
+
+st.subheader("🕸️ Device–Account Clusters")
+st.markdown("Devices and accounts chained together through shared logins, across all loaded logins.")
+graph_path = setting(None, "link_graph_file", link_graph.graph_file)
+if not os.path.exists(graph_path):
+    st.info("No link graph yet. Build it with `python link_graph.py build` (bulk_loader.py keeps it up to date).")
+else:
+    graph = get_link_graph(graph_path, os.path.getmtime(graph_path))
+    top_n = st.slider("Largest clusters to show:", 5, 100, 10)
+    st.dataframe(graph.largest(top_n), use_container_width=True)
+
+    kind_col, id_col = st.columns([1, 2])
+    lookup_kind = kind_col.selectbox("Look up a cluster by:", link_graph.node_kinds)
+    lookup_id = id_col.number_input(f"{lookup_kind.capitalize()} ID:", min_value=0, step=1, value=None)
+    if lookup_id is not None:
+        found = graph.cluster(lookup_kind, int(lookup_id))
+        if found is None:
+            st.warning(f"{lookup_kind.capitalize()} {int(lookup_id)} has no links in the graph.")
+        else:
+            devices_col, parties_col, accounts_col = st.columns(3)
+            devices_col.metric("Devices", f"{found['devices']:,}")
+            parties_col.metric("Parties", f"{found['parties']:,}")
+            accounts_col.metric("Accounts", f"{found['accounts']:,}")
+            members = graph.members(found['cluster_id'], limit=cluster_member_rows)
+            st.caption(f"Cluster {found['cluster_id']}, first {len(members):,} members")
+            st.dataframe(members, use_container_width=True)
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow.parquet as pq
+
+# Scale factors generated, loaded and queried by default (SF1 = 400k transactions)
+scale_factors = (0.005, 0.05, 0.5)
+seed = 42
+
+# Query timing
+cold_runs = 3       # fresh backend (new connection or DuckDB instance) per run
+warm_runs = 10      # repeated runs on one backend after a first untimed run
+
+# Regression check against a baseline report
+regression_threshold = 0.25     # fail when a metric is this much worse than the baseline
+min_compare_seconds = 0.01      # timings below this are too noisy to compare
+
+report_file = 'benchmark_report.json'
+
+# -------------------
+# Measuring
+# -------------------
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children in MB"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measured(func, args, quiet):
+    output = open(os.devnull, 'w') if quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+    return result, seconds, peak_rss_mb()
+
+def isolated(func, *args, quiet=True):
+    """Run func(*args) in a fresh process so its peak RSS is its own.
+
+    Returns (result, seconds, peak_rss_mb).
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_measured, func, args, quiet).result()
+
+def percentiles(samples):
+    return {'p50': float(np.percentile(samples, 50)), 'p95': float(np.percentile(samples, 95))}
+
+def file_rows(data_dir):
+    """Rows per table in the generated files, as bulk_loader would pick them"""
+    from bulk_loader import csv_to_table, resolve_data_file, data_exists, data_files
+    rows = {}
+    for csv_file, table_name in csv_to_table.items():
+        data_file = resolve_data_file(os.path.join(data_dir, csv_file))
+        if not data_exists(data_file):
+            continue
+        count = 0
+        for path in data_files(data_file):
+            if path.endswith('.parquet'):
+                count += pq.ParquetFile(path).metadata.num_rows
+            else:
+                with open(path, 'rb') as f:
+                    count += sum(1 for _ in f) - 1
+        rows[table_name] = count
+    return rows
+
+# -------------------
+# Phases (each runs in its own process)
+# -------------------
+def generate(data_dir, scale_factor, shards, workers):
+    import Create_Tables
+    Create_Tables.main(['--sf', str(scale_factor), '--seed', str(seed), '--output-dir', data_dir,
+                        '--shards', str(shards), '--workers', str(workers)])
+
+def load_mysql(data_dir, secrets, workers):
+    """Full refresh of every table with bulk_loader (swap mode, so reruns start from the same state)"""
+    import bulk_loader
+    from migrations import connect_args
+    bulk_loader.folder = data_dir
+    bulk_loader.config = {**connect_args(secrets), 'allow_local_infile': True}
+    bulk_loader.main(['--mode', 'swap', '--workers', str(workers)])
+
+def duckdb_file(data_dir):
+    return os.path.join(data_dir, 'benchmark.duckdb')
+
+def load_duckdb(data_dir, database):
+    """Copy every generated table into a DuckDB database file, typed like bank_fraud.sql,
+    and fill the summary tables there; the query phase then reads this file"""
+    import duckdb
+    import schema
+    from bulk_loader import csv_to_table, resolve_data_file, data_exists, data_files
+    from query_backends import DuckDBBackend, create_summaries
+    tables = schema.parse_schema()
+    db = duckdb.connect(database)
+    for csv_file, table_name in csv_to_table.items():
+        data_file = resolve_data_file(os.path.join(data_dir, csv_file))
+        if table_name not in tables or not data_exists(data_file):
+            continue
+        reader = DuckDBBackend._reader(tables[table_name], data_files(data_file))
+        db.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM {reader}")
+    create_summaries(db, materialize=True)
+    db.close()
+
+def open_backend(backend_name, data_dir, secrets):
+    from query_backends import MySQLBackend, DuckDBBackend
+    if backend_name == 'duckdb':
+        return DuckDBBackend(data_dir, database=duckdb_file(data_dir))
+    from db_pool import ConnectionPool
+    from migrations import connect_args
+    return MySQLBackend(ConnectionPool(1, **connect_args(secrets)))
+
+def close_backend(backend):
+    if hasattr(backend, 'pool'):
+        backend.pool.close_all()
+
+def time_queries(backend_name, data_dir, secrets, cold, warm):
+    """Cold and warm latencies of every query_map analysis.
+
+    Both backends query what the load phase wrote. A cold run is the first
+    execution on a fresh backend: a newly opened DuckDB file starts with an
+    empty buffer cache, a new MySQL connection starts without session state
+    (the server's buffer pool stays warm).
+    """
+    from fraud_queries import query_map
+    timings = {}
+    for name, sql_query in query_map.items():
+        cold_seconds = []
+        for _ in range(cold):
+            backend = open_backend(backend_name, data_dir, secrets)
+            start = time.perf_counter()
+            backend.run(sql_query)
+            cold_seconds.append(time.perf_counter() - start)
+            close_backend(backend)
+        backend = open_backend(backend_name, data_dir, secrets)
+        rows = len(backend.run(sql_query))
+        warm_seconds = []
+        for _ in range(warm):
+            start = time.perf_counter()
+            backend.run(sql_query)
+            warm_seconds.append(time.perf_counter() - start)
+        close_backend(backend)
+        timings[name] = {'rows': rows, 'cold': percentiles(cold_seconds), 'warm': percentiles(warm_seconds)}
+        print(f"  {name}: cold p50 {timings[name]['cold']['p50'] * 1000:.1f} ms, "
+              f"warm p50 {timings[name]['warm']['p50'] * 1000:.1f} ms")
+    return timings
+
+# -------------------
+# Benchmark run
+# -------------------
+def run_scale_factor(args, scale_factor, data_dir):
+    result = {}
+    print(f"\nSF{scale_factor:g}: generating into {data_dir}")
+    _, seconds, peak = isolated(generate, data_dir, scale_factor, args.shards, args.workers)
+    rows = file_rows(data_dir)
+    total_rows = sum(rows.values())
+    result['generate'] = {'seconds': seconds, 'rows': total_rows,
+                          'rows_per_sec': total_rows / seconds, 'peak_rss_mb': peak}
+    print(f"  {total_rows:,} rows in {seconds:.1f}s ({total_rows / seconds:,.0f} rows/s, peak {peak:,.0f} MB)")
+
+    # bulk_loader itself is only timed with --backend mysql; the DuckDB load is DuckDB's own bulk copy
+    if args.backend == 'mysql':
+        _, seconds, peak = isolated(load_mysql, data_dir, args.secrets, args.workers)
+    else:
+        _, seconds, peak = isolated(load_duckdb, data_dir, duckdb_file(data_dir))
+    result['load'] = {'seconds': seconds, 'rows': total_rows,
+                      'rows_per_sec': total_rows / seconds, 'peak_rss_mb': peak}
+    print(f"  loaded into {args.backend} in {seconds:.1f}s ({total_rows / seconds:,.0f} rows/s, peak {peak:,.0f} MB)")
+
+    result['queries'], _, peak = isolated(time_queries, args.backend, data_dir, args.secrets,
+                                          args.cold_runs, args.warm_runs, quiet=False)
+    result['query_peak_rss_mb'] = peak
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(args):
+    report = {'commit': git_commit(), 'created': datetime.now().isoformat(timespec='seconds'),
+              'backend': args.backend, 'python': platform.python_version(), 'cpus': os.cpu_count(),
+              'settings': {'seed': seed, 'shards': args.shards, 'workers': args.workers,
+                           'cold_runs': args.cold_runs, 'warm_runs': args.warm_runs},
+              'scale_factors': {}}
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='bank_fraud_benchmark_')
+    try:
+        for scale_factor in args.sf:
+            data_dir = os.path.join(work_dir, f"sf{scale_factor:g}")
+            os.makedirs(data_dir, exist_ok=True)
+            report['scale_factors'][f"{scale_factor:g}"] = run_scale_factor(args, scale_factor, data_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+# -------------------
+# Comparing reports
+# -------------------
+def report_metrics(report):
+    """Flat {metric: (value, higher_is_better, unit)} of a report; unit is 's', 'rows/s' or 'MB'"""
+    metrics = {}
+    for sf, result in report['scale_factors'].items():
+        metrics[f"SF{sf} generate seconds"] = (result['generate']['seconds'], False, 's')
+        metrics[f"SF{sf} load rows/s"] = (result['load']['rows_per_sec'], True, 'rows/s')
+        for phase in ('generate', 'load'):
+            metrics[f"SF{sf} {phase} peak RSS"] = (result[phase]['peak_rss_mb'], False, 'MB')
+        if 'query_peak_rss_mb' in result:
+            metrics[f"SF{sf} queries peak RSS"] = (result['query_peak_rss_mb'], False, 'MB')
+        for name, timing in result['queries'].items():
+            for run in ('cold', 'warm'):
+                for percentile in ('p50', 'p95'):
+                    metrics[f"SF{sf} {name} {run} {percentile}"] = (timing[run][percentile], False, 's')
+    return metrics
+
+def format_value(value, unit):
+    return f"{value * 1000:,.1f} ms" if unit == 's' else f"{value:,.0f} {unit}"
+
+def compare_reports(baseline, report, threshold=None):
+    """Metrics of report worse than the baseline by more than threshold, as printable lines"""
+    threshold = regression_threshold if threshold is None else threshold
+    if baseline.get('backend') != report.get('backend'):
+        print(f"Warning: comparing a {report.get('backend')} run against a {baseline.get('backend')} baseline")
+    old_metrics = report_metrics(baseline)
+    regressions = []
+    for metric, (value, higher_is_better, unit) in report_metrics(report).items():
+        if metric not in old_metrics:
+            continue
+        old = old_metrics[metric][0]
+        if higher_is_better:
+            worse = value < old / (1 + threshold)
+            change = old / value - 1 if value else float('inf')
+        else:
+            if unit == 's' and max(value, old) < min_compare_seconds:
+                continue
+            worse = value > old * (1 + threshold)
+            change = value / old - 1 if old else float('inf')
+        if worse:
+            regressions.append(f"{metric}: {format_value(old, unit)} -> {format_value(value, unit)} "
+                               f"({change:+.0%} worse)")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data generation, loading and every dashboard "
+                                                 "analysis at several scale factors")
+    parser.add_argument('--sf', type=float, nargs='+', default=list(scale_factors),
+                        help="scale factors to run (SF1 = 400k transactions)")
+    parser.add_argument('--backend', choices=['duckdb', 'mysql'], default='duckdb',
+                        help="duckdb: copy the generated files into a DuckDB file and query it (default; "
+                             "the load phase times DuckDB, not bulk_loader); "
+                             "mysql: load with bulk_loader into an existing fraud_detection schema")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml "
+                                          "instead of bulk_loader's config")
+    parser.add_argument('--shards', type=int, default=1, help="shards per large table for the generator")
+    parser.add_argument('--workers', type=int, default=1, help="generator processes and loader connections")
+    parser.add_argument('--cold-runs', type=int, default=cold_runs)
+    parser.add_argument('--warm-runs', type=int, default=warm_runs)
+    parser.add_argument('--work-dir', help="keep the generated data here instead of a temporary directory")
+    parser.add_argument('--output', default=report_file, help="JSON report to write")
+    parser.add_argument('--baseline', help="report of an earlier commit; exit 1 when a metric regressed")
+    parser.add_argument('--threshold', type=float, default=regression_threshold,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument('--compare-only', action='store_true',
+                        help="compare --output against --baseline without running anything")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare_only:
+        if not args.baseline:
+            print("--compare-only needs --baseline")
+            return 2
+        with open(args.output) as f:
+            report = json.load(f)
+    else:
+        report = run_benchmark(args)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {baseline.get('commit') or args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {baseline.get('commit') or args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
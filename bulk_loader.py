@@ -1,7 +1,28 @@
 import os
+import sys
+import glob
+import time
+import json
+import hashlib
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import mysql.connector
 from mysql.connector import Error
+import schema
+import partitions
+import summary_tables
+import link_graph
+import query_metrics
+import load_validation
+from query_cache import load_log_ddl, load_log_table
+from db_pool import ConnectionPool
 
 # Database connection configuration - UPDATED WITH YOUR CREDENTIALS
 config = {
@@ -9,15 +30,42 @@ config = {
     'database': 'fraud_detection',
     'user': 'root',
     'password': 'Library1',
-    'port': 3306
+    'port': 3306,
+    'allow_local_infile': True
 }
 
 # Folder containing CSV files
 folder = '/Users/LibraryMac/Downloads/PythonProject'
 
+# File format to load: 'auto' uses <name>.parquet when it exists next to <name>.csv
+data_format = 'auto'
+
+# Streaming load settings
+chunk_size = 50000          # rows read from a CSV per chunk; each chunk is one commit
+insert_batch_rows = 1000    # rows per multi-row INSERT statement
+use_load_data = True        # use LOAD DATA LOCAL INFILE when the server allows it
+
+# Check every file against bank_fraud.sql (types, NOT NULL, VARCHAR lengths, foreign keys)
+# before loading; tables that pass are loaded with the server's foreign key checks off
+validate_before_load = True
+
+# Parallel load settings
+parallel_workers = 4        # tables loaded at the same time
+split_workers = 4           # connections used to load one large table
+split_threshold_mb = 100    # files at least this large are split across split_workers
+
+# Incremental load settings
+state_file = os.path.join(folder, '.bulk_loader_state.json')   # file hashes and watermarks of the last run
+# Watermark column per table; other tables use their primary key when it is a single column
+incremental_watermarks = {
+    'transaction_data': 'transaction_id',
+    'login_instance_data': 'login_id',
+    'fraud_alert_data': 'alert_id'
+}
+
 # CSV file to table mapping - ALL your CSV files
 csv_to_table = {
-    'party_table.csv': 'party',
+    'party_table.csv': 'party_table',
     'customer_data.csv': 'customer_data',
     'merchant_data.csv': 'merchant_data',
     'customer_account_data.csv': 'customer_account_data',
@@ -35,10 +83,10 @@ csv_to_table = {
 }
 
 def load_csv_to_mysql(csv_file, table_name, connection):
-    """Load a CSV file into a MySQL table"""
+    """Load a CSV or Parquet file (or list of shard files) into a MySQL table in one go"""
     try:
-        # Read CSV file
-        df = pd.read_csv(csv_file)
+        # Read the whole file, typed like bank_fraud.sql
+        df = pd.concat(read_chunks(csv_file, table_name, chunk_size), ignore_index=True)
         print(f"Loading {csv_file} into table {table_name}...")
         print(f"Found {len(df)} rows in {csv_file}")
         
@@ -46,17 +94,17 @@ def load_csv_to_mysql(csv_file, table_name, connection):
         cursor = connection.cursor()
         
         # Clear existing data with foreign key handling
-        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("SET @fk_checks = @@SESSION.FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS = 0")
         cursor.execute(f"DELETE FROM {table_name}")
-        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = @fk_checks")
         
         # Prepare INSERT statement
         columns = ', '.join(df.columns)
         placeholders = ', '.join(['%s'] * len(df.columns))
         insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
         
-        # Convert DataFrame to list of tuples
-        data = [tuple(row) for row in df.values]
+        # Convert DataFrame to list of tuples (missing values become None)
+        data = list(zip(*chunk_to_columns(df)))
         
         # Execute bulk insert
         cursor.executemany(insert_query, data)
@@ -64,30 +112,920 @@ def load_csv_to_mysql(csv_file, table_name, connection):
         
         print(f"Successfully loaded {len(data)} rows into {table_name}")
         cursor.close()
+        return len(data)
         
     except Error as e:
         print(f"Error loading {csv_file} into {table_name}: {e}")
     except Exception as e:
         print(f"General error loading {csv_file}: {e}")
 
-def main():
+# -------------------
+# Streaming load
+# -------------------
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def server_allows_local_infile(connection):
+    """Check whether the server accepts LOAD DATA LOCAL INFILE"""
+    cursor = connection.cursor()
+    cursor.execute("SHOW GLOBAL VARIABLES LIKE 'local_infile'")
+    row = cursor.fetchone()
+    cursor.close()
+    return row is not None and str(row[1]).upper() in ('ON', '1')
+
+def shard_files(path):
+    """Shard files <name>.part-NNNNN.<ext> written by Create_Tables.py --shards, in order"""
+    stem, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.part-[0-9][0-9][0-9][0-9][0-9]{ext}"))
+
+def resolve_data_file(csv_path, file_format=None):
+    """Pick the file to load for a csv_to_table entry according to data_format.
+
+    Returns a list of shard files instead when the table was generated in shards.
+    """
+    file_format = file_format or data_format
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if file_format == 'parquet' or (file_format == 'auto' and (os.path.exists(parquet_path)
+                                                                or shard_files(parquet_path))):
+        path = parquet_path
+    else:
+        path = csv_path
+    if not os.path.exists(path) and shard_files(path):
+        return shard_files(path)
+    return path
+
+def data_files(data_file):
+    """A data file or list of shard files as a list of paths"""
+    return list(data_file) if isinstance(data_file, (list, tuple)) else [data_file]
+
+def data_exists(data_file):
+    return bool(data_files(data_file)) and all(os.path.exists(path) for path in data_files(data_file))
+
+def data_size(data_file):
+    return sum(os.path.getsize(path) for path in data_files(data_file))
+
+def read_chunks(data_file, table_name, chunk_rows):
+    """Yield DataFrame chunks of a CSV or Parquet file typed like bank_fraud.sql.
+
+    Parquet files are memory-mapped and come back as Arrow-backed columns;
+    CSV files are parsed with explicit dtypes instead of type inference.
+    A list of shard files is read one shard after the other.
+    """
+    if isinstance(data_file, (list, tuple)):
+        for path in data_file:
+            yield from read_chunks(path, table_name, chunk_rows)
+        return
+    table = schema.parse_schema().get(table_name)
+    if data_file.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(data_file, memory_map=True)
+        target = schema.arrow_schema(table, parquet_file.schema_arrow.names) if table else None
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+            batch = pa.Table.from_batches([batch])
+            if target is not None and batch.schema != target:
+                batch = batch.cast(target)
+            yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        dtypes = schema.pandas_dtypes(table) if table else None
+        yield from pd.read_csv(data_file, chunksize=chunk_rows, dtype=dtypes)
+
+def chunk_to_columns(chunk):
+    """Convert each column of a chunk to a list of driver values (missing becomes None).
+
+    The conversion runs column by column in Arrow, with no per-row object round-trip.
+    """
+    return [pa.array(chunk[column], from_pandas=True).to_pylist() for column in chunk.columns]
+
+def insert_rows(cursor, table_name, chunk, update_columns=None, partition=None):
+    """Insert a chunk using multi-row INSERT statements of insert_batch_rows each.
+
+    With update_columns, rows whose key already exists are updated instead
+    (INSERT ... ON DUPLICATE KEY UPDATE). With partition, the statement only
+    touches (and locks) that partition.
+    """
+    columns = list(chunk.columns)
+    values = chunk_to_columns(chunk)
+    column_list = ', '.join(columns)
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    on_duplicate = ''
+    if update_columns:
+        on_duplicate = (" AS new ON DUPLICATE KEY UPDATE "
+                        + ', '.join(f"{column} = new.{column}" for column in update_columns))
+    for start in range(0, len(chunk), insert_batch_rows):
+        batch_rows = min(insert_batch_rows, len(chunk) - start)
+        # Interleave the column slices straight into the flat parameter list
+        params = [None] * (batch_rows * len(columns))
+        for i, column_values in enumerate(values):
+            params[i::len(columns)] = column_values[start:start + batch_rows]
+        target = f"{table_name} PARTITION ({partition})" if partition else table_name
+        insert_query = (f"INSERT INTO {target} ({column_list}) VALUES "
+                        + ', '.join([row_placeholder] * batch_rows) + on_duplicate)
+        cursor.execute(insert_query, params)
+
+def delete_moved_rows(cursor, table_name, chunk, key_columns, column):
+    """Delete the stored rows of a chunk's keys whose partitioning column changed.
+
+    The primary key of a partitioned table also holds that column, so upserting
+    a row with a new timestamp would add a second row instead of updating it.
+    Returns the deleted rows' old values of the column.
+    """
+    columns = key_columns + [column]
+    values = chunk_to_columns(chunk[columns])
+    key_list = '(' + ', '.join(key_columns) + ')'
+    row_list = '(' + ', '.join(columns) + ')'
+    key_placeholder = '(' + ', '.join(['%s'] * len(key_columns)) + ')'
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    moved = []
+    for start in range(0, len(chunk), insert_batch_rows):
+        rows = list(zip(*(column_values[start:start + insert_batch_rows] for column_values in values)))
+        where = (f"WHERE {key_list} IN ({', '.join([key_placeholder] * len(rows))}) "
+                 f"AND {row_list} NOT IN ({', '.join([row_placeholder] * len(rows))})")
+        params = [v for row in rows for v in row[:len(key_columns)]] + [v for row in rows for v in row]
+        cursor.execute(f"SELECT {column} FROM {table_name} {where}", params)
+        found = [row[0] for row in cursor.fetchall()]
+        if found:
+            cursor.execute(f"DELETE FROM {table_name} {where}", params)
+            moved.extend(found)
+    return moved
+
+def load_data_chunk(cursor, table_name, chunk, partition=None):
+    """Push one chunk through LOAD DATA LOCAL INFILE via a temporary file"""
+    batch = pa.Table.from_pandas(chunk, preserve_index=False)
+    # MySQL reads 'true'/'false' as 0 with a warning, so write booleans as 1/0
+    for i, field in enumerate(batch.schema):
+        if pa.types.is_boolean(field.type):
+            batch = batch.set_column(i, field.name, batch.column(i).cast(pa.int8()))
+    with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as tmp:
+        pa_csv.write_csv(batch, tmp, pa_csv.WriteOptions(include_header=False, null_string='NULL'))
+        tmp_path = tmp.name
+    try:
+        columns = ', '.join(chunk.columns)
+        target = f"{table_name} PARTITION ({partition})" if partition else table_name
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{tmp_path}' INTO TABLE {target} "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({columns})"
+        )
+    finally:
+        os.remove(tmp_path)
+
+def clear_table(connection, table_name):
+    """Delete all rows of a table with foreign key checks off (truncate it when partitioned).
+
+    The session's own FOREIGN_KEY_CHECKS setting is restored afterwards.
+    """
+    cursor = connection.cursor()
+    if table_name in partitions.partitioned_tables and partitions.partition_layout(cursor, table_name):
+        cursor.execute(f"ALTER TABLE {table_name} TRUNCATE PARTITION ALL")
+        cursor.close()
+        return
+    cursor.execute("SET @fk_checks = @@SESSION.FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS = 0")
+    cursor.execute(f"DELETE FROM {table_name}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = @fk_checks")
+    connection.commit()
+    cursor.close()
+
+def write_chunk(cursor, table_name, chunk, load_data, layout=None):
+    """Write a chunk, one statement per partition when the table's partition layout is given"""
+    pieces = [(None, chunk)]
+    if layout:
+        pieces = partitions.split_by_partition(chunk, layout, partitions.partitioned_tables[table_name])
+    for partition, rows in pieces:
+        if load_data:
+            load_data_chunk(cursor, table_name, rows, partition)
+        else:
+            insert_rows(cursor, table_name, rows, partition=partition)
+
+def table_layout(connection, table_name):
+    """Partition layout used to route chunks of a partitioned table, None otherwise"""
+    if table_name not in partitions.partitioned_tables:
+        return None
+    cursor = connection.cursor()
+    layout = partitions.partition_layout(cursor, table_name)
+    cursor.close()
+    return layout
+
+def report_progress(table_name, total_rows, start):
+    elapsed = time.perf_counter() - start
+    print(f"  {table_name}: {total_rows:,} rows committed "
+          f"({total_rows / max(elapsed, 1e-9):,.0f} rows/sec, peak RSS {peak_rss_mb():.0f} MB)")
+
+def load_csv_streaming(csv_file, table_name, connection, chunk_rows=None, load_data=None):
+    """Load a CSV file into a MySQL table in chunks, committing after each chunk.
+
+    Returns the number of rows loaded, or None when the load failed.
+    """
+    chunk_rows = chunk_rows or chunk_size
+    load_data = use_load_data if load_data is None else load_data
+    try:
+        print(f"Streaming {csv_file} into table {table_name} ({chunk_rows} rows per chunk)...")
+        clear_table(connection, table_name)
+
+        if load_data and not server_allows_local_infile(connection):
+            print("Server has local_infile disabled, falling back to batched INSERTs")
+            load_data = False
+
+        layout = table_layout(connection, table_name)
+        cursor = connection.cursor()
+        total_rows = 0
+        start = time.perf_counter()
+        for chunk in read_chunks(csv_file, table_name, chunk_rows):
+            write_chunk(cursor, table_name, chunk, load_data, layout)
+            connection.commit()
+            total_rows += len(chunk)
+            report_progress(table_name, total_rows, start)
+
+        elapsed = time.perf_counter() - start
+        print(f"Successfully loaded {total_rows:,} rows into {table_name} in {elapsed:.1f}s")
+        cursor.close()
+        return total_rows
+
+    except Error as e:
+        print(f"Error loading {csv_file} into {table_name}: {e}")
+    except Exception as e:
+        print(f"General error loading {csv_file}: {e}")
+    return None
+
+# -------------------
+# Load log
+# -------------------
+def record_load(connection, table_name, mode, rows, seconds=None):
+    """Append a row to load_log so the dashboard drops its cached results.
+
+    Nothing is recorded for failed loads or incremental runs that changed nothing.
+    With the load's duration, its timing and rows/sec also go to the
+    performance log and metrics file (see query_metrics.py).
+    """
+    if seconds is not None:
+        query_metrics.record_table_load(table_name, mode, rows, seconds)
+    if rows is None or (mode == 'incremental' and rows == 0):
+        return
+    try:
+        cursor = connection.cursor()
+        cursor.execute(load_log_ddl)
+        cursor.execute(f"INSERT INTO {load_log_table} (table_name, load_mode, rows_loaded) VALUES (%s, %s, %s)",
+                       (table_name, mode, rows))
+        connection.commit()
+        cursor.close()
+    except Error as e:
+        print(f"Warning: could not record the load of {table_name} in {load_log_table}: {e}")
+
+# -------------------
+# Incremental load
+# -------------------
+state_lock = threading.Lock()
+
+def read_load_state():
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file) as f:
+        return json.load(f)
+
+def save_table_state(state, table_name, table_state):
+    """Record one table in the state file, replacing the file atomically"""
+    with state_lock:
+        state[table_name] = table_state
+        tmp_path = state_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, state_file)
+
+def file_sha256(data_file):
+    """Hash of a file, or of all shard files in order"""
+    digest = hashlib.sha256()
+    for path in data_files(data_file):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def chunk_digest(chunk):
+    """Content hash of a chunk, independent of its row index"""
+    return hashlib.sha256(pd.util.hash_pandas_object(chunk, index=False).values.tobytes()).hexdigest()
+
+def watermark_column(table_name):
+    if table_name in incremental_watermarks:
+        return incremental_watermarks[table_name]
+    table = schema.parse_schema().get(table_name)
+    if table and len(table.primary_key) == 1:
+        return table.primary_key[0]
+    return None
+
+def load_csv_incremental(csv_file, table_name, connection, state, chunk_rows=None, touched=None):
+    """Apply only what changed in a CSV file since the last incremental run.
+
+    Files whose hash matches the last run are skipped, and so are chunks whose
+    content hash is unchanged. In the remaining chunks, rows past the table's
+    watermark (max of the watermark column in the database) are inserted and
+    all other rows are upserted with INSERT ... ON DUPLICATE KEY UPDATE (in a
+    partitioned table, a row whose timestamp changed replaces the old one). Rows
+    removed from the file are not deleted from the table. Key values the
+    summary tables depend on are collected from written chunks into `touched`.
+    Returns the number of rows written, or None when the load failed.
+    """
+    chunk_rows = chunk_rows or chunk_size
+    try:
+        previous = state.get(table_name, {})
+        file_hash = file_sha256(csv_file)
+        if previous.get('file_hash') == file_hash:
+            print(f"{csv_file} unchanged since the last run, skipping {table_name}")
+            return 0
+
+        table = schema.parse_schema().get(table_name)
+        key_columns = table.primary_key if table else []
+        column = watermark_column(table_name)
+        partition_column = partitions.partitioned_tables[table_name] if table_layout(connection, table_name) else None
+        cursor = connection.cursor()
+        watermark = None
+        if column:
+            cursor.execute(f"SELECT MAX({column}) FROM {table_name}")
+            watermark = cursor.fetchone()[0]
+        print(f"Incremental load of {csv_file} into {table_name} "
+              f"(watermark {column} = {watermark})...")
+
+        # Chunk hashes are only comparable when the chunk boundaries are the same
+        previous_hashes = previous.get('chunk_hashes', []) if previous.get('chunk_rows') == chunk_rows else []
+        chunk_hashes = []
+        inserted = upserted = skipped = 0
+        start = time.perf_counter()
+        for i, chunk in enumerate(read_chunks(csv_file, table_name, chunk_rows)):
+            digest = chunk_digest(chunk)
+            chunk_hashes.append(digest)
+            if i < len(previous_hashes) and previous_hashes[i] == digest:
+                skipped += len(chunk)
+                continue
+
+            if partition_column:
+                chunk = partitions.fill_missing_timestamps(chunk, partition_column)
+            columns = list(chunk.columns)
+            update_columns = [c for c in columns if c not in key_columns] or columns
+            if column is None or watermark is None:
+                new_rows = chunk if watermark is None else chunk.iloc[0:0]
+            elif pd.api.types.is_numeric_dtype(chunk[column]):
+                new_rows = chunk[(chunk[column] > watermark).fillna(False)]
+            else:
+                new_rows = chunk[(pd.to_datetime(chunk[column], errors='coerce') > pd.Timestamp(watermark)).fillna(False)]
+            changed_rows = chunk.drop(new_rows.index)
+
+            # Rows past a primary key watermark cannot collide, so they skip the duplicate check
+            if column in key_columns:
+                insert_rows(cursor, table_name, new_rows)
+            else:
+                insert_rows(cursor, table_name, new_rows, update_columns)
+            if partition_column and key_columns and not changed_rows.empty:
+                moved = delete_moved_rows(cursor, table_name, changed_rows, key_columns, partition_column)
+                if moved and touched is not None:
+                    # The hours the rows moved away from need their rollups refreshed too
+                    summary_tables.touched_keys(table_name, pd.DataFrame({partition_column: moved}), touched)
+            insert_rows(cursor, table_name, changed_rows, update_columns)
+            connection.commit()
+            if touched is not None:
+                summary_tables.touched_keys(table_name, chunk, touched)
+            inserted += len(new_rows)
+            upserted += len(changed_rows)
+            report_progress(table_name, inserted + upserted, start)
+
+        cursor.close()
+        if column:
+            watermark_cursor = connection.cursor()
+            watermark_cursor.execute(f"SELECT MAX({column}) FROM {table_name}")
+            watermark = watermark_cursor.fetchone()[0]
+            watermark_cursor.close()
+        save_table_state(state, table_name, {
+            'file_hash': file_hash,
+            'chunk_rows': chunk_rows,
+            'chunk_hashes': chunk_hashes,
+            'watermark_column': column,
+            'watermark': watermark
+        })
+        print(f"{table_name}: {inserted:,} rows inserted, {upserted:,} upserted, "
+              f"{skipped:,} unchanged rows skipped in {time.perf_counter() - start:.1f}s")
+        return inserted + upserted
+
+    except Error as e:
+        print(f"Error loading {csv_file} into {table_name}: {e}")
+    except Exception as e:
+        print(f"General error loading {csv_file}: {e}")
+    return None
+
+# -------------------
+# Full refresh through a shadow table
+# -------------------
+def secondary_indexes(cursor, table_name):
+    """Secondary index definitions of a live table: [(name, unique, [columns])]"""
+    cursor.execute(
+        "SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY' "
+        "ORDER BY INDEX_NAME, SEQ_IN_INDEX", (table_name,))
+    indexes = {}
+    for index_name, non_unique, column in cursor.fetchall():
+        indexes.setdefault(index_name, (not int(non_unique), []))[1].append(column)
+    return [(name, unique, columns) for name, (unique, columns) in indexes.items()]
+
+def foreign_keys(cursor, table_name=None, referenced_table=None):
+    """Foreign keys declared on table_name, or pointing at referenced_table.
+
+    Returns [(constraint, table, [columns], ref_table, [ref_columns], on_update, on_delete)].
+    """
+    column, value = ('TABLE_NAME', table_name) if table_name else ('REFERENCED_TABLE_NAME', referenced_table)
+    cursor.execute(
+        "SELECT kcu.CONSTRAINT_NAME, kcu.TABLE_NAME, kcu.COLUMN_NAME, kcu.REFERENCED_TABLE_NAME, "
+        "kcu.REFERENCED_COLUMN_NAME, rc.UPDATE_RULE, rc.DELETE_RULE "
+        "FROM information_schema.KEY_COLUMN_USAGE kcu "
+        "JOIN information_schema.REFERENTIAL_CONSTRAINTS rc "
+        "  ON rc.CONSTRAINT_SCHEMA = kcu.CONSTRAINT_SCHEMA AND rc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME "
+        f"WHERE kcu.TABLE_SCHEMA = DATABASE() AND kcu.{column} = %s "
+        "ORDER BY kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.ORDINAL_POSITION", (value,))
+    keys = {}
+    for name, table, col, ref_table, ref_col, on_update, on_delete in cursor.fetchall():
+        key = keys.setdefault((table, name), [name, table, [], ref_table, [], on_update, on_delete])
+        key[2].append(col)
+        key[4].append(ref_col)
+    return [tuple(key) for key in keys.values()]
+
+def foreign_key_clause(name, columns, ref_table, ref_columns, on_update, on_delete):
+    return (f"ADD CONSTRAINT `{name}` FOREIGN KEY ({', '.join(columns)}) "
+            f"REFERENCES {ref_table} ({', '.join(ref_columns)}) "
+            f"ON UPDATE {on_update} ON DELETE {on_delete}")
+
+def repoint_foreign_key(cursor, key, ref_table):
+    """Point a child foreign key at ref_table; if adding it back fails, it is
+    restored on its old target so the child never loses the constraint"""
+    name, child, columns, old_ref_table, ref_columns, on_update, on_delete = key
+    cursor.execute(f"ALTER TABLE {child} DROP FOREIGN KEY `{name}`")
+    try:
+        cursor.execute(f"ALTER TABLE {child} "
+                       + foreign_key_clause(name, columns, ref_table, ref_columns, on_update, on_delete))
+    except Error:
+        cursor.execute(f"ALTER TABLE {child} "
+                       + foreign_key_clause(name, columns, old_ref_table, ref_columns, on_update, on_delete))
+        raise
+
+def finish_swap(cursor, table_name):
+    """Second half of a swap, after the RENAME: point the child foreign keys that
+    followed the old table to <table>__old back at <table>, then drop <table>__old.
+
+    It only acts on what is left, so running it again completes a swap that
+    stopped part way (see finish_swaps).
+    """
+    old_table = f"{table_name}__old"
+    for key in foreign_keys(cursor, referenced_table=old_table):
+        repoint_foreign_key(cursor, key, table_name)
+    cursor.execute(f"DROP TABLE IF EXISTS {old_table}")
+
+def unfinished_swaps(cursor):
+    """Tables whose swap stopped after the RENAME, i.e. that still have a <table>__old"""
+    cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE '%\\_\\_old'")
+    return [row[0][:-len('__old')] for row in cursor.fetchall()]
+
+def finish_swaps(connection):
+    """Complete every swap that stopped after the RENAME (bulk_loader.py --finish-swaps).
+
+    The new data is already live then; this re-points the child foreign keys
+    still on <table>__old and drops it. Returns the tables finished.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SET @fk_checks = @@SESSION.FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS = 0")
+    try:
+        tables = unfinished_swaps(cursor)
+        for table_name in tables:
+            finish_swap(cursor, table_name)
+            print(f"Finished the swap of {table_name}")
+        return tables
+    finally:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = COALESCE(@fk_checks, 1)")
+        cursor.close()
+
+def load_csv_swap(csv_file, table_name, connection, chunk_rows=None, load_data=None):
+    """Fully reload a table without readers ever seeing a partial table.
+
+    The file is streamed into a shadow copy created with CREATE TABLE ... LIKE,
+    with its secondary indexes dropped and foreign key and unique checks off.
+    All indexes are then rebuilt in one ALTER TABLE (a sorted bulk build per
+    index instead of one insert per row), the foreign keys re-added, and the
+    shadow swapped in with a single atomic RENAME TABLE.
+
+    If the re-pointing of child foreign keys or the DROP of <table>__old fails
+    after the RENAME, it is retried once; the new data stays live either way.
+    Should <table>__old still be left, the next swap of the table finishes it
+    first, or run `python bulk_loader.py --finish-swaps`.
+    Returns the number of rows loaded, or None when the load failed.
+    """
+    chunk_rows = chunk_rows or chunk_size
+    load_data = use_load_data if load_data is None else load_data
+    shadow_table = f"{table_name}__shadow"
+    old_table = f"{table_name}__old"
+    cursor = None
+    try:
+        print(f"Refreshing {table_name} from {csv_file} through {shadow_table}...")
+        cursor = connection.cursor()
+        cursor.execute("SET @fk_checks = @@SESSION.FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("SET UNIQUE_CHECKS = 0")
+        # A leftover old table still has child foreign keys pointing at it
+        finish_swap(cursor, table_name)
+        cursor.execute(f"DROP TABLE IF EXISTS {shadow_table}")
+        cursor.execute(f"CREATE TABLE {shadow_table} LIKE {table_name}")
+
+        indexes = secondary_indexes(cursor, shadow_table)
+        if indexes:
+            cursor.execute(f"ALTER TABLE {shadow_table} "
+                           + ', '.join(f"DROP INDEX `{name}`" for name, _, _ in indexes))
+
+        if load_data and not server_allows_local_infile(connection):
+            print("Server has local_infile disabled, falling back to batched INSERTs")
+            load_data = False
+
+        total_rows = 0
+        start = time.perf_counter()
+        for chunk in read_chunks(csv_file, table_name, chunk_rows):
+            write_chunk(cursor, shadow_table, chunk, load_data)
+            connection.commit()
+            total_rows += len(chunk)
+            report_progress(table_name, total_rows, start)
+
+        index_start = time.perf_counter()
+        # CREATE TABLE ... LIKE does not copy foreign keys, so they come from the live table.
+        # Constraint names are schema-wide: '<shadow>_ibfk_N' becomes '<table>_ibfk_N' on rename.
+        clauses = [f"ADD {'UNIQUE ' if unique else ''}INDEX `{name}` ({', '.join(columns)})"
+                   for name, unique, columns in indexes]
+        live_keys = foreign_keys(cursor, table_name=table_name)
+        clauses += [foreign_key_clause(f"{shadow_table}_ibfk_{i}", columns, ref_table, ref_columns, on_update, on_delete)
+                    for i, (_, _, columns, ref_table, ref_columns, on_update, on_delete) in enumerate(live_keys, 1)]
+        if clauses:
+            cursor.execute(f"ALTER TABLE {shadow_table} " + ', '.join(clauses))
+        print(f"  {table_name}: rebuilt {len(indexes)} indexes and {len(live_keys)} foreign keys "
+              f"in {time.perf_counter() - index_start:.1f}s")
+
+        cursor.execute(f"RENAME TABLE {table_name} TO {old_table}, {shadow_table} TO {table_name}")
+
+        # Point child foreign keys that followed the old table back at the new one
+        try:
+            finish_swap(cursor, table_name)
+        except Error as e:
+            print(f"  {table_name}: finishing the swap failed ({e}), retrying once")
+            try:
+                finish_swap(cursor, table_name)
+            except Error:
+                print(f"  {table_name} holds the new rows but {old_table} is left in place: "
+                      f"run `python bulk_loader.py --finish-swaps` to complete the swap")
+                raise
+
+        elapsed = time.perf_counter() - start
+        print(f"Successfully swapped in {total_rows:,} rows for {table_name} in {elapsed:.1f}s")
+        return total_rows
+
+    except Error as e:
+        print(f"Error loading {csv_file} into {table_name}: {e}")
+    except Exception as e:
+        print(f"General error loading {csv_file}: {e}")
+    finally:
+        if cursor:
+            if connection.is_connected():
+                cursor.execute(f"DROP TABLE IF EXISTS {shadow_table}")
+                cursor.execute("SET UNIQUE_CHECKS = 1")
+                cursor.execute("SET FOREIGN_KEY_CHECKS = COALESCE(@fk_checks, 1)")
+            cursor.close()
+    return None
+
+# -------------------
+# Parallel load
+# -------------------
+def load_csv_split(csv_file, table_name, pool, chunk_rows, load_data, workers):
+    """Load one large CSV by spreading its chunks over several pooled connections.
+
+    At most 2 * workers chunks are in memory at once, so RSS stays flat.
+    Returns the number of rows loaded, or None when the load failed.
+    """
+    try:
+        print(f"Streaming {csv_file} into table {table_name} over {workers} connections...")
+        with pool.connection() as connection:
+            clear_table(connection, table_name)
+            layout = table_layout(connection, table_name)
+
+        in_flight = threading.BoundedSemaphore(workers * 2)
+        progress_lock = threading.Lock()
+        total_rows = 0
+        start = time.perf_counter()
+
+        def insert_chunk(chunk):
+            nonlocal total_rows
+            try:
+                with pool.connection() as connection:
+                    cursor = connection.cursor()
+                    write_chunk(cursor, table_name, chunk, load_data, layout)
+                    connection.commit()
+                    cursor.close()
+            finally:
+                in_flight.release()
+            with progress_lock:
+                total_rows += len(chunk)
+                report_progress(table_name, total_rows, start)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for chunk in read_chunks(csv_file, table_name, chunk_rows):
+                in_flight.acquire()
+                futures.append(executor.submit(insert_chunk, chunk))
+            for future in futures:
+                future.result()
+
+        elapsed = time.perf_counter() - start
+        print(f"Successfully loaded {total_rows:,} rows into {table_name} in {elapsed:.1f}s")
+        return total_rows
+
+    except Error as e:
+        print(f"Error loading {csv_file} into {table_name}: {e}")
+    except Exception as e:
+        print(f"General error loading {csv_file}: {e}")
+    return None
+
+def load_shards(shard_paths, table_name, pool, chunk_rows, load_data, workers):
+    """Load the shard files of one table concurrently, one pooled connection per shard.
+
+    Each shard is read and written independently, so parsing runs in parallel
+    as well as the inserts. Returns the number of rows loaded, or None when
+    the load failed.
+    """
+    try:
+        print(f"Streaming {len(shard_paths)} shards into table {table_name} over {workers} connections...")
+        with pool.connection() as connection:
+            clear_table(connection, table_name)
+            layout = table_layout(connection, table_name)
+
+        progress_lock = threading.Lock()
+        total_rows = 0
+        start = time.perf_counter()
+
+        def load_shard(path):
+            nonlocal total_rows
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                for chunk in read_chunks(path, table_name, chunk_rows):
+                    write_chunk(cursor, table_name, chunk, load_data, layout)
+                    connection.commit()
+                    with progress_lock:
+                        total_rows += len(chunk)
+                        report_progress(table_name, total_rows, start)
+                cursor.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(load_shard, path) for path in shard_paths]:
+                future.result()
+
+        elapsed = time.perf_counter() - start
+        print(f"Successfully loaded {total_rows:,} rows into {table_name} in {elapsed:.1f}s")
+        return total_rows
+
+    except Error as e:
+        print(f"Error loading shards of {table_name}: {e}")
+    except Exception as e:
+        print(f"General error loading shards of {table_name}: {e}")
+    return None
+
+def load_tables_parallel(jobs, workers=None, chunk_rows=None, load_data=None, table_workers=None,
+                         mode='stream', foreign_key_checks=True):
+    """Load {table_name: csv_path} concurrently in foreign key dependency order.
+
+    A table starts as soon as every table it references in bank_fraud.sql has
+    finished, so the total time follows the slowest dependency chain rather
+    than the sum of all tables. Tables whose parent failed are skipped.
+    Pass foreign_key_checks=False only for files that passed validate_jobs().
+    """
+    workers = workers or parallel_workers
+    table_workers = table_workers or split_workers
+    chunk_rows = chunk_rows or chunk_size
+    load_data = use_load_data if load_data is None else load_data
+
+    graph = schema.dependency_graph(schema.parse_schema(), jobs)
+    schema.load_levels(graph)  # raises on a foreign key cycle
+    pool = ConnectionPool(workers + table_workers, **connection_config(foreign_key_checks))
+    with pool.connection() as connection:
+        if load_data and not server_allows_local_infile(connection):
+            print("Server has local_infile disabled, falling back to batched INSERTs")
+            load_data = False
+
+    state = read_load_state() if mode == 'incremental' else None
+    touched = {} if mode == 'incremental' else None
+
+    def load_job(table_name):
+        table_start = time.perf_counter()
+        rows = load_table(table_name)
+        with pool.connection() as connection:
+            record_load(connection, table_name, mode, rows, time.perf_counter() - table_start)
+        return rows
+
+    def load_table(table_name):
+        csv_path = jobs[table_name]
+        if mode == 'incremental':
+            with pool.connection() as connection:
+                return load_csv_incremental(csv_path, table_name, connection, state, chunk_rows, touched)
+        if mode == 'swap':
+            with pool.connection() as connection:
+                return load_csv_swap(csv_path, table_name, connection, chunk_rows, load_data)
+        if table_workers > 1 and len(data_files(csv_path)) > 1:
+            return load_shards(csv_path, table_name, pool, chunk_rows, load_data, table_workers)
+        if table_workers > 1 and data_size(csv_path) >= split_threshold_mb * 1024 * 1024:
+            return load_csv_split(csv_path, table_name, pool, chunk_rows, load_data, table_workers)
+        with pool.connection() as connection:
+            return load_csv_streaming(csv_path, table_name, connection, chunk_rows, load_data)
+
+    waiting = {table_name: set(parents) for table_name, parents in graph.items()}
+    loaded, failed = set(), set()
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while waiting or running:
+            # Start the largest ready files first, they dominate the critical path
+            for table_name in sorted(waiting, key=lambda t: -data_size(jobs[t])):
+                parents = waiting[table_name]
+                if parents & failed:
+                    print(f"Skipping {table_name}: parent table(s) {sorted(parents & failed)} failed to load")
+                    failed.add(table_name)
+                    del waiting[table_name]
+                elif parents <= loaded:
+                    running[executor.submit(load_job, table_name)] = table_name
+                    del waiting[table_name]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table_name = running.pop(future)
+                (failed if future.result() is None else loaded).add(table_name)
+
+    with pool.connection() as connection:
+        summary_tables.refresh_after_load(connection, loaded, touched)
+        link_graph.update_after_load(connection, loaded, touched)
+    pool.close_all()
+    print(f"Loaded {len(loaded)} tables in {time.perf_counter() - start:.1f}s"
+          + (f", {len(failed)} failed: {sorted(failed)}" if failed else ""))
+    return loaded, failed
+
+def load_tables_sequential(jobs, connection, mode='stream', chunk_rows=None, load_data=None):
+    """Load {table_name: csv_path} one table at a time over one connection.
+
+    Tables are loaded in foreign key dependency order, and tables whose parent
+    failed are skipped, as in load_tables_parallel: with foreign key checks
+    off the server would otherwise accept their orphan rows.
+    Returns (loaded, failed, touched) where touched is None unless incremental.
+    """
+    graph = schema.dependency_graph(schema.parse_schema(), jobs)
+    state = read_load_state() if mode == 'incremental' else None
+    touched = {} if mode == 'incremental' else None
+    loaded, failed = [], set()
+
+    for table_name in [name for level in schema.load_levels(graph) for name in level]:
+        csv_path = jobs[table_name]
+        if graph[table_name] & failed:
+            print(f"Skipping {table_name}: parent table(s) {sorted(graph[table_name] & failed)} failed to load")
+            failed.add(table_name)
+            continue
+        table_start = time.perf_counter()
+        if mode == 'stream':
+            rows = load_csv_streaming(csv_path, table_name, connection,
+                                      chunk_rows=chunk_rows, load_data=load_data)
+        elif mode == 'incremental':
+            rows = load_csv_incremental(csv_path, table_name, connection, state,
+                                        chunk_rows=chunk_rows, touched=touched)
+        elif mode == 'swap':
+            rows = load_csv_swap(csv_path, table_name, connection,
+                                 chunk_rows=chunk_rows, load_data=load_data)
+        else:
+            rows = load_csv_to_mysql(csv_path, table_name, connection)
+        record_load(connection, table_name, mode, rows, time.perf_counter() - table_start)
+        if rows is None:
+            failed.add(table_name)
+        else:
+            loaded.append(table_name)
+    return loaded, failed, touched
+
+# -------------------
+# Validation before load
+# -------------------
+def connection_config(foreign_key_checks=True):
+    """Connection settings; without foreign_key_checks every session (reconnects
+    included) starts with the server's per-row foreign key checks off"""
+    if foreign_key_checks:
+        return config
+    return {**config, 'init_command': "SET FOREIGN_KEY_CHECKS = 0"}
+
+def data_jobs(file_format=None):
+    """{table_name: data path} of the csv_to_table files present in folder, in every mode"""
+    jobs = {}
+    for csv_file, table_name in csv_to_table.items():
+        data_path = resolve_data_file(os.path.join(folder, csv_file), file_format)
+        if data_exists(data_path):
+            jobs[table_name] = data_path
+        else:
+            print(f"Warning: {data_path} not found, skipping...")
+    return jobs
+
+def validate_jobs(jobs, workers=None):
+    """Validate the files of {table_name: data path} before loading them (see load_validation.py).
+
+    Tables with problems are reported and dropped, together with every table
+    referencing them. Foreign keys to tables outside jobs are checked against
+    the database. Returns (jobs left to load, whether every foreign key was
+    checked); only then is it safe to load with foreign key checks off.
+    """
+    tables = schema.parse_schema()
+    outside = {fk.ref_table for table_name in jobs if table_name in tables
+               for fk in tables[table_name].foreign_keys if fk.ref_table not in jobs}
+    connection = None
+    if outside:
+        try:
+            connection = mysql.connector.connect(**config)
+        except Error as e:
+            print(f"Warning: could not read the keys of {sorted(outside)} from MySQL: {e}")
+    try:
+        report = load_validation.validate_tables(jobs, connection, workers)
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+    load_validation.print_report(report)
+    blocked = load_validation.blocked_tables(report, jobs)
+    for table_name in sorted(blocked - set(report)):
+        print(f"Skipping {table_name}: it references a table that failed validation")
+    return ({table_name: path for table_name, path in jobs.items() if table_name not in blocked},
+            connection is not None or not outside)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load the fraud detection CSV files into MySQL")
+    parser.add_argument('--mode', choices=['stream', 'incremental', 'swap', 'full'], default='stream',
+                        help="stream: chunked load with a commit per chunk (default); "
+                             "incremental: insert new rows and upsert changed ones, skipping unchanged files; "
+                             "swap: full refresh into a shadow table swapped in atomically with RENAME TABLE; "
+                             "full: read each file whole and insert it in one commit")
+    parser.add_argument('--chunk-size', type=int, default=chunk_size,
+                        help="rows per chunk in stream mode")
+    parser.add_argument('--no-load-data', action='store_true',
+                        help="always use batched INSERTs instead of LOAD DATA LOCAL INFILE")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="load independent tables in parallel over this many connections "
+                             f"(all modes except full, e.g. {parallel_workers})")
+    parser.add_argument('--split-workers', type=int, default=split_workers,
+                        help=f"connections used for one table larger than {split_threshold_mb} MB")
+    parser.add_argument('--format', choices=['auto', 'csv', 'parquet'], default=data_format,
+                        help="input files to load; auto prefers <name>.parquet over <name>.csv")
+    parser.add_argument('--no-validate', action='store_true', default=not validate_before_load,
+                        help="skip the validation of the files against bank_fraud.sql and load "
+                             "with the server's foreign key checks on")
+    parser.add_argument('--validate-only', action='store_true',
+                        help="validate the files and report problems without loading anything")
+    parser.add_argument('--finish-swaps', action='store_true',
+                        help="complete swap-mode refreshes that stopped after swapping in the new table "
+                             "(re-point child foreign keys still on <table>__old and drop it), then exit")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.finish_swaps:
+        connection = None
+        try:
+            connection = mysql.connector.connect(**config)
+            finished = finish_swaps(connection)
+            print(f"Finished {len(finished)} swap(s)" if finished else "No unfinished swaps")
+        except Error as e:
+            print(f"Error finishing swaps: {e}")
+        finally:
+            if connection and connection.is_connected():
+                connection.close()
+        return
+    jobs = data_jobs(args.format)
+    foreign_key_checks = True
+    if args.validate_only or not args.no_validate:
+        jobs, fully_checked = validate_jobs(jobs, args.workers)
+        if args.validate_only:
+            return
+        foreign_key_checks = not fully_checked
+        if foreign_key_checks:
+            print("Not every foreign key could be validated, loading with foreign key checks on")
+
+    if args.workers > 1 and args.mode != 'full':
+        try:
+            load_tables_parallel(jobs, args.workers, args.chunk_size,
+                                 not args.no_load_data, args.split_workers, args.mode, foreign_key_checks)
+            print("\nBulk loading completed!")
+        except Error as e:
+            print(f"Error connecting to MySQL: {e}")
+        return
+
     connection = None
     try:
         # Connect to MySQL
-        connection = mysql.connector.connect(**config)
+        connection = mysql.connector.connect(**connection_config(foreign_key_checks))
         
         if connection.is_connected():
             print("Connected to MySQL database")
+            loaded, failed, touched = load_tables_sequential(jobs, connection, args.mode, args.chunk_size,
+                                                             not args.no_load_data)
             
-            # Load each CSV file
-            for csv_file, table_name in csv_to_table.items():
-                csv_path = os.path.join(folder, csv_file)
-                
-                if os.path.exists(csv_path):
-                    load_csv_to_mysql(csv_path, table_name, connection)
-                else:
-                    print(f"Warning: {csv_path} not found, skipping...")
-            
+            summary_tables.refresh_after_load(connection, loaded, touched)
+            link_graph.update_after_load(connection, loaded, touched)
+            if failed:
+                print(f"\n{len(failed)} table(s) failed or were skipped: {sorted(failed)}")
             print("\nBulk loading completed!")
             
     except Error as e:
@@ -99,4 +1037,4 @@ def main():
             print("MySQL connection closed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,191 @@
+import time
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import Error
+
+
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections shared between threads.
+
+    Connections are opened lazily up to `size`; once they are all checked out,
+    get_connection() blocks until another thread releases one. With
+    `ping_after` set, a connection that sat idle longer than that many seconds
+    is pinged on checkout and reopened transparently when the server dropped it.
+
+    Each connection keeps up to `statement_cache_size` server-side prepared
+    statements (see prepared()), dropped when it reconnects or closes.
+    """
+
+    def __init__(self, size, ping_after=None, statement_cache_size=64, **connect_args):
+        self.size = size
+        self.ping_after = ping_after
+        self.statement_cache_size = statement_cache_size
+        self._connect_args = connect_args
+        self._statements = {}              # id(connection) -> OrderedDict(sql -> (cursor, sql))
+        self._prepares = 0
+        self._statement_hits = 0
+        self._idle = queue.LifoQueue()     # (connection, released_at)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def get_connection(self, timeout=None):
+        start = time.perf_counter()
+        conn = self._checkout(timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _checkout(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open_if_allowed()
+                if conn is not None:
+                    return conn
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                conn, released_at = self._idle.get(timeout=remaining)
+            conn = self._health_check(conn, released_at)
+            if conn is not None:
+                return conn
+
+    def _open_if_allowed(self):
+        with self._lock:
+            if self._opened >= self.size:
+                return None
+            self._opened += 1
+        try:
+            return mysql.connector.connect(**self._connect_args)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _health_check(self, conn, released_at):
+        """Ping a connection that was idle too long; None when it is gone for good"""
+        if self.ping_after is None or time.monotonic() - released_at < self.ping_after:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Error:
+            pass
+        # Statements prepared on the old session are gone either way
+        self.forget_statements(conn)
+        try:
+            conn.reconnect(attempts=1)
+            with self._lock:
+                self._reconnects += 1
+            return conn
+        except Error:
+            # Free the slot so the next attempt can open a fresh connection
+            with self._lock:
+                self._opened -= 1
+            return None
+
+    def prepared(self, conn, sql_query):
+        """A prepared-statement cursor for sql_query on a checked-out connection.
+
+        Returns (cursor, operation); execute `operation` (not an equal copy of
+        the text): the cursor only skips re-preparing for the very string it
+        prepared. The server parses the statement once per connection, but
+        MySQL still optimizes it on every execution (the plan can depend on
+        the parameter values), so reuse saves the parse and the text round
+        trip, not the planning. The least recently used statements beyond
+        statement_cache_size are closed.
+        """
+        with self._lock:
+            statements = self._statements.setdefault(id(conn), OrderedDict())
+            entry = statements.get(sql_query)
+            if entry is not None:
+                statements.move_to_end(sql_query)
+                self._statement_hits += 1
+                return entry
+            self._prepares += 1
+        entry = (conn.cursor(prepared=True), sql_query)
+        with self._lock:
+            statements[sql_query] = entry
+            evicted = []
+            while len(statements) > self.statement_cache_size:
+                evicted.append(statements.popitem(last=False)[1][0])
+        for cursor in evicted:
+            cursor.close()
+        return entry
+
+    def forget_statement(self, conn, sql_query):
+        """Drop one cached statement, e.g. after it failed and its cursor state is unknown"""
+        with self._lock:
+            entry = self._statements.get(id(conn), {}).pop(sql_query, None)
+        if entry is not None:
+            try:
+                entry[0].close()
+            except Error:
+                pass
+
+    def forget_statements(self, conn):
+        with self._lock:
+            statements = self._statements.pop(id(conn), {})
+        for cursor, _ in statements.values():
+            try:
+                cursor.close()
+            except Error:
+                pass
+
+    def release(self, connection):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put((connection, time.monotonic()))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.get_connection(timeout)
+        try:
+            yield conn
+        except Exception:
+            # Never hand a connection with a half-done transaction to the next caller
+            if conn.is_connected():
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Pool usage and the time callers spent waiting for a connection"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'opened': self._opened,
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'reconnects': self._reconnects,
+                'wait_avg_ms': 1000 * self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_max_ms': 1000 * self._wait_max,
+                'statements': sum(len(statements) for statements in self._statements.values()),
+                'statement_hits': self._statement_hits,
+                'prepares': self._prepares,
+            }
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.forget_statements(conn)
+            if conn.is_connected():
+                conn.close()
+            with self._lock:
+                self._opened -= 1
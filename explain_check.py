@@ -0,0 +1,114 @@
+import sys
+import json
+import argparse
+import mysql.connector
+from mysql.connector import Error
+from fraud_queries import query_map
+from migrations import connect_args
+
+# Plans may scan or sort at most this many estimated rows without an index
+max_unindexed_rows = 10000
+
+# -------------------
+# Plan inspection
+# -------------------
+def plan_problems(plan, max_rows=None):
+    """Full table scans and filesorts in an EXPLAIN FORMAT=JSON plan above max_rows.
+
+    Sorting the result of a GROUP BY (ORDER BY COUNT(*) DESC) is allowed, it
+    only sorts the groups; a filesort used to do the grouping itself is not.
+    Materialized derived tables (<derivedN>) are skipped, their own plan is
+    checked where it is nested.
+    """
+    max_rows = max_unindexed_rows if max_rows is None else max_rows
+    problems = []
+
+    def rows_below(node):
+        """Largest row estimate of any table read below a plan node"""
+        if isinstance(node, dict):
+            rows = 0
+            if isinstance(node.get('table'), dict):
+                rows = node['table'].get('rows_examined_per_scan', 0)
+            return max([rows] + [rows_below(value) for value in node.values()])
+        if isinstance(node, list):
+            return max([0] + [rows_below(item) for item in node])
+        return 0
+
+    def walk(node, key=None):
+        if isinstance(node, list):
+            for item in node:
+                walk(item, key)
+            return
+        if not isinstance(node, dict):
+            return
+        if key == 'table':
+            name = node.get('table_name', '?')
+            rows = node.get('rows_examined_per_scan', 0)
+            if node.get('access_type') == 'ALL' and not name.startswith('<') and rows > max_rows:
+                problems.append(f"full table scan of {name} (~{rows:,} rows)")
+        if node.get('using_filesort'):
+            sorts_groups = key == 'ordering_operation' and 'grouping_operation' in node
+            rows = rows_below(node)
+            if not sorts_groups and rows > max_rows:
+                problems.append(f"filesort in {key or 'query_block'} over ~{rows:,} rows")
+        for child_key, value in node.items():
+            walk(value, child_key)
+
+    walk(plan)
+    return problems
+
+def explain(cursor, sql_query):
+    cursor.execute("EXPLAIN FORMAT=JSON " + sql_query)
+    return json.loads(cursor.fetchone()[0])
+
+def check_queries(connection, max_rows=None, queries=None):
+    """EXPLAIN every query_map entry; returns {analysis name: [problems]} for the failing ones"""
+    queries = queries or query_map
+    cursor = connection.cursor()
+    try:
+        # MySQL 8.3+ can emit a newer JSON layout; the checks read the classic one
+        cursor.execute("SET SESSION explain_json_format_version = 1")
+    except Error:
+        pass
+    failures = {}
+    for name, sql_query in queries.items():
+        if ' FROM ' not in sql_query.upper():
+            continue
+        problems = plan_problems(explain(cursor, sql_query), max_rows)
+        print(f"{'FAIL' if problems else 'ok':<5} {name}")
+        for problem in problems:
+            print(f"        {problem}")
+        if problems:
+            failures[name] = problems
+    cursor.close()
+    return failures
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fail when a dashboard query plan falls back to a full table scan or a filesort")
+    parser.add_argument('--max-rows', type=int, default=max_unindexed_rows,
+                        help="estimated rows a scan or sort may touch without failing")
+    parser.add_argument('--secrets', help="read the connection from the [mysql] section of this secrets.toml "
+                                          "instead of bulk_loader's config")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    connection = None
+    try:
+        connection = mysql.connector.connect(**connect_args(args.secrets))
+        failures = check_queries(connection, args.max_rows)
+    except Error as e:
+        print(f"Plan check could not run: {e}")
+        return 2
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+    if failures:
+        print(f"\n{len(failures)} query plan(s) regressed; run migrations.py or add an index")
+        return 1
+    print("\nAll query plans use indexes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
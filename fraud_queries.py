@@ -0,0 +1,184 @@
+import re
+from dataclasses import dataclass
+
+# -------------------
+# Query parameters
+# -------------------
+@dataclass
+class Param:
+    """A tunable whole number of an analysis (window, threshold, limit), shown as a sidebar control"""
+    name: str
+    label: str
+    default: int
+    min_value: int = 1
+    max_value: int = None
+
+    def coerce(self, value):
+        value = int(value)
+        value = max(value, self.min_value)
+        return value if self.max_value is None else min(value, self.max_value)
+
+# Parameters appear in the SQL below as %(name)s
+_param_re = re.compile(r"%\((\w+)\)s")
+
+# -------------------
+# Sliding windows over the hourly login rollups
+# -------------------
+# A window [NOW() - n DAY, NOW()] is read as the raw logins of its first,
+# partial hour plus whole hourly buckets from the next hour boundary on, so
+# the work depends on the window length and not on the raw login volume.
+def window_start(param='days'):
+    return f"NOW() - INTERVAL %({param})s DAY"
+
+def first_full_hour(param='days'):
+    start = window_start(param)
+    return f"TIMESTAMP(DATE({start}), MAKETIME(HOUR({start}), 0, 0)) + INTERVAL 1 HOUR"
+
+# -------------------
+# SQL Query Definitions
+# -------------------
+# The login analyses read the hourly rollups kept up to date by bulk_loader (see summary_tables.py)
+query_sql = {
+"Top Failed Logins (7 days)": """
+    SELECT cd.party_id, cd.phone_number, SUM(lhp.failed) AS failed_logins
+    FROM customer_data cd
+    JOIN login_hourly_party lhp ON cd.party_id = lhp.party_id
+    GROUP BY cd.party_id, cd.phone_number
+    HAVING SUM(lhp.failed) > %(min_failures)s
+    ORDER BY failed_logins DESC
+    LIMIT %(limit)s
+""",
+
+    "Accounts with >5 Failures (1 day)": f"""
+        SELECT cad.account_id, SUM(w.failed) AS failed_attempts, MAX(w.last_failed_at) AS last_failed_attempt
+        FROM (
+            SELECT lhp.party_id, lhp.failed, lhp.last_failed_at
+            FROM login_hourly_party lhp
+            WHERE lhp.hour >= {first_full_hour()} AND lhp.failed > 0
+            UNION ALL
+            SELECT lid.party_id, 1, lid.timestamp
+            FROM login_instance_data lid
+            WHERE lid.successful = FALSE
+              AND lid.timestamp >= {window_start()} AND lid.timestamp < {first_full_hour()}
+        ) w
+        JOIN customer_account_data cad ON w.party_id = cad.party_id
+        GROUP BY cad.account_id
+        HAVING failed_attempts > %(min_failures)s
+        ORDER BY failed_attempts DESC
+    """,
+    "High Device Failures": f"""
+        SELECT w.device_id, SUM(w.failed) AS failure_count
+        FROM (
+            SELECT lhd.device_id, lhd.failed
+            FROM login_hourly_device lhd
+            WHERE lhd.hour >= {first_full_hour()} AND lhd.failed > 0
+            UNION ALL
+            SELECT lid.device_id, 1
+            FROM login_instance_data lid
+            WHERE lid.successful = FALSE
+              AND lid.timestamp >= {window_start()} AND lid.timestamp < {first_full_hour()}
+        ) w
+        GROUP BY w.device_id
+        HAVING failure_count > %(min_failures)s
+        ORDER BY failure_count DESC
+    """,
+    "Multi-Account Access via Device": f"""
+        SELECT w.device_id, COUNT(DISTINCT cad.account_id) AS distinct_accounts_accessed
+        FROM (
+            SELECT lhdp.device_id, lhdp.party_id
+            FROM login_hourly_device_party lhdp
+            WHERE lhdp.hour >= {first_full_hour()}
+            UNION
+            SELECT lid.device_id, lid.party_id
+            FROM login_instance_data lid
+            WHERE lid.timestamp >= {window_start()} AND lid.timestamp < {first_full_hour()}
+        ) w
+        JOIN customer_account_data cad ON w.party_id = cad.party_id
+        GROUP BY w.device_id
+        HAVING COUNT(DISTINCT cad.account_id) > %(min_accounts)s
+        ORDER BY distinct_accounts_accessed DESC
+    """,
+    "Multi-Location Access (60 mins)": f"""
+        SELECT lid.party_id, COUNT(DISTINCT lid.location_id) AS location_count,
+               MIN(lid.timestamp) AS first_access, MAX(lid.timestamp) AS last_access
+        FROM login_instance_data lid
+        WHERE lid.timestamp >= {window_start()}
+        GROUP BY lid.party_id
+        HAVING location_count > %(min_locations)s
+           AND TIMESTAMPDIFF(MINUTE, first_access, last_access) <= %(minutes)s
+        ORDER BY location_count DESC
+    """,
+    "Blacklisted Devices Access": """
+        SELECT '⚠️ No blacklist flag available in device_data' AS message
+    """,
+    # Both alert analyses read party_alert_summary, kept up to date by bulk_loader
+    # (see summary_tables.py); each open alert is counted once per account of the party
+    "Parties with Active Fraud Alerts": """
+        SELECT pas.party_id
+        FROM party_alert_summary pas
+    """,
+    "Multiple Alerts per Party": """
+        SELECT pas.party_id,
+               pas.associated_accounts,
+               pas.open_alert_count AS fraud_alert_count
+        FROM party_alert_summary pas
+        WHERE pas.open_alert_count > %(min_alerts)s
+        ORDER BY fraud_alert_count DESC
+    """
+}
+
+# Tunable values of each analysis; the defaults reproduce the names above
+query_params = {
+    "Top Failed Logins (7 days)": [
+        Param('min_failures', "More failed logins than", 1, min_value=0),
+        Param('limit', "Parties shown", 10, max_value=10000)],
+    "Accounts with >5 Failures (1 day)": [
+        Param('days', "Window (days)", 1, max_value=365),
+        Param('min_failures', "More failures than", 5, min_value=0)],
+    "High Device Failures": [
+        Param('days', "Window (days)", 7, max_value=365),
+        Param('min_failures', "More failures than", 10, min_value=0)],
+    "Multi-Account Access via Device": [
+        Param('days', "Window (days)", 7, max_value=365),
+        Param('min_accounts', "More accounts than", 3, min_value=0)],
+    "Multi-Location Access (60 mins)": [
+        Param('days', "Window (days)", 1, max_value=365),
+        Param('min_locations', "More locations than", 1),
+        Param('minutes', "Within (minutes)", 60, max_value=7 * 24 * 60)],
+    "Multiple Alerts per Party": [
+        Param('min_alerts', "More open alerts than", 1, min_value=0)],
+}
+
+def default_values(query_name):
+    return {param.name: param.default for param in query_params.get(query_name, [])}
+
+def bind(query_name, values=None):
+    """SQL of an analysis with %s placeholders, and its parameter values in placeholder order.
+
+    The SQL text only depends on the analysis, so a prepared statement for it
+    can be reused whatever the values.
+    """
+    params = {param.name: param for param in query_params.get(query_name, [])}
+    values = {**default_values(query_name), **(values or {})}
+    ordered = [params[name].coerce(values[name]) for name in _param_re.findall(query_sql[query_name])]
+    return _param_re.sub('%s', query_sql[query_name]), ordered
+
+def render(query_name, values=None):
+    """SQL of an analysis with its (whole number) values written in, for tools that run plain SQL text"""
+    sql_query, params = bind(query_name, values)
+    literals = iter(params)
+    return re.sub('%s', lambda _: str(next(literals)), sql_query)
+
+# Every analysis with its default values, as plain SQL
+query_map = {query_name: render(query_name) for query_name in query_sql}
+
+# Columns that uniquely order each query's rows, used to fetch one page at a time
+page_keys = {
+    "Top Failed Logins (7 days)": [("failed_logins", "DESC"), ("party_id", "ASC")],
+    "Accounts with >5 Failures (1 day)": [("failed_attempts", "DESC"), ("account_id", "ASC")],
+    "High Device Failures": [("failure_count", "DESC"), ("device_id", "ASC")],
+    "Multi-Account Access via Device": [("distinct_accounts_accessed", "DESC"), ("device_id", "ASC")],
+    "Multi-Location Access (60 mins)": [("location_count", "DESC"), ("party_id", "ASC")],
+    "Parties with Active Fraud Alerts": [("party_id", "ASC")],
+    "Multiple Alerts per Party": [("fraud_alert_count", "DESC"), ("party_id", "ASC")]
+}
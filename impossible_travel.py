@@ -0,0 +1,331 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+from transaction_scoring import frame_to_arrays, concat_arrays
+
+# -------------------
+# Detection settings
+# -------------------
+max_speed_kmh = 900             # faster than an airliner between two logins is impossible travel
+min_distance_km = 100           # shorter jumps are left to geolocation noise
+min_gap_seconds = 60            # simultaneous logins are timed as this far apart
+
+grid_cell_degrees = 1.0         # cell size of the spatial index
+earth_radius_km = 6371.0088
+
+read_chunk_rows = 1_000_000
+login_columns = ['login_id', 'party_id', 'location_id', 'timestamp']
+
+# -------------------
+# Coordinates
+# -------------------
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between points given in degrees (arrays broadcast)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * earth_radius_km * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class Coordinates:
+    """Latitude/longitude of every location in float32 arrays indexed by location_id.
+
+    Unknown ids (and locations without coordinates) read as NaN, so a lookup
+    for a whole column of logins is one fancy-indexing pass.
+    """
+
+    def __init__(self, location_ids, latitudes, longitudes):
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        valid = location_ids >= 0
+        size = int(location_ids[valid].max()) + 1 if valid.any() else 0
+        self.lat = np.full(size, np.nan, dtype=np.float32)
+        self.lon = np.full(size, np.nan, dtype=np.float32)
+        self.lat[location_ids[valid]] = np.asarray(latitudes, dtype=np.float32)[valid]
+        self.lon[location_ids[valid]] = np.asarray(longitudes, dtype=np.float32)[valid]
+        # Radians and cos(latitude) per location, so distances need no per-login trigonometry
+        # on them; one NaN slot past the end stands for unknown ids
+        self._lat_rad = np.append(np.radians(self.lat), np.float32(np.nan))
+        self._lon_rad = np.append(np.radians(self.lon), np.float32(np.nan))
+        self._cos_lat = np.cos(self._lat_rad)
+
+    def path_km(self, location_ids):
+        """Haversine distance from each location of a sequence to the next one (float32, NaN when unknown)"""
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        location_ids = np.where((location_ids >= 0) & (location_ids < len(self.lat)), location_ids, len(self.lat))
+        # Each location is read once; the hops are differences of neighbouring elements
+        lat, lon, cos_lat = self._lat_rad[location_ids], self._lon_rad[location_ids], self._cos_lat[location_ids]
+        half_dlat = np.diff(lat) * np.float32(0.5)
+        half_dlon = np.diff(lon) * np.float32(0.5)
+        a = np.sin(half_dlat) ** 2 + cos_lat[:-1] * cos_lat[1:] * np.sin(half_dlon) ** 2
+        return np.float32(2 * earth_radius_km) * np.arcsin(np.sqrt(np.minimum(a, np.float32(1))))
+
+class LocationGrid:
+    """Spatial index of locations on a grid of grid_cell_degrees cells.
+
+    Location ids are sorted by cell and each cell points at its slice
+    (CSR layout), so a radius query reads only the cells overlapping the
+    circle's bounding box and then checks exact distances.
+    """
+
+    def __init__(self, coordinates, cell_degrees=None):
+        self.coordinates = coordinates
+        self.cell = cell_degrees or grid_cell_degrees
+        self.rows = int(np.ceil(180 / self.cell))
+        self.columns = int(np.ceil(360 / self.cell))
+        location_ids = np.flatnonzero(~np.isnan(coordinates.lat) & ~np.isnan(coordinates.lon))
+        cells = self._cells(coordinates.lat[location_ids], coordinates.lon[location_ids])
+        order = np.argsort(cells, kind='stable')
+        self.location_ids = location_ids[order]
+        self.offsets = np.searchsorted(cells[order], np.arange(self.rows * self.columns + 1))
+
+    def _cells(self, lat, lon):
+        row = np.clip(((np.asarray(lat) + 90) // self.cell).astype(np.int64), 0, self.rows - 1)
+        column = np.clip(((np.asarray(lon) + 180) // self.cell).astype(np.int64), 0, self.columns - 1)
+        return row * self.columns + column
+
+    def near(self, lat, lon, radius_km):
+        """(location ids, distances in km) of locations within radius_km of a point, nearest first"""
+        lat_span = np.degrees(radius_km / earth_radius_km)
+        first_row = max(int((lat - lat_span + 90) // self.cell), 0)
+        last_row = min(int((lat + lat_span + 90) // self.cell), self.rows - 1)
+        pole_distance = 90 - max(abs(lat - lat_span), abs(lat + lat_span))
+        if pole_distance <= 0:
+            columns = np.arange(self.columns)
+        else:
+            # Longitude degrees shrink with cos(latitude); use the widest latitude of the box
+            lon_span = lat_span / np.cos(np.radians(90 - pole_distance))
+            if lon_span >= 180:
+                columns = np.arange(self.columns)
+            else:
+                first = int((lon - lon_span + 180) // self.cell)
+                last = int((lon + lon_span + 180) // self.cell)
+                columns = np.unique(np.arange(first, last + 1) % self.columns)
+        cells = (np.arange(first_row, last_row + 1)[:, None] * self.columns + columns[None, :]).ravel()
+        starts, ends = self.offsets[cells], self.offsets[cells + 1]
+        lengths = ends - starts
+        # Concatenated ranges starts[i]..ends[i] without a Python loop
+        positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        candidates = self.location_ids[positions]
+        distances = haversine_km(lat, lon, self.coordinates.lat[candidates], self.coordinates.lon[candidates])
+        inside = distances <= radius_km
+        order = np.argsort(distances[inside], kind='stable')
+        return candidates[inside][order], distances[inside][order]
+
+def logins_near(logins, grid, lat, lon, radius_km, since=None):
+    """Logins (DataFrame) at locations within radius_km of a point, optionally since epoch seconds"""
+    location_ids, distances = grid.near(lat, lon, radius_km)
+    mask = np.isin(logins['location_id'], location_ids)
+    if since is not None:
+        mask &= logins['timestamp'] >= since
+    found = pd.DataFrame({column: values[mask] for column, values in logins.items()})
+    found['distance_km'] = pd.Series(distances, index=location_ids).reindex(found['location_id']).to_numpy()
+    found['timestamp'] = pd.to_datetime(found['timestamp'], unit='s')
+    return found.sort_values('distance_km', kind='stable').reset_index(drop=True)
+
+# -------------------
+# Impossible travel
+# -------------------
+def consecutive_hops(logins, coordinates):
+    """Distance, elapsed time and implied speed between each login and the party's previous one.
+
+    Logins are ordered by party then time with one sort; the previous login
+    of sorted row i is row i - 1 whenever both belong to the same party, so
+    the hops are computed over contiguous slices of the sorted columns.
+    Logins of a party within the same second come in no particular order.
+    Returns (input rows of the later logins, of the earlier logins,
+    distance km, seconds, speed km/h).
+    """
+    party, ts = logins['party_id'], logins['timestamp']
+    rows = np.flatnonzero((party >= 0) & (ts != np.iinfo(np.int64).min))
+    offsets = ts[rows] - ts[rows].min() if len(rows) else ts[rows]
+    if len(rows) and offsets.max() < 2 ** 32 and party[rows].max() < 2 ** 31:
+        # Party and time packed into one int64 sort key: one argsort instead of a multi-key
+        # lexsort, and both sorted columns come back out of the sorted key
+        key = (party[rows] << 32) | offsets
+        order = np.argsort(key)
+        key = key[order]
+        sorted_party, sorted_ts = key >> 32, key & 0xFFFFFFFF
+    else:
+        order = np.lexsort((ts[rows], party[rows]))
+        sorted_party, sorted_ts = party[rows][order], ts[rows][order]
+    rows = rows[order]
+
+    same_party = sorted_party[1:] == sorted_party[:-1]
+    distance = coordinates.path_km(logins['location_id'][rows])
+    seconds = np.diff(sorted_ts)
+    speed = distance / (np.maximum(seconds, min_gap_seconds) / np.float32(3600))
+    return (rows[1:][same_party], rows[:-1][same_party],
+            distance[same_party], seconds[same_party], speed[same_party])
+
+def impossible_travel(logins, coordinates, max_speed=None, min_distance=None):
+    """Consecutive login pairs of a party implying travel faster than max_speed (km/h), as a DataFrame"""
+    max_speed = max_speed_kmh if max_speed is None else max_speed
+    min_distance = min_distance_km if min_distance is None else min_distance
+    current, previous, distance, seconds, speed = consecutive_hops(logins, coordinates)
+    # NaN distances (unknown locations) compare False and are never flagged
+    flagged = (speed > max_speed) & (distance >= min_distance)
+    current, previous = current[flagged], previous[flagged]
+    result = pd.DataFrame({
+        'party_id': logins['party_id'][current],
+        'previous_login_id': logins['login_id'][previous],
+        'login_id': logins['login_id'][current],
+        'from_location_id': logins['location_id'][previous],
+        'to_location_id': logins['location_id'][current],
+        'previous_time': pd.to_datetime(logins['timestamp'][previous], unit='s'),
+        'time': pd.to_datetime(logins['timestamp'][current], unit='s'),
+        'distance_km': distance[flagged],
+        'hours': seconds[flagged] / 3600,
+        'speed_kmh': speed[flagged],
+    })
+    return result.round({'distance_km': 1, 'hours': 3, 'speed_kmh': 0})
+
+class TravelState:
+    """Last login of every party seen so far, so batches can be checked as they arrive.
+
+    Each batch is checked together with the previous login of its parties;
+    logins should arrive roughly in time order across batches. The state is
+    saved between runs, so a later run only reads the logins past
+    last_login_id.
+    """
+
+    def __init__(self):
+        self.last = concat_arrays([], login_columns)
+        self.last_login_id = 0
+
+    def check(self, batch, coordinates, max_speed=None, min_distance=None):
+        carried = np.isin(self.last['party_id'], batch['party_id'])
+        combined = concat_arrays([{c: self.last[c][carried] for c in login_columns},
+                                  {c: batch[c] for c in login_columns}], login_columns)
+        flagged = impossible_travel(combined, coordinates, max_speed, min_distance)
+        # Keep the latest login per party across the old state and the batch
+        merged = concat_arrays([self.last, combined], login_columns)
+        order = np.lexsort((merged['login_id'], merged['timestamp'], merged['party_id']))
+        last = np.r_[merged['party_id'][order][1:] != merged['party_id'][order][:-1], True]
+        self.last = {c: merged[c][order][last] for c in login_columns}
+        if len(batch['login_id']):
+            self.last_login_id = max(self.last_login_id, int(batch['login_id'].max()))
+        return flagged
+
+    def save(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, last_login_id=np.int64(self.last_login_id), **self.last)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        state = cls()
+        state.last = {c: data[c] for c in login_columns}
+        state.last_login_id = int(data['last_login_id'])
+        return state
+
+# -------------------
+# Reading the inputs
+# -------------------
+def read_coordinates_frame(df):
+    return Coordinates(pd.to_numeric(df['location_id'], errors='coerce').to_numpy(dtype=np.int64, na_value=-1),
+                       pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+                       pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan))
+
+def after(logins, after_id):
+    if after_id is None:
+        return logins
+    keep = logins['login_id'] > after_id
+    return {column: values[keep] for column, values in logins.items()}
+
+def read_files(data_dir, file_format='auto', after_id=None):
+    """(Coordinates, login arrays) from the generated CSV/Parquet files, optionally only logins past after_id"""
+    from bulk_loader import read_chunks, resolve_data_file
+    locations = pd.concat(read_chunks(resolve_data_file(os.path.join(data_dir, 'location_data.csv'), file_format),
+                                      'location_data', read_chunk_rows), ignore_index=True)
+    logins = concat_arrays([
+        after(frame_to_arrays(chunk[login_columns]), after_id) for chunk in read_chunks(
+            resolve_data_file(os.path.join(data_dir, 'login_instance_data.csv'), file_format),
+            'login_instance_data', read_chunk_rows)], login_columns)
+    return read_coordinates_frame(locations), logins
+
+def read_database(connection, after_id=None):
+    """(Coordinates, login arrays) from MySQL, optionally only logins past after_id"""
+    from result_export import iter_result_chunks
+    locations = pd.concat(iter_result_chunks(connection, "SELECT location_id, latitude, longitude FROM location_data",
+                                             None, read_chunk_rows), ignore_index=True)
+    sql = f"SELECT {', '.join(login_columns)} FROM login_instance_data"
+    params = None
+    if after_id is not None:
+        sql += " WHERE login_id > %s"
+        params = (after_id,)
+    logins = concat_arrays([frame_to_arrays(chunk) for chunk in iter_result_chunks(
+        connection, sql, params, read_chunk_rows)], login_columns)
+    return read_coordinates_frame(locations), logins
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Flag consecutive logins of a party that imply impossible travel")
+    parser.add_argument('--data-dir', help="read the generated CSV/Parquet files instead of MySQL")
+    parser.add_argument('--format', choices=['auto', 'csv', 'parquet'], default='auto')
+    parser.add_argument('--max-speed', type=float, default=max_speed_kmh, help="km/h above which travel is flagged")
+    parser.add_argument('--min-distance', type=float, default=min_distance_km,
+                        help="ignore hops shorter than this many km")
+    parser.add_argument('--near', nargs=3, type=float, metavar=('LAT', 'LON', 'KM'),
+                        help="list logins within KM of a point instead")
+    parser.add_argument('--state', help="only check the logins past the previous run with this state file "
+                                        "(against each party's last login seen), then update it")
+    parser.add_argument('--output', help="write the flagged pairs to this .csv/.parquet file")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml")
+    args = parser.parse_args(argv)
+    if args.state and args.near:
+        parser.error("--near lists every login, it does not take --state")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    connection = None
+    try:
+        state = None
+        if args.state:
+            state = TravelState.load(args.state) if os.path.exists(args.state) else TravelState()
+        after_id = state.last_login_id if state else None
+        start = time.perf_counter()
+        if args.data_dir:
+            coordinates, logins = read_files(args.data_dir, args.format, after_id)
+        else:
+            from migrations import connect_args
+            connection = mysql.connector.connect(**connect_args(args.secrets))
+            coordinates, logins = read_database(connection, after_id)
+        print(f"Read {len(logins['login_id']):,} logins and {len(coordinates.lat):,} location slots "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        if args.near:
+            lat, lon, radius = args.near
+            result = logins_near(logins, LocationGrid(coordinates), lat, lon, radius)
+            print(f"{len(result):,} logins within {radius:g} km of ({lat:g}, {lon:g}) "
+                  f"in {time.perf_counter() - start:.2f}s")
+        else:
+            if state:
+                result = state.check(logins, coordinates, args.max_speed, args.min_distance)
+                state.save(args.state)
+            else:
+                result = impossible_travel(logins, coordinates, args.max_speed, args.min_distance)
+            elapsed = time.perf_counter() - start
+            print(f"Checked {len(logins['login_id']):,} logins in {elapsed:.2f}s "
+                  f"({len(logins['login_id']) / max(elapsed, 1e-9):,.0f}/sec), "
+                  f"{len(result):,} impossible travel pairs")
+        if args.output:
+            result.to_parquet(args.output, index=False) if args.output.endswith('.parquet') \
+                else result.to_csv(args.output, index=False)
+            print(f"Wrote {args.output}")
+        else:
+            print(result.head(20).to_string(index=False))
+        return 0
+    except Error as e:
+        print(f"Impossible travel check failed: {e}")
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
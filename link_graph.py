@@ -0,0 +1,318 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+
+# Where the graph is persisted between runs (read by the dashboard)
+graph_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'link_graph.npz')
+
+node_kinds = ('device', 'party', 'account')
+
+read_chunk_rows = 500_000
+account_batch_size = 1000       # parties per account link query of an incremental update
+
+# -------------------
+# Union-find index
+# -------------------
+class LinkGraph:
+    """Connected components of the device - party - account graph.
+
+    A login links its device to its party and customer_account_data links a
+    party to its accounts, so a component is a ring of devices and accounts
+    reachable through shared logins. Nodes live in NumPy arrays and a batch
+    of links is merged as a union-find over whole arrays: the roots of both
+    ends are hooked to the smaller one and paths are compressed by pointer
+    jumping, until every link joins one root. Roots are kept fully
+    compressed, so after a batch a cluster lookup is one array read. New ids
+    are merged into the sorted id index of their kind, and the per-cluster
+    counts, ranking and member lists are rebuilt once, on the first query
+    after links were added, rather than after every batch.
+
+    Links are never removed: the graph covers every login it was given, and
+    a rebuild (optionally limited to recent days) is how old links go away.
+    """
+
+    def __init__(self):
+        self.kinds = np.empty(0, dtype=np.int8)     # node -> kind number (position in node_kinds)
+        self.ids = np.empty(0, dtype=np.int64)      # node -> entity id
+        self.root = np.empty(0, dtype=np.int64)     # node -> smallest node of its cluster
+        self.last_login_id = 0
+        self._index()
+
+    def __len__(self):
+        return len(self.root)
+
+    def _index(self):
+        """Sort the ids of each kind for lookups (on creation and load; batches merge into it)"""
+        self._ids_by_kind, self._nodes_by_kind = [], []
+        for kind in range(len(node_kinds)):
+            nodes = np.flatnonzero(self.kinds == kind)
+            order = np.argsort(self.ids[nodes], kind='stable')
+            self._ids_by_kind.append(self.ids[nodes][order])
+            self._nodes_by_kind.append(nodes[order])
+        self._summarized = False
+
+    def _summarize(self):
+        """Rebuild the per-cluster counts, ranking and member lists if links were added since"""
+        if self._summarized:
+            return
+        n = len(self.root)
+        # devices, parties, accounts per root
+        self.counts = np.stack([np.bincount(self.root, weights=self.kinds == kind, minlength=n).astype(np.int64)
+                                for kind in range(len(node_kinds))]) if n else np.zeros((len(node_kinds), 0), np.int64)
+        roots = np.flatnonzero(self.root == np.arange(n))
+        roots = roots[self.counts[:, roots].sum(axis=0) > 1]
+        devices, _, accounts = self.counts
+        self._ranking = roots[np.lexsort((-devices[roots], -accounts[roots]))]
+        self._member_order = np.argsort(self.root, kind='stable')
+        self._member_roots = self.root[self._member_order]
+        self._summarized = True
+
+    def _lookup(self, kind, ids):
+        """(node of each id or -1, whether it exists) for entity ids of one kind"""
+        known = self._ids_by_kind[kind]
+        if not len(known):
+            return np.full(len(ids), -1, dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(known, ids), len(known) - 1)
+        found = known[positions] == ids
+        return np.where(found, self._nodes_by_kind[kind][positions], -1), found
+
+    def _nodes(self, kind, ids):
+        """Nodes of entity ids of one kind, creating the ones not seen before as their own clusters"""
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        nodes, found = self._lookup(kind, unique_ids)
+        new_ids = unique_ids[~found]
+        new_nodes = np.arange(len(self.root), len(self.root) + len(new_ids))
+        nodes[~found] = new_nodes
+        # new_ids are sorted and absent from the index, so they merge in without a re-sort
+        positions = np.searchsorted(self._ids_by_kind[kind], new_ids)
+        self._ids_by_kind[kind] = np.insert(self._ids_by_kind[kind], positions, new_ids)
+        self._nodes_by_kind[kind] = np.insert(self._nodes_by_kind[kind], positions, new_nodes)
+        self.kinds = np.concatenate([self.kinds, np.full(len(new_ids), kind, dtype=np.int8)])
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.root = np.concatenate([self.root, new_nodes])
+        return nodes[inverse]
+
+    def add_links(self, kind_a, ids_a, kind_b, ids_b):
+        """Link entity pairs given as arrays; missing ids (negative) are skipped"""
+        ids_a, ids_b = np.asarray(ids_a, dtype=np.int64), np.asarray(ids_b, dtype=np.int64)
+        keep = (ids_a >= 0) & (ids_b >= 0)
+        # Repeated logins of the same party on the same device add nothing; ids are
+        # INT columns, so a pair packs into one int64 and dedupes with a 1-d sort
+        pairs = np.sort((ids_a[keep] << 32) | ids_b[keep])
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        a = self._nodes(kind_a, pairs >> 32)
+        b = self._nodes(kind_b, pairs & 0xFFFFFFFF)
+        root = self.root
+        while True:
+            root_a, root_b = root[a], root[b]
+            apart = root_a != root_b
+            if not apart.any():
+                break
+            a, b, root_a, root_b = a[apart], b[apart], root_a[apart], root_b[apart]
+            # Hook the larger root under the smaller one; several hooks on one root keep the smallest
+            np.minimum.at(root, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+            while True:
+                jumped = root[root]
+                if np.array_equal(jumped, root):
+                    break
+                root = jumped
+        self.root = root
+        self._summarized = False
+        return len(pairs)
+
+    def add_logins(self, login_ids, party_ids, device_ids):
+        if len(login_ids):
+            self.last_login_id = max(self.last_login_id, int(np.max(login_ids)))
+        return self.add_links(node_kinds.index('device'), device_ids, node_kinds.index('party'), party_ids)
+
+    def add_accounts(self, party_ids, account_ids):
+        return self.add_links(node_kinds.index('party'), party_ids, node_kinds.index('account'), account_ids)
+
+    # -------------------
+    # Queries
+    # -------------------
+    def _summary(self, root):
+        self._summarize()
+        devices, parties, accounts = self.counts[:, root].tolist()
+        return {'cluster_id': int(root), 'devices': devices, 'parties': parties, 'accounts': accounts}
+
+    def cluster(self, kind, entity_id):
+        """Counts of the cluster an entity belongs to, None when it was never linked"""
+        nodes, found = self._lookup(node_kinds.index(kind), np.array([entity_id], dtype=np.int64))
+        return self._summary(self.root[nodes[0]]) if found[0] else None
+
+    def largest(self, n=10):
+        """The n clusters with the most accounts (then devices)"""
+        self._summarize()
+        return pd.DataFrame([self._summary(root) for root in self._ranking[:n]],
+                            columns=['cluster_id', 'devices', 'parties', 'accounts'])
+
+    def members(self, cluster_id, limit=None):
+        """Entities of a cluster as a DataFrame of (kind, id)"""
+        self._summarize()
+        first = np.searchsorted(self._member_roots, cluster_id, side='left')
+        last = np.searchsorted(self._member_roots, cluster_id, side='right')
+        nodes = self._member_order[first:last][:limit]
+        return pd.DataFrame({'kind': np.asarray(node_kinds, dtype=object)[self.kinds[nodes]],
+                             'id': self.ids[nodes]})
+
+    # -------------------
+    # Persistence
+    # -------------------
+    def save(self, path=None):
+        path = path or graph_file
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, kinds=self.kinds, ids=self.ids, root=self.root,
+                            last_login_id=np.int64(self.last_login_id))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        data = np.load(path or graph_file)
+        graph = cls()
+        graph.kinds, graph.ids, graph.root = data['kinds'], data['ids'], data['root']
+        graph.last_login_id = int(data['last_login_id'])
+        graph._index()
+        return graph
+
+# -------------------
+# Building and updating
+# -------------------
+def _int_column(chunk, column):
+    return pd.to_numeric(chunk[column], errors='coerce').to_numpy(dtype=np.int64, na_value=-1)
+
+def add_login_chunks(graph, chunks):
+    rows = 0
+    for chunk in chunks:
+        graph.add_logins(_int_column(chunk, 'login_id'), _int_column(chunk, 'party_id'),
+                         _int_column(chunk, 'device_id'))
+        rows += len(chunk)
+    return rows
+
+def add_account_chunks(graph, chunks):
+    rows = 0
+    for chunk in chunks:
+        graph.add_accounts(_int_column(chunk, 'party_id'), _int_column(chunk, 'account_id'))
+        rows += len(chunk)
+    return rows
+
+def update_from_database(connection, graph=None, days=None, account_parties=None):
+    """Add the logins past graph.last_login_id (all logins for a new graph) and the account links.
+
+    With days, only logins of the last `days` days are read. customer_account_data
+    has no column telling new rows apart, so every account link is read unless
+    account_parties names the parties whose links were written (bulk_loader's
+    incremental runs collect them); an empty set reads none.
+    """
+    from result_export import iter_result_chunks
+    graph = graph or LinkGraph()
+    sql = "SELECT login_id, party_id, device_id FROM login_instance_data WHERE login_id > %s"
+    params = [graph.last_login_id]
+    if days is not None:
+        sql += " AND timestamp >= NOW() - INTERVAL %s DAY"
+        params.append(days)
+    logins = add_login_chunks(graph, iter_result_chunks(connection, sql, params, read_chunk_rows))
+    if account_parties is None:
+        accounts = add_account_chunks(graph, iter_result_chunks(
+            connection, "SELECT party_id, account_id FROM customer_account_data", None, read_chunk_rows))
+    else:
+        party_ids = sorted(account_parties)
+        accounts = 0
+        for i in range(0, len(party_ids), account_batch_size):
+            batch = party_ids[i:i + account_batch_size]
+            accounts += add_account_chunks(graph, iter_result_chunks(
+                connection, f"SELECT party_id, account_id FROM customer_account_data "
+                            f"WHERE party_id IN ({', '.join(['%s'] * len(batch))})", batch, read_chunk_rows))
+    print(f"Linked {logins:,} logins and {accounts:,} account rows ({len(graph):,} nodes)")
+    return graph
+
+def build_from_files(data_dir, file_format='auto', days=None):
+    from bulk_loader import read_chunks, resolve_data_file
+    graph = LinkGraph()
+    login_chunks = read_chunks(resolve_data_file(os.path.join(data_dir, 'login_instance_data.csv'), file_format),
+                               'login_instance_data', read_chunk_rows)
+    if days is not None:
+        cutoff = pd.Timestamp.now() - pd.Timedelta(days=days)
+        login_chunks = (chunk[pd.to_datetime(chunk['timestamp'], errors='coerce', format='ISO8601') >= cutoff]
+                        for chunk in login_chunks)
+    logins = add_login_chunks(graph, login_chunks)
+    accounts = add_account_chunks(graph, read_chunks(
+        resolve_data_file(os.path.join(data_dir, 'customer_account_data.csv'), file_format),
+        'customer_account_data', read_chunk_rows))
+    print(f"Linked {logins:,} logins and {accounts:,} account rows ({len(graph):,} nodes)")
+    return graph
+
+def update_after_load(connection, loaded_tables, touched=None):
+    """Keep the persisted graph in step with bulk_loader.
+
+    After an incremental load (touched is not None) only the new logins and the
+    account links of the parties written to customer_account_data are added;
+    a full reload of logins or accounts rebuilds the graph, since links cannot
+    be removed.
+    """
+    if not {'login_instance_data', 'customer_account_data'} & set(loaded_tables):
+        return
+    try:
+        graph = LinkGraph.load() if touched is not None and os.path.exists(graph_file) else None
+        account_parties = touched.get('customer_account_data', set()) if graph else None
+        update_from_database(connection, graph, account_parties=account_parties).save()
+        print(f"{'Updated' if graph else 'Rebuilt'} the device-account link graph in {graph_file}")
+    except Error as e:
+        print(f"Warning: could not update the device-account link graph: {e}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build, update and query the device-account link graph")
+    parser.add_argument('command', choices=['build', 'update', 'top', 'cluster'])
+    parser.add_argument('--graph', default=graph_file, help="graph file to read and write")
+    parser.add_argument('--data-dir', help="build from the generated CSV/Parquet files instead of MySQL")
+    parser.add_argument('--format', choices=['auto', 'csv', 'parquet'], default='auto')
+    parser.add_argument('--days', type=int, help="build from the logins of the last DAYS days only")
+    parser.add_argument('-n', type=int, default=10, help="clusters listed by top")
+    parser.add_argument('--kind', choices=node_kinds, default='device', help="entity kind looked up by cluster")
+    parser.add_argument('--id', type=int, help="entity id looked up by cluster")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml")
+    args = parser.parse_args(argv)
+    if args.command == 'cluster' and args.id is None:
+        parser.error("cluster needs --id")
+    if args.command == 'update' and args.data_dir:
+        parser.error("update reads new logins from MySQL; rebuild from files with build --data-dir")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command in ('top', 'cluster'):
+        graph = LinkGraph.load(args.graph)
+        if args.command == 'top':
+            print(graph.largest(args.n).to_string(index=False))
+            return 0
+        found = graph.cluster(args.kind, args.id)
+        if found is None:
+            print(f"No {args.kind} {args.id} in the graph")
+            return 1
+        print(found)
+        print(graph.members(found['cluster_id'], limit=50).to_string(index=False))
+        return 0
+
+    if args.data_dir:
+        build_from_files(args.data_dir, args.format, args.days).save(args.graph)
+        return 0
+    connection = None
+    try:
+        from migrations import connect_args
+        connection = mysql.connector.connect(**connect_args(args.secrets))
+        graph = LinkGraph.load(args.graph) if args.command == 'update' and os.path.exists(args.graph) else None
+        update_from_database(connection, graph, args.days).save(args.graph)
+        return 0
+    except Error as e:
+        print(f"Graph update failed: {e}")
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import os
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import schema
+
+# Rows checked at a time (Parquet); CSV files are read in blocks of csv_block_bytes
+batch_rows = 200000
+csv_block_bytes = 16 * 1024 * 1024
+
+validation_workers = 4      # tables (and parent key sets) checked at the same time
+max_examples = 10           # offending rows listed per check; all of them are counted
+
+# Range of each MySQL integer type
+_int_ranges = {
+    'tinyint': (-2 ** 7, 2 ** 7 - 1), 'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'mediumint': (-2 ** 23, 2 ** 23 - 1), 'int': (-2 ** 31, 2 ** 31 - 1), 'bigint': (-2 ** 63, 2 ** 63 - 1)
+}
+_int_re = r'^[+-]?\d{1,19}$'
+_float_re = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+_date_re = r'^\d{4}-\d{2}-\d{2}$'
+_datetime_re = r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,6})?$'
+_bool_values = pa.array(['0', '1', 'true', 'false'])
+
+
+# -------------------
+# Report
+# -------------------
+@dataclass
+class Violation:
+    table: str
+    check: str             # 'column', 'type', 'null', 'length' or 'foreign_key'
+    column: str
+    detail: str            # expected type, or the referenced table and column
+    count: int = 0
+    examples: list = field(default_factory=list)   # (file, row, value), row numbered from 1 within the file
+
+    def add(self, path, first_row, rows, values):
+        """Record offending rows of a batch: positions `rows` within it and their values"""
+        self.count += len(rows)
+        for row, value in zip(rows[:max_examples - len(self.examples)], values):
+            self.examples.append((path, first_row + int(row) + 1, value))
+
+
+def print_report(report):
+    for table_name, violations in sorted(report.items()):
+        print(f"{table_name}: {len(violations)} problem(s) found, table will not be loaded")
+        for v in violations:
+            rows = f": {v.count:,} rows" if v.check != 'column' else ''
+            print(f"  {v.check} {v.column} ({v.detail}){rows}")
+            for path, row, value in v.examples:
+                text = repr(value)
+                print(f"    {os.path.basename(path)} row {row}: {text[:60] + '...' if len(text) > 60 else text}")
+
+
+def blocked_tables(report, jobs):
+    """Tables with problems plus every table that references one of them, directly or not"""
+    graph = schema.dependency_graph(schema.parse_schema(), jobs)
+    blocked = set(report)
+    for level in schema.load_levels(graph):
+        blocked.update(name for name in level if graph[name] & blocked)
+    return blocked
+
+
+# -------------------
+# Reading
+# -------------------
+def read_batches(data_file, table, columns=None):
+    """Yield (path, first_row, RecordBatch) of a CSV or Parquet file, or of a list of shards.
+
+    Nothing is converted to the table's types: CSV columns are read as text,
+    so a value that would not parse is seen exactly as written.
+    """
+    for path in data_file if isinstance(data_file, (list, tuple)) else [data_file]:
+        if path.endswith('.parquet'):
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            names = [name for name in parquet_file.schema_arrow.names if columns is None or name in columns]
+            batches = parquet_file.iter_batches(batch_size=batch_rows, columns=names)
+        else:
+            batches = pa_csv.open_csv(
+                path, read_options=pa_csv.ReadOptions(block_size=csv_block_bytes),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={c.name: pa.string() for c in table.columns},
+                    strings_can_be_null=True, include_columns=columns or []))
+        first_row = 0
+        for batch in batches:
+            yield path, first_row, batch
+            first_row += batch.num_rows
+
+
+# -------------------
+# Column checks
+# -------------------
+def sql_type(column):
+    if column.sql_type == 'decimal':
+        return f"decimal({column.length or 10},{column.scale or 0})"
+    return f"{column.sql_type}({column.length})" if column.length else column.sql_type
+
+
+def _text(values):
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    return values if pa.types.is_string(values.type) else values.cast(pa.string())
+
+
+def _round_trips(values, pattern, text_format, width):
+    """Text matching pattern whose first `width` characters parse as text_format and format back unchanged
+    (strptime alone would roll 2024-02-30 over to March)"""
+    matched = pc.match_substring_regex(values, pattern)
+    head = pc.replace_substring(pc.utf8_slice_codeunits(pc.if_else(matched, values, '1970-01-01 00:00:00'),
+                                                        0, width), 'T', ' ')
+    parsed = pc.strptime(head, format=text_format, unit='s', error_is_null=True)
+    return pc.and_(matched, pc.fill_null(pc.equal(pc.strftime(parsed, format=text_format), head), False))
+
+
+def _valid_text(values, column):
+    """Whether each text value is accepted as is by the column's MySQL type (null stays null)"""
+    sql_type = column.sql_type
+    if (sql_type, column.length) == ('tinyint', 1):
+        return pc.is_in(pc.utf8_lower(values), value_set=_bool_values)
+    if sql_type in _int_ranges:
+        low, high = _int_ranges[sql_type]
+        matched = pc.match_substring_regex(values, _int_re)
+        number = pc.cast(pc.if_else(matched, values, '0'), pa.float64())
+        return pc.and_(matched, pc.and_(pc.greater_equal(number, float(low)), pc.less_equal(number, float(high))))
+    if sql_type in ('float', 'double'):
+        return pc.match_substring_regex(values, _float_re)
+    if sql_type == 'decimal':
+        whole_digits = (column.length or 10) - (column.scale or 0)
+        return pc.and_(pc.match_substring_regex(values, rf'^[+-]?0*\d{{0,{whole_digits}}}(\.\d*)?$'),
+                       pc.match_substring_regex(values, r'\d'))
+    if sql_type == 'date':
+        return _round_trips(values, _date_re, '%Y-%m-%d', 10)
+    if sql_type in ('datetime', 'timestamp'):
+        return _round_trips(values, _datetime_re, '%Y-%m-%d %H:%M:%S', 19)
+    return None
+
+
+def invalid_rows(values, column):
+    """Mask of non-null values the column's MySQL type would reject or silently mangle.
+
+    Columns already stored with the column's Arrow type (typed Parquet) pass as
+    they are; other non-text columns pass when a safe cast to it succeeds, which
+    checks integer ranges and decimal precision for the whole column at once.
+    Only when that fails, and for CSV text, are the values matched against the
+    type's text pattern (still a whole column at once) to find the offending rows.
+    """
+    target = schema.arrow_type(column)
+    if values.type == target or pa.types.is_null(values.type) or pa.types.is_string(target):
+        return None
+    if not (pa.types.is_string(values.type) or pa.types.is_dictionary(values.type)):
+        try:
+            values.cast(target, safe=not pa.types.is_temporal(target))
+            return None
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    valid = _valid_text(_text(values), column)
+    if valid is None:
+        return None
+    invalid = pc.invert(pc.fill_null(valid, True)).to_numpy(zero_copy_only=False)
+    return invalid if invalid.any() else None
+
+
+def too_long(values, column):
+    """Mask of text values longer than a VARCHAR/CHAR column's length in characters"""
+    if column.sql_type not in ('varchar', 'char') or not column.length:
+        return None
+    longer = pc.fill_null(pc.greater(pc.utf8_length(_text(values)), column.length), False).to_numpy(zero_copy_only=False)
+    return longer if longer.any() else None
+
+
+def key_values(values, column, invalid=None):
+    """(row positions, key values as a numpy array) of the non-null, well-typed values of a key column"""
+    keep = ~np.asarray(values.is_null().to_numpy(zero_copy_only=False))
+    if invalid is not None:
+        keep &= ~invalid
+    rows = np.flatnonzero(keep)
+    keys = values.filter(pa.array(keep))
+    if not pa.types.is_string(schema.arrow_type(column)):
+        keys = (_text(keys) if pa.types.is_dictionary(keys.type) else keys).cast(
+            schema.arrow_type(column), safe=False)
+    return rows, keys.to_numpy(zero_copy_only=False)
+
+
+# -------------------
+# Parent key sets
+# -------------------
+def sorted_keys(keys):
+    """Sorted distinct keys (np.unique hashes integers first, several times slower than sorting here)"""
+    keys = np.sort(keys)
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+
+
+def contained(keys, key_set):
+    """Vectorized membership of keys in a sorted key set, by binary search"""
+    if not len(key_set):
+        return np.zeros(len(keys), dtype=bool)
+    found = np.minimum(np.searchsorted(key_set, keys), len(key_set) - 1)
+    return key_set[found] == keys
+
+
+def file_keys(data_file, table, column_name):
+    """Sorted distinct values of one column of a data file"""
+    column = table.column(column_name)
+    chunks = []
+    for _, _, batch in read_batches(data_file, table, [column_name]):
+        if batch.num_columns:
+            values = batch.column(0)
+            chunks.append(key_values(values, column, invalid_rows(values, column))[1])
+    return sorted_keys(np.concatenate(chunks)) if chunks else np.array([])
+
+
+def database_keys(connection, table_name, column_name):
+    """Sorted distinct values of a column of a table already in the database"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT DISTINCT {column_name} FROM {table_name} WHERE {column_name} IS NOT NULL")
+    keys = sorted_keys(np.array([row[0] for row in cursor.fetchall()]))
+    cursor.close()
+    return keys
+
+
+def parent_key_sets(jobs, connection=None, workers=None):
+    """{(table, column): sorted keys} of every column referenced by a foreign key of a table in jobs.
+
+    Parents loaded in the same run are read from their files; other parents
+    come from the database when a connection is given and are left out otherwise.
+    """
+    tables = schema.parse_schema()
+    referenced = sorted({(fk.ref_table, fk.ref_column) for name in jobs if name in tables
+                         for fk in tables[name].foreign_keys})
+    from_files = [key for key in referenced if key[0] in jobs]
+    with ThreadPoolExecutor(max_workers=workers or validation_workers) as executor:
+        key_sets = dict(zip(from_files, executor.map(
+            lambda key: file_keys(jobs[key[0]], tables[key[0]], key[1]), from_files)))
+    for ref_table, ref_column in referenced:
+        if ref_table in jobs:
+            continue
+        if connection is None:
+            print(f"Warning: {ref_table} is not part of this load, "
+                  f"foreign keys referencing {ref_table}.{ref_column} are not checked")
+            continue
+        key_sets[(ref_table, ref_column)] = database_keys(connection, ref_table, ref_column)
+    return key_sets
+
+
+# -------------------
+# Validation
+# -------------------
+def validate_table(table_name, data_file, key_sets):
+    """Check one table's file against bank_fraud.sql in bulk: column types,
+    NOT NULL columns, VARCHAR lengths and foreign keys (by set membership in
+    the parent key sets). Returns (rows checked, [Violation])."""
+    table = schema.parse_schema()[table_name]
+    columns = {c.name: c for c in table.columns}
+    foreign_keys = {fk.column: fk for fk in table.foreign_keys if (fk.ref_table, fk.ref_column) in key_sets}
+    found = {}
+
+    def violation(check, column, detail):
+        key = (check, column)
+        if key not in found:
+            found[key] = Violation(table_name, check, column, detail)
+        return found[key]
+
+    rows = 0
+    checked_names = False
+    for path, first_row, batch in read_batches(data_file, table):
+        rows += batch.num_rows
+        if not checked_names:
+            checked_names = True
+            for name in batch.schema.names:
+                if name not in columns:
+                    violation('column', name, 'not a column of the table')
+            for name, column in columns.items():
+                if not column.nullable and name not in batch.schema.names:
+                    violation('column', name, 'NOT NULL column missing from the file')
+
+        for name, values in zip(batch.schema.names, batch.columns):
+            column = columns.get(name)
+            if column is None:
+                continue
+            invalid = invalid_rows(values, column)
+            if invalid is not None:
+                bad = np.flatnonzero(invalid)
+                violation('type', name, sql_type(column)).add(
+                    path, first_row, bad, values.take(bad[:max_examples]).to_pylist())
+            if not column.nullable and values.null_count:
+                nulls = np.flatnonzero(values.is_null().to_numpy(zero_copy_only=False))
+                violation('null', name, 'NOT NULL').add(path, first_row, nulls, [None] * max_examples)
+            longer = too_long(values, column)
+            if longer is not None:
+                bad = np.flatnonzero(longer)
+                violation('length', name, sql_type(column)).add(
+                    path, first_row, bad, values.take(bad[:max_examples]).to_pylist())
+            fk = foreign_keys.get(name)
+            if fk is not None:
+                key_rows, keys = key_values(values, column, invalid)
+                missing = ~contained(keys, key_sets[(fk.ref_table, fk.ref_column)])
+                if missing.any():
+                    violation('foreign_key', name, f"references {fk.ref_table}.{fk.ref_column}").add(
+                        path, first_row, key_rows[missing], keys[missing][:max_examples].tolist())
+    return rows, [v for v in found.values() if v.check == 'column' or v.count]
+
+
+def validate_tables(jobs, connection=None, workers=None):
+    """Validate {table_name: data file} before a load; returns {table_name: [Violation]}
+    for the tables with problems. Tables not in bank_fraud.sql are not checked."""
+    start = time.perf_counter()
+    tables = schema.parse_schema()
+    for name in jobs:
+        if name not in tables:
+            print(f"Warning: {name} is not in {os.path.basename(schema.schema_file)}, not validated")
+    names = [name for name in jobs if name in tables]
+    key_sets = parent_key_sets(jobs, connection, workers)
+    with ThreadPoolExecutor(max_workers=workers or validation_workers) as executor:
+        results = dict(zip(names, executor.map(lambda name: validate_table(name, jobs[name], key_sets), names)))
+    total_rows = sum(rows for rows, _ in results.values())
+    print(f"Validated {len(names)} tables ({total_rows:,} rows) in {time.perf_counter() - start:.1f}s")
+    return {name: violations for name, (_, violations) in results.items() if violations}
@@ -0,0 +1,422 @@
+import gc
+import os
+import sys
+import time
+import json
+import socket
+import argparse
+from datetime import datetime, timedelta
+from collections import deque
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+
+# -------------------
+# Detection rules (the streaming versions of the dashboard's login analyses)
+# -------------------
+# rule name: (window in seconds, alert once the count goes above this, alert level)
+rules = {
+    'account_failures_1d': (24 * 3600, 5, 'medium'),
+    'device_failures_7d': (7 * 24 * 3600, 10, 'medium'),
+    'device_distinct_accounts_7d': (7 * 24 * 3600, 3, 'high'),
+    'party_distinct_locations_60m': (60 * 60, 1, 'high'),
+}
+
+alert_batch_rows = 500          # alerts written per INSERT
+alert_flush_seconds = 1.0       # pending alerts are written at least this often
+max_keys = 1_000_000            # per window; least recently updated keys are evicted beyond it
+evict_every = 100_000           # events between sweeps of idle keys
+gc_thresholds = (100_000, 10, 10)  # allocations between collections, see main()
+
+epoch = datetime(1970, 1, 1)
+
+# Alerts raised here go to their own table: fraud_alert_data's alert_id values
+# are assigned by Create_Tables and rewritten by every bulk_loader run
+stream_alerts_table = 'login_stream_alerts'
+stream_alerts_ddl = f"""
+    CREATE TABLE IF NOT EXISTS {stream_alerts_table} (
+        alert_id INT NOT NULL AUTO_INCREMENT,
+        alert_level VARCHAR(20) DEFAULT NULL,
+        status VARCHAR(20) DEFAULT NULL,
+        created_at DATETIME DEFAULT NULL,
+        rule_name VARCHAR(50) DEFAULT NULL,
+        entity_type VARCHAR(20) DEFAULT NULL,
+        entity_id INT DEFAULT NULL,
+        login_id INT DEFAULT NULL,
+        PRIMARY KEY (alert_id),
+        KEY idx_stream_alert_entity (entity_type, entity_id)
+    )
+"""
+
+# -------------------
+# Sliding windows
+# -------------------
+def _evict(keys, horizon, limit, last_time):
+    """Copy of keys without those idle since horizon, keeping the `limit` most recently updated"""
+    keys = {key: state for key, state in keys.items() if last_time(state) > horizon}
+    if limit is not None and len(keys) > limit:
+        recent = sorted(keys, key=lambda key: last_time(keys[key]))[-limit:]
+        keys = {key: keys[key] for key in recent}
+    return keys
+
+
+class SlidingCounter:
+    """Per-key count of events in a trailing time window.
+
+    Each key keeps a deque of event times; an update appends one and pops the
+    ones that fell out of the window, so each event is pushed and popped once
+    (amortized O(1)). Idle keys are swept out by evict().
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.keys = {}
+
+    def add(self, key, ts):
+        events = self.keys.get(key)
+        if events is None:
+            events = self.keys[key] = deque()
+        events.append(ts)
+        horizon = ts - self.window
+        while events[0] <= horizon:
+            events.popleft()
+        return len(events)
+
+    def evict(self, now, limit=None):
+        """Drop keys with no event inside the window, then the least recently updated beyond limit"""
+        self.keys = _evict(self.keys, now - self.window, limit, lambda events: events[-1])
+
+
+class SlidingDistinct:
+    """Per-key number (or total weight) of distinct values seen in a trailing time window.
+
+    Each key keeps a deque of (time, value), the last time each value was seen
+    and the summed weight of those values; a popped entry only removes its
+    value when no later sighting exists.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.keys = {}
+
+    def add(self, key, value, ts, weight=1):
+        """Record value for key; returns (total, weight added), the latter 0 for a value already in the window"""
+        state = self.keys.get(key)
+        if state is None:
+            state = self.keys[key] = [deque(), {}, 0]
+        events, last_seen = state[0], state[1]
+        horizon = ts - self.window
+        while events and events[0][0] <= horizon:
+            old_ts, old_value, old_weight = events.popleft()
+            if last_seen[old_value] == old_ts:
+                del last_seen[old_value]
+                state[2] -= old_weight
+        events.append((ts, value, weight))
+        added = 0 if value in last_seen else weight
+        last_seen[value] = ts
+        state[2] += added
+        return state[2], added
+
+    def evict(self, now, limit=None):
+        self.keys = _evict(self.keys, now - self.window, limit, lambda state: state[0][-1][0])
+
+# -------------------
+# Detector
+# -------------------
+class LoginAnomalyDetector:
+    """Runs every rule on each login event and collects alerts as thresholds are crossed.
+
+    An alert fires when a count goes from the threshold to one above it, so a
+    key stays quiet while it remains above the threshold and can fire again
+    after dropping back. Event times are in seconds and should be (roughly)
+    increasing.
+    """
+
+    def __init__(self, party_accounts):
+        self.party_accounts = party_accounts
+        # An account's logins are its party's logins, so failures are counted
+        # per party and distinct accounts per device come from distinct parties
+        # weighted by their number of accounts
+        self.party_failures = SlidingCounter(rules['account_failures_1d'][0])
+        self.device_failures = SlidingCounter(rules['device_failures_7d'][0])
+        self.device_parties = SlidingDistinct(rules['device_distinct_accounts_7d'][0])
+        self.party_locations = SlidingDistinct(rules['party_distinct_locations_60m'][0])
+        self.limits = {rule: limit + 1 for rule, (_, limit, _) in rules.items()}
+        self.alerts = []
+        self.events = 0
+        self.now = 0
+
+    def process(self, login_id, party_id, device_id, location_id, ts, successful):
+        self.events += 1
+        self.now = ts
+        limits = self.limits
+        accounts = self.party_accounts.get(party_id, ())
+        if not successful:
+            if accounts and self.party_failures.add(party_id, ts) == limits['account_failures_1d']:
+                for account_id in accounts:
+                    self._alert('account_failures_1d', 'account', account_id, login_id, ts,
+                                limits['account_failures_1d'])
+            if self.device_failures.add(device_id, ts) == limits['device_failures_7d']:
+                self._alert('device_failures_7d', 'device', device_id, login_id, ts, limits['device_failures_7d'])
+        if accounts:
+            # A party bringing several accounts can step over the threshold at once
+            total, added = self.device_parties.add(device_id, party_id, ts, len(accounts))
+            if added and total - added < limits['device_distinct_accounts_7d'] <= total:
+                self._alert('device_distinct_accounts_7d', 'device', device_id, login_id, ts, total)
+        total, added = self.party_locations.add(party_id, location_id, ts)
+        if added and total == limits['party_distinct_locations_60m']:
+            self._alert('party_distinct_locations_60m', 'party', party_id, login_id, ts, total)
+        if self.events % evict_every == 0:
+            self.evict()
+
+    def _alert(self, rule, entity_type, entity_id, login_id, ts, count):
+        self.alerts.append({'rule': rule, 'entity_type': entity_type, 'entity_id': int(entity_id),
+                            'login_id': int(login_id), 'event_time': ts, 'count': count})
+
+    def evict(self):
+        for window in (self.party_failures, self.device_failures, self.device_parties, self.party_locations):
+            window.evict(self.now, max_keys)
+
+    def tracked_keys(self):
+        return sum(len(w.keys) for w in (self.party_failures, self.device_failures,
+                                         self.device_parties, self.party_locations))
+
+# -------------------
+# Alert output
+# -------------------
+def event_datetime(ts):
+    """Naive datetime of epoch seconds, like the DATETIME values the events came from"""
+    return epoch + timedelta(seconds=ts)
+
+class AlertWriter:
+    """Writes alerts to login_stream_alerts in multi-row INSERTs, or prints them as JSON lines.
+
+    alert_id is left to the table's AUTO_INCREMENT, so several streaming
+    processes can write at once.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.written = 0
+        self._last_flush = time.monotonic()
+        self._table_ready = False
+
+    def due(self, pending):
+        return len(pending) >= alert_batch_rows or \
+            (pending and time.monotonic() - self._last_flush >= alert_flush_seconds)
+
+    def flush(self, pending):
+        if not pending:
+            return
+        if self.connection is None:
+            for alert in pending:
+                print(json.dumps({**alert, 'event_time': str(event_datetime(alert['event_time']))}))
+        else:
+            self._insert(pending)
+        self.written += len(pending)
+        pending.clear()
+        self._last_flush = time.monotonic()
+
+    def _insert(self, pending):
+        cursor = self.connection.cursor()
+        if not self._table_ready:
+            cursor.execute(stream_alerts_ddl)
+            self._table_ready = True
+        for start in range(0, len(pending), alert_batch_rows):
+            batch = pending[start:start + alert_batch_rows]
+            params = []
+            for alert in batch:
+                params += [rules[alert['rule']][2], 'open', event_datetime(alert['event_time']),
+                           alert['rule'], alert['entity_type'], alert['entity_id'], alert['login_id']]
+            cursor.execute(
+                f"INSERT INTO {stream_alerts_table} (alert_level, status, created_at, "
+                "rule_name, entity_type, entity_id, login_id) VALUES "
+                + ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch)), params)
+        self.connection.commit()
+        cursor.close()
+
+# -------------------
+# Event sources
+# -------------------
+def parse_event(fields):
+    """(login_id, party_id, device_id, location_id, epoch seconds, successful) from CSV fields"""
+    login_id, party_id, device_id, location_id, timestamp, successful = fields
+    ts = pd.Timestamp(timestamp).value // 1_000_000_000
+    return int(login_id), int(party_id), int(device_id), int(location_id), ts, \
+        successful.strip().lower() in ('1', 'true')
+
+def replay_events(path, speed=0.0, chunk_rows=100_000):
+    """Events of a login_instance_data CSV/Parquet file in time order.
+
+    speed 0 replays as fast as possible; otherwise event-time gaps are
+    reproduced divided by speed (60 = one hour of logins per minute).
+    """
+    from bulk_loader import read_chunks, resolve_data_file
+    data_file = resolve_data_file(path)
+    frames = [chunk.dropna(subset=['timestamp']) for chunk in read_chunks(data_file, 'login_instance_data', chunk_rows)]
+    df = pd.concat(frames, ignore_index=True)
+    ts = pd.to_datetime(df['timestamp'], format='ISO8601').to_numpy(dtype='datetime64[s]').astype(np.int64)
+    order = np.argsort(ts, kind='stable')
+    columns = [df[c].to_numpy(dtype=np.int64, na_value=-1)[order].tolist()
+               for c in ('login_id', 'party_id', 'device_id', 'location_id')]
+    successful = df['successful'].fillna(False).to_numpy(dtype=bool)[order].tolist()
+    events = zip(*columns, ts[order].tolist(), successful)
+    if not speed:
+        yield from events
+        return
+    start_wall = time.monotonic()
+    start_event = None
+    for event in events:
+        start_event = event[4] if start_event is None else start_event
+        delay = (event[4] - start_event) / speed - (time.monotonic() - start_wall)
+        if delay > 0:
+            time.sleep(delay)
+        yield event
+
+def tail_events(path, poll_seconds=0.5):
+    """Events appended to a CSV file (same columns as login_instance_data.csv), forever.
+
+    Yields None after every poll that found nothing, so pending alerts are
+    still flushed on time while the file is quiet.
+    """
+    with open(path) as f:
+        f.seek(0, os.SEEK_END)
+        while True:
+            line = f.readline()
+            if not line:
+                time.sleep(poll_seconds)
+                yield None
+                continue
+            if line.strip() and not line.startswith('login_id'):
+                yield parse_event(line.rstrip('\n').split(','))
+
+def socket_events(host, port, poll_seconds=0.5):
+    """Events sent as CSV lines to a local TCP socket, one client at a time, forever.
+
+    Yields None whenever nothing arrived for poll_seconds (no client, or a
+    quiet one), so pending alerts are still flushed on time.
+    """
+    with socket.create_server((host, port)) as server:
+        print(f"Listening for login events on {host}:{port}")
+        server.settimeout(poll_seconds)
+        while True:
+            try:
+                conn, _ = server.accept()
+            except TimeoutError:
+                yield None
+                continue
+            with conn:
+                conn.settimeout(poll_seconds)
+                buffer = b''
+                while True:
+                    try:
+                        data = conn.recv(65536)
+                    except TimeoutError:
+                        yield None
+                        continue
+                    # A closed connection still delivers its last line without a newline
+                    lines = (buffer + data).split(b'\n')
+                    buffer = lines.pop() if data else b''
+                    for line in lines:
+                        line = line.decode()
+                        if line.strip() and not line.startswith('login_id'):
+                            yield parse_event(line.rstrip('\r').split(','))
+                    if not data:
+                        break
+
+# -------------------
+# Engine
+# -------------------
+def load_party_accounts(path):
+    """party_id -> tuple of account_ids from customer_account_data"""
+    from bulk_loader import read_chunks, resolve_data_file
+    df = pd.concat(read_chunks(resolve_data_file(path), 'customer_account_data', 500_000), ignore_index=True)
+    df = df.dropna(subset=['party_id', 'account_id']).sort_values(['party_id', 'account_id'])
+    parties = df['party_id'].to_numpy(dtype=np.int64)
+    accounts = df['account_id'].to_numpy(dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, parties[1:] != parties[:-1]])
+    return {int(parties[s]): tuple(group.tolist()) for s, group in zip(starts, np.split(accounts, starts[1:]))}
+
+def run(events, detector, writer, report_every=1_000_000):
+    """Feed events to the detector and write its alerts in batches.
+
+    A source may yield None while it is idle; pending alerts are then written
+    as soon as they are due, so alert_flush_seconds bounds how long a detected
+    alert waits even when no further event arrives.
+    """
+    process = detector.process
+    events = iter(events)
+    try:
+        # The clock starts at the first event, after a replay has read its file
+        first = next(events, False)
+        while first is None:
+            first = next(events, False)
+        start = time.perf_counter()
+        if first:
+            process(*first)
+        for event in events:
+            if event is not None:
+                process(*event)
+            if detector.alerts and writer.due(detector.alerts):
+                writer.flush(detector.alerts)
+            if event is not None and detector.events % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {detector.events:,} events ({detector.events / elapsed:,.0f}/sec), "
+                      f"{writer.written + len(detector.alerts):,} alerts, {detector.tracked_keys():,} keys",
+                      file=sys.stderr)
+    finally:
+        # Alerts raised before a stop (Ctrl+C on a tail or socket) are still written
+        writer.flush(detector.alerts)
+    elapsed = time.perf_counter() - start
+    print(f"Processed {detector.events:,} events in {elapsed:.1f}s "
+          f"({detector.events / max(elapsed, 1e-9):,.0f} events/sec), {writer.written:,} alerts", file=sys.stderr)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detect login anomalies on a stream of login events")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--replay', metavar='FILE', help="replay login_instance_data (.csv or .parquet)")
+    source.add_argument('--tail', metavar='FILE', help="follow lines appended to a CSV file")
+    source.add_argument('--listen', metavar='HOST:PORT', help="read CSV lines from a local TCP socket")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="replay speed-up over event time (0 = as fast as possible)")
+    parser.add_argument('--accounts', default='customer_account_data.csv',
+                        help="customer_account_data file mapping parties to accounts")
+    parser.add_argument('--write-alerts', action='store_true',
+                        help=f"insert alerts into {stream_alerts_table} instead of printing them")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    connection = None
+    try:
+        if args.write_alerts:
+            from migrations import connect_args
+            connection = mysql.connector.connect(**connect_args(args.secrets))
+        detector = LoginAnomalyDetector(load_party_accounts(args.accounts))
+        # Window state is mostly short-lived deques and dicts without reference
+        # cycles; the default collector thresholds rescan it (and the party map,
+        # which never changes) thousands of times per million events
+        gc.freeze()
+        gc.set_threshold(*gc_thresholds)
+        if args.replay:
+            events = replay_events(args.replay, args.speed)
+        elif args.tail:
+            events = tail_events(args.tail)
+        else:
+            host, port = args.listen.rsplit(':', 1)
+            events = socket_events(host, int(port))
+        run(events, detector, AlertWriter(connection))
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Error as e:
+        print(f"Error writing alerts: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
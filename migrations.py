@@ -0,0 +1,202 @@
+import sys
+import argparse
+import tomllib
+import mysql.connector
+from mysql.connector import Error
+import partitions
+import summary_tables
+import login_stream
+
+# Table recording which migrations have been applied
+migrations_table = 'schema_migrations'
+
+# -------------------
+# Connection settings
+# -------------------
+def connect_args(secrets_path=None):
+    """MySQL settings from the [mysql] section of a Streamlit secrets.toml, or bulk_loader's config"""
+    if secrets_path:
+        with open(secrets_path, 'rb') as f:
+            mysql_secrets = tomllib.load(f)['mysql']
+        return {key: mysql_secrets[key] for key in ('host', 'port', 'user', 'password', 'database')}
+    from bulk_loader import config
+    return {key: value for key, value in config.items() if key != 'allow_local_infile'}
+
+# -------------------
+# Migration steps
+# -------------------
+def index_exists(cursor, table_name, index_name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+        (table_name, index_name))
+    return cursor.fetchone() is not None
+
+def add_index(table_name, index_name, columns):
+    """Step creating an index unless it is already there, so a half-applied migration can be rerun"""
+    def step(cursor):
+        if index_exists(cursor, table_name, index_name):
+            print(f"  {table_name}.{index_name} already exists")
+            return
+        print(f"  Adding {table_name}.{index_name} ({', '.join(columns)})")
+        cursor.execute(f"ALTER TABLE {table_name} ADD INDEX {index_name} ({', '.join(columns)})")
+    return step
+
+def column_exists(cursor, table_name, column_name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1",
+        (table_name, column_name))
+    return cursor.fetchone() is not None
+
+def add_column(table_name, column_name, definition):
+    """Step adding a column unless it is already there"""
+    def step(cursor):
+        if column_exists(cursor, table_name, column_name):
+            print(f"  {table_name}.{column_name} already exists")
+            return
+        print(f"  Adding {table_name}.{column_name} {definition}")
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+    return step
+
+def build_party_alert_summary(cursor):
+    sql, params = summary_tables.party_alert_rows_sql()
+    cursor.execute(f"REPLACE INTO party_alert_summary (party_id, open_alert_count, associated_accounts) {sql}",
+                   params)
+
+def build_login_rollups(cursor):
+    for table_name, insert_sql in summary_tables._login_rollup_inserts.items():
+        cursor.execute(f"DELETE FROM {table_name}")
+        cursor.execute(insert_sql.format(where=''))
+
+# Versioned migrations, applied in order. Each entry is
+# (version, description, [steps]) where a step is SQL text or a function of a cursor.
+migrations = [
+    (1, "Covering indexes for the dashboard's login analyses", [
+        # High Device Failures: failed logins in a time range, grouped by device
+        add_index('login_instance_data', 'idx_login_success_time_device', ['successful', 'timestamp', 'device_id']),
+        # Accounts with >5 Failures: failed logins in a time range, joined on party
+        add_index('login_instance_data', 'idx_login_success_time_party', ['successful', 'timestamp', 'party_id']),
+        # Top Failed Logins: all failed logins grouped by party
+        add_index('login_instance_data', 'idx_login_success_party', ['successful', 'party_id']),
+        # Multi-Account Access via Device: logins in a time range by device and party
+        add_index('login_instance_data', 'idx_login_time_device_party', ['timestamp', 'device_id', 'party_id']),
+        # Multi-Location Access: per-party timestamps and locations, read in party order
+        add_index('login_instance_data', 'idx_login_party_time_location', ['party_id', 'timestamp', 'location_id']),
+    ]),
+    (2, "Indexes for the fraud alert analyses", [
+        # Open alerts and the transactions they point to
+        add_index('fraud_alert_data', 'idx_alert_status_transaction', ['status', 'transaction_id']),
+        # Payer and payee joins to customer_account_data
+        add_index('transaction_data', 'idx_transaction_payer', ['payer_party_id']),
+        add_index('transaction_data', 'idx_transaction_payee', ['payee_party_id']),
+    ]),
+    (3, "Party-alert summary read by the fraud alert analyses", [
+        summary_tables.party_alert_summary_ddl,
+        build_party_alert_summary,
+    ]),
+    (4, "Hourly login rollups read by the sliding-window login analyses", [
+        *summary_tables.login_rollup_ddl,
+        build_login_rollups,
+    ]),
+    (5, "Monthly RANGE partitions on the login and transaction timestamps", [
+        # Partitioned tables cannot take part in foreign keys, so these are dropped
+        lambda cursor: partitions.partition_table(cursor, 'login_instance_data'),
+        lambda cursor: partitions.partition_table(cursor, 'transaction_data'),
+    ]),
+    (6, "Rule and entity columns for alerts raised by login_stream", [
+        # Login alerts point at an account, device or party rather than a transaction
+        add_column('fraud_alert_data', 'rule_name', 'VARCHAR(50) DEFAULT NULL'),
+        add_column('fraud_alert_data', 'entity_type', 'VARCHAR(20) DEFAULT NULL'),
+        add_column('fraud_alert_data', 'entity_id', 'INT DEFAULT NULL'),
+        add_column('fraud_alert_data', 'login_id', 'INT DEFAULT NULL'),
+    ]),
+    (7, "Own table with AUTO_INCREMENT ids for alerts raised by login_stream", [
+        # Loads reuse, upsert and delete fraud_alert_data ids, so streamed alerts move out of it
+        login_stream.stream_alerts_ddl,
+        f"INSERT INTO {login_stream.stream_alerts_table} "
+        "(alert_level, status, created_at, rule_name, entity_type, entity_id, login_id) "
+        "SELECT alert_level, status, created_at, rule_name, entity_type, entity_id, login_id "
+        "FROM fraud_alert_data WHERE generated_by = 'login_stream' ORDER BY alert_id",
+        "DELETE FROM fraud_alert_data WHERE generated_by = 'login_stream'",
+    ]),
+    (8, "Rebuild party_alert_summary counting each open alert once per account of the party", [
+        # Migration 3 counted each alert once per party, unlike the original analysis
+        "DELETE FROM party_alert_summary",
+        build_party_alert_summary,
+    ]),
+    (9, "Own never-expired partition for rows without a timestamp", [
+        lambda cursor: partitions.add_missing_partition(cursor, 'login_instance_data'),
+        lambda cursor: partitions.add_missing_partition(cursor, 'transaction_data'),
+    ]),
+]
+
+# -------------------
+# Runner
+# -------------------
+def applied_versions(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {migrations_table} (
+            version INT NOT NULL,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version)
+        )
+    """)
+    cursor.execute(f"SELECT version FROM {migrations_table}")
+    return {row[0] for row in cursor.fetchall()}
+
+def migrate(connection, target=None):
+    """Apply every pending migration up to target (all by default); returns the versions applied"""
+    cursor = connection.cursor()
+    done = applied_versions(cursor)
+    applied = []
+    for version, description, steps in migrations:
+        if version in done or (target is not None and version > target):
+            continue
+        print(f"Applying migration {version}: {description}")
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+        # DDL commits implicitly, so the version is recorded once every step has succeeded
+        cursor.execute(f"INSERT INTO {migrations_table} (version, description) VALUES (%s, %s)",
+                       (version, description))
+        connection.commit()
+        applied.append(version)
+    cursor.close()
+    return applied
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument('--target', type=int, help="stop after this migration version")
+    parser.add_argument('--secrets', help="read the connection from the [mysql] section of this secrets.toml "
+                                          "instead of bulk_loader's config")
+    parser.add_argument('--status', action='store_true', help="list migrations and whether they are applied")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    connection = None
+    try:
+        connection = mysql.connector.connect(**connect_args(args.secrets))
+        if args.status:
+            cursor = connection.cursor()
+            done = applied_versions(cursor)
+            cursor.close()
+            for version, description, _ in migrations:
+                print(f"{version:>4} {'applied' if version in done else 'pending':<8} {description}")
+            return 0
+        applied = migrate(connection, args.target)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        return 0
+    except Error as e:
+        print(f"Migration failed: {e}")
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import os
+import sys
+import argparse
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+
+# Tables partitioned by RANGE COLUMNS on a datetime column
+partitioned_tables = {
+    'login_instance_data': 'timestamp',
+    'transaction_data': 'timestamp',
+}
+
+partition_months = 1        # months covered by each partition
+future_partitions = 3       # empty partitions kept ahead of the current one
+retention_months = 24       # partitions entirely older than this are expired
+archive_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+
+# Rows without a timestamp cannot live in a table partitioned on it; they are
+# moved to this value, which falls into missing_partition. That partition
+# holds nothing else and is never expired, since those rows are not old.
+missing_timestamp = '1970-01-01 00:00:00'
+missing_partition = 'p_missing'
+missing_partition_bound = '1970-01-02'
+
+# -------------------
+# Partition layout
+# -------------------
+def add_months(day, months):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+def partition_name(start):
+    return f"p{start:%Y%m}"
+
+def partition_layout(cursor, table_name):
+    """[(partition name, upper bound datetime or None for MAXVALUE)] in order, or None when unpartitioned"""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION", (table_name,))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return [(name, None if bound == 'MAXVALUE' else datetime.fromisoformat(bound.strip("'")))
+            for name, bound in rows]
+
+def fill_missing_timestamps(chunk, column):
+    """Chunk with missing values of the partitioning column set to missing_timestamp"""
+    missing = chunk[column].isna()
+    if not missing.any():
+        return chunk
+    fill = missing_timestamp if pd.api.types.is_string_dtype(chunk[column]) else pd.Timestamp(missing_timestamp)
+    return chunk.assign(**{column: chunk[column].fillna(fill)})
+
+def split_by_partition(chunk, layout, column):
+    """Split a chunk into (partition name, rows) pieces following the layout's upper bounds.
+
+    Missing timestamps become missing_timestamp, as when the table was
+    partitioned; a value that is not a timestamp raises ValueError.
+    """
+    bounds = np.array([bound for _, bound in layout if bound is not None], dtype='datetime64[us]')
+    chunk = fill_missing_timestamps(chunk, column)
+    timestamps = pd.to_datetime(chunk[column], errors='coerce', format='ISO8601')
+    malformed = timestamps.isna()
+    if malformed.any():
+        raise ValueError(f"{malformed.sum():,} rows with a {column} that is not a timestamp, "
+                         f"e.g. {chunk.loc[malformed, column].head(3).tolist()}")
+    timestamps = timestamps.to_numpy(dtype='datetime64[us]')
+    # A row belongs to the first partition whose bound is above its timestamp
+    positions = np.searchsorted(bounds, timestamps, side='right')
+    return [(layout[position][0], chunk[positions == position]) for position in np.unique(positions)]
+
+def range_clause(starts, column):
+    """PARTITION BY body: missing_partition, one partition per start and p_future for everything later"""
+    parts = [f"PARTITION {missing_partition} VALUES LESS THAN ('{missing_partition_bound}')"]
+    parts += [f"PARTITION {partition_name(start)} VALUES LESS THAN ('{add_months(start, partition_months):%Y-%m-%d}')"
+             for start in starts]
+    parts.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    return f"PARTITION BY RANGE COLUMNS({column}) (\n    " + ",\n    ".join(parts) + "\n)"
+
+# -------------------
+# Creating partitions
+# -------------------
+def drop_foreign_keys(cursor, table_name):
+    """Drop foreign keys on the table and those of other tables referencing it.
+
+    MySQL partitioned tables can neither have nor be the target of foreign keys.
+    """
+    cursor.execute(
+        "SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME = %s OR REFERENCED_TABLE_NAME = %s)",
+        (table_name, table_name))
+    for owner, constraint in cursor.fetchall():
+        print(f"  Dropping foreign key {owner}.{constraint}")
+        cursor.execute(f"ALTER TABLE {owner} DROP FOREIGN KEY {constraint}")
+
+def partition_table(cursor, table_name):
+    """Repartition a table by month (partition_months) on its timestamp column.
+
+    The primary key gains the timestamp column, since every unique key of a
+    partitioned table must contain the partitioning column.
+    """
+    column = partitioned_tables[table_name]
+    if partition_layout(cursor, table_name):
+        print(f"  {table_name} is already partitioned")
+        return
+    drop_foreign_keys(cursor, table_name)
+    cursor.execute(f"UPDATE {table_name} SET {column} = %s WHERE {column} IS NULL", (missing_timestamp,))
+    cursor.execute(f"SELECT MIN({column}) FROM {table_name} WHERE {column} > %s", (missing_timestamp,))
+    oldest = cursor.fetchone()[0] or datetime.now()
+    current = date.today().replace(day=1)
+    start = date(oldest.year, oldest.month, 1)
+    starts = []
+    while start <= add_months(current, future_partitions * partition_months):
+        starts.append(start)
+        start = add_months(start, partition_months)
+
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY' "
+        "ORDER BY ORDINAL_POSITION", (table_name,))
+    key_columns = [row[0] for row in cursor.fetchall()]
+    if column not in key_columns:
+        key_columns.append(column)
+    print(f"  Partitioning {table_name} into {len(starts) + 1} partitions")
+    cursor.execute(
+        f"ALTER TABLE {table_name} MODIFY {column} DATETIME NOT NULL, "
+        f"DROP PRIMARY KEY, ADD PRIMARY KEY ({', '.join(key_columns)}) "
+        + range_clause(starts, column))
+
+def add_missing_partition(cursor, table_name):
+    """Split missing_partition off the first partition of a table partitioned without it"""
+    layout = partition_layout(cursor, table_name)
+    if not layout or layout[0][0] == missing_partition:
+        return False
+    first, bound = layout[0]
+    bound = 'MAXVALUE' if bound is None else f"'{bound:%Y-%m-%d %H:%M:%S}'"
+    cursor.execute(
+        f"ALTER TABLE {table_name} REORGANIZE PARTITION {first} INTO (\n"
+        f"    PARTITION {missing_partition} VALUES LESS THAN ('{missing_partition_bound}'),\n"
+        f"    PARTITION {first} VALUES LESS THAN ({bound})\n)")
+    return True
+
+def add_future_partitions(cursor, table_name, ahead=None):
+    """Split p_future so that `ahead` empty partitions follow the current one"""
+    ahead = future_partitions if ahead is None else ahead
+    layout = partition_layout(cursor, table_name)
+    if not layout:
+        return []
+    last_bound = max(bound for _, bound in layout if bound is not None).date()
+    target = add_months(date.today().replace(day=1), (ahead + 1) * partition_months)
+    starts = []
+    start = last_bound
+    while start < target:
+        starts.append(start)
+        start = add_months(start, partition_months)
+    if not starts:
+        return []
+    cursor.execute(
+        f"ALTER TABLE {table_name} REORGANIZE PARTITION p_future INTO (\n    "
+        + ",\n    ".join(f"PARTITION {partition_name(s)} VALUES LESS THAN "
+                         f"('{add_months(s, partition_months):%Y-%m-%d}')" for s in starts)
+        + ",\n    PARTITION p_future VALUES LESS THAN (MAXVALUE)\n)")
+    return [partition_name(s) for s in starts]
+
+# -------------------
+# Retention
+# -------------------
+def archive_partition(connection, table_name, partition, directory=None):
+    """Stream one partition into <archive_dir>/<table>/<partition>.parquet"""
+    from result_export import export_query
+    directory = os.path.join(directory or archive_dir, table_name)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{partition}.parquet")
+    rows = export_query(connection, f"SELECT * FROM {table_name} PARTITION ({partition})", path, 'parquet')
+    return path, rows
+
+def expired_parties(cursor, table_name, partition):
+    """Payer and payee party ids of a transaction_data partition"""
+    cursor.execute(f"SELECT payer_party_id, payee_party_id FROM {table_name} PARTITION ({partition})")
+    return {party for row in cursor.fetchall() for party in row if party is not None}
+
+def expire_partitions(connection, table_name, keep_months=None, archive=True, directory=None):
+    """Drop partitions entirely older than keep_months, archiving them to Parquet first.
+
+    Dropping a partition only removes its files, unlike a DELETE of the same rows.
+    missing_partition is never expired. The summaries built from the dropped
+    rows follow: the hourly login rollups lose the partition's hours, and the
+    parties of dropped transactions get their party_alert_summary rows recomputed.
+    """
+    import summary_tables
+    keep_months = retention_months if keep_months is None else keep_months
+    cutoff = datetime.combine(add_months(date.today().replace(day=1), -keep_months), datetime.min.time())
+    cursor = connection.cursor()
+    layout = partition_layout(cursor, table_name) or []
+    expired = [name for name, bound in layout
+               if name != missing_partition and bound is not None and bound <= cutoff]
+    parties = set()
+    for name in expired:
+        if archive:
+            path, rows = archive_partition(connection, table_name, name, directory)
+            print(f"  Archived {table_name}.{name}: {rows:,} rows to {path}")
+        if table_name == 'transaction_data':
+            parties |= expired_parties(cursor, table_name, name)
+        cursor.execute(f"ALTER TABLE {table_name} DROP PARTITION {name}")
+        print(f"  Dropped {table_name}.{name}")
+    cursor.close()
+
+    try:
+        if expired and table_name == 'login_instance_data':
+            # Expired partitions are the oldest ones, so their hours form one range
+            names = [name for name, _ in layout]
+            first = names.index(expired[0])
+            start = layout[first - 1][1] if first > 0 else None
+            summary_tables.trim_login_rollups(connection, start, dict(layout)[expired[-1]])
+        if parties:
+            summary_tables.refresh_party_alert_summary(connection, parties)
+    except Error as e:
+        print(f"Warning: could not update the summary tables (run migrations.py first?): {e}")
+    return expired
+
+def maintain(connection, ahead=None, keep_months=None, archive=True, directory=None):
+    for table_name in partitioned_tables:
+        cursor = connection.cursor()
+        if not partition_layout(cursor, table_name):
+            print(f"{table_name} is not partitioned, run migrations.py first")
+            cursor.close()
+            continue
+        added = add_future_partitions(cursor, table_name, ahead)
+        cursor.close()
+        print(f"{table_name}: added {len(added)} future partition(s)")
+        expired = expire_partitions(connection, table_name, keep_months, archive, directory)
+        print(f"{table_name}: expired {len(expired)} partition(s)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of the login and transaction tables")
+    parser.add_argument('command', choices=['maintain', 'status'], nargs='?', default='maintain')
+    parser.add_argument('--ahead', type=int, default=future_partitions,
+                        help="empty partitions to keep ahead of the current one")
+    parser.add_argument('--retention-months', type=int, default=retention_months,
+                        help="drop partitions entirely older than this")
+    parser.add_argument('--archive-dir', default=archive_dir, help="where expired partitions are archived")
+    parser.add_argument('--no-archive', action='store_true', help="drop expired partitions without archiving")
+    parser.add_argument('--secrets', help="read the connection from the [mysql] section of this secrets.toml "
+                                          "instead of bulk_loader's config")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from migrations import connect_args
+    args = parse_args(argv)
+    connection = None
+    try:
+        connection = mysql.connector.connect(**connect_args(args.secrets))
+        if args.command == 'status':
+            cursor = connection.cursor()
+            for table_name in partitioned_tables:
+                layout = partition_layout(cursor, table_name)
+                print(f"{table_name}: " + (', '.join(name for name, _ in layout) if layout else "not partitioned"))
+            cursor.close()
+        else:
+            maintain(connection, args.ahead, args.retention_months, not args.no_archive, args.archive_dir)
+        return 0
+    except Error as e:
+        print(f"Partition maintenance failed: {e}")
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+import os
+import re
+import sys
+import queue
+import argparse
+import threading
+import pandas as pd
+import pyarrow as pa
+from mysql.connector import Error
+import schema
+import summary_tables
+from query_cache import data_version_sql
+from query_metrics import timed
+from result_frames import fetch_columns, compact_frame, arrow_to_frame
+
+
+class QueryError(Exception):
+    """A query could not be run, whatever the backend"""
+
+
+def timeout_message(timeout):
+    return f"Query stopped after running for {timeout:,.1f}s (time limit reached)."
+
+
+# -------------------
+# MySQL
+# -------------------
+# MySQL error raised when MAX_EXECUTION_TIME stops a SELECT
+max_execution_time_exceeded = 3024
+# MySQL error raised for a table that does not exist
+no_such_table = 1146
+
+
+def missing_summary_table(e):
+    """The summary table named in a 'doesn't exist' error, None for any other error"""
+    if getattr(e, 'errno', None) != no_such_table:
+        return None
+    return next((t for t in summary_tables.summary_table_names() if f".{t}'" in str(e)), None)
+
+
+def mysql_query_error(e, prefix, timeout=None):
+    """QueryError for a MySQL error, telling how to fix the ones the dashboard user can fix"""
+    if e.errno == max_execution_time_exceeded:
+        return QueryError(timeout_message(timeout))
+    table_name = missing_summary_table(e)
+    if table_name:
+        return QueryError(f"{table_name} does not exist yet: run migrations.py to create the "
+                          "summary tables this analysis reads.")
+    return QueryError(f"{prefix}: {e}")
+
+# The last finished statement of this connection; the lookup itself is still running
+rows_examined_sql = """
+    SELECT ROWS_EXAMINED FROM performance_schema.events_statements_history
+    WHERE THREAD_ID = PS_CURRENT_THREAD_ID()
+    ORDER BY EVENT_ID DESC LIMIT 1
+"""
+
+
+class MySQLBackend:
+    """Runs queries on the MySQL server through a shared ConnectionPool"""
+
+    name = 'mysql'
+
+    def __init__(self, pool, checkout_timeout=None):
+        self.pool = pool
+        self.checkout_timeout = checkout_timeout
+        self.rows_examined_available = True
+
+    def _connection(self):
+        try:
+            return self.pool.get_connection(timeout=self.checkout_timeout)
+        except Error as e:
+            raise QueryError(f"Error connecting to MySQL DB: {e}") from e
+        except queue.Empty:
+            raise QueryError("All database connections are busy, try again in a moment.") from None
+
+    def run(self, sql_query, params=None, trace=None, timeout=None):
+        """Query result as a DataFrame; with a QueryTrace, each phase is timed into it.
+
+        Runs as a server-side prepared statement cached on the pooled
+        connection, so repeated runs (with any parameter values) skip parsing;
+        the server still optimizes each execution. Rows are read in chunks into typed column arrays and the
+        DataFrame gets compact dtypes (see result_frames.py). With a timeout
+        in seconds, the server stops the query then (MAX_EXECUTION_TIME), so
+        the connection is free again instead of busy with an abandoned query.
+        """
+        with timed(trace, 'connect'):
+            conn = self._connection()
+        try:
+            if timeout is not None:
+                self._set_time_limit(conn, timeout)
+            cursor, operation = self.pool.prepared(conn, sql_query)
+            try:
+                with timed(trace, 'execute'):
+                    cursor.execute(operation, tuple(params or ()))
+                with timed(trace, 'fetch'):
+                    columns = fetch_columns(cursor)
+            except Error:
+                self.pool.forget_statement(conn, sql_query)
+                raise
+            with timed(trace, 'build'):
+                df = compact_frame(columns)
+            if trace is not None:
+                trace.rows_examined = self._rows_examined(conn)
+            return df
+        except Error as e:
+            raise mysql_query_error(e, "Query failed", timeout) from e
+        finally:
+            try:
+                if timeout is not None:
+                    self._set_time_limit(conn, None)
+            except Error:
+                pass
+            self.pool.release(conn)
+
+    @staticmethod
+    def _set_time_limit(conn, seconds):
+        """Time limit of the connection's SELECTs (None for none); pooled connections are reset after use"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s",
+                           (0 if seconds is None else max(1, int(seconds * 1000)),))
+        finally:
+            cursor.close()
+
+    def _rows_examined(self, conn):
+        """Rows the server examined for the statement just run, from performance_schema when readable"""
+        if not self.rows_examined_available:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute(rows_examined_sql)
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except Error:
+            # performance_schema off or not granted; stop asking
+            self.rows_examined_available = False
+            return None
+        finally:
+            cursor.close()
+
+    def explain(self, sql_query, params=None):
+        """EXPLAIN plan of a query as text"""
+        conn = self._connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("EXPLAIN FORMAT=TREE " + sql_query, params or ())
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        except Error as e:
+            raise mysql_query_error(e, "EXPLAIN failed") from e
+        finally:
+            if cursor:
+                cursor.close()
+            self.pool.release(conn)
+
+    def data_version(self):
+        """Latest load_id in load_log, or None when nothing was recorded yet"""
+        try:
+            return self.run(data_version_sql).iat[0, 0]
+        except QueryError:
+            return None
+
+    def export(self, sql_query, path, file_format):
+        from result_export import export_query
+        conn = self._connection()
+        try:
+            return export_query(conn, sql_query, path, file_format)
+        except Error as e:
+            raise mysql_query_error(e, "Export failed") from e
+        except (pa.ArrowException, OSError) as e:
+            # A value that does not fit the result's column type, or a full or unwritable disk
+            raise QueryError(f"Export failed: {e}") from e
+        finally:
+            self.pool.release(conn)
+
+    def stats(self):
+        return self.pool.stats()
+
+
+# -------------------
+# DuckDB over the generated files
+# -------------------
+_mysql_to_duckdb = [
+    # Start of the hour, as written for MySQL in summary_tables.hour_of_login and fraud_queries;
+    # with placeholders inside, both copies of the expression stay so the parameter count still matches
+    (re.compile(r"TIMESTAMP\(DATE\((.+?)\), MAKETIME\(HOUR\((.+?)\), 0, 0\)\)"),
+     lambda m: f"date_trunc('hour', {m.group(1)})" if m.group(1) == m.group(2) and '%s' not in m.group(1)
+     else f"(CAST({m.group(1)} AS DATE) + to_hours(hour({m.group(2)})))"),
+    # INTERVAL takes no parameter in DuckDB
+    (re.compile(r"INTERVAL %s (DAY|HOUR|MINUTE)\b", re.I),
+     lambda m: f"to_{m.group(1).lower()}s(CAST(%s AS INTEGER))"),
+    # TIMESTAMPDIFF counts whole units, like date_sub (date_diff counts boundaries crossed)
+    (re.compile(r"TIMESTAMPDIFF\((\w+),", re.I), lambda m: f"date_sub('{m.group(1).lower()}',"),
+    # DuckDB cannot order a DISTINCT aggregate by the cast value, so distinct lists are sorted instead
+    (re.compile(r"GROUP_CONCAT\(DISTINCT ([\w.]+)(?: ORDER BY [^)]*)?\)", re.I),
+     r"array_to_string(list_sort(list(DISTINCT \1)), ',')"),
+    (re.compile(r"GROUP_CONCAT\(([\w.]+)( ORDER BY [^)]*)?\)", re.I),
+     lambda m: f"string_agg(CAST({m.group(1)} AS VARCHAR), ','{m.group(2) or ''})"),
+    # MySQL NOW() is a local DATETIME; DuckDB now() carries a time zone
+    (re.compile(r"\bNOW\(\)", re.I), "current_localtimestamp()"),
+    (re.compile(r"%s"), "?"),
+]
+
+
+def translate_for_duckdb(sql_query):
+    """Rewrite the MySQL-specific parts of the dashboard's SQL for DuckDB"""
+    for pattern, replacement in _mysql_to_duckdb:
+        sql_query = pattern.sub(replacement, sql_query)
+    return sql_query
+
+
+def _inline(sql_query, params):
+    """Substitute %s placeholders with literals, for views (which cannot take parameters)"""
+    literals = iter(str(p) if isinstance(p, (int, float)) else "'" + str(p).replace("'", "''") + "'"
+                    for p in params)
+    return re.sub(r"%s", lambda _: next(literals), sql_query)
+
+
+def create_summaries(db, materialize=False):
+    """Create the summary and rollup tables bulk_loader maintains in MySQL in a DuckDB
+    database, from the same SQL: as views, or as tables filled now when materialize"""
+    kind = 'TABLE' if materialize else 'VIEW'
+    sql, params = summary_tables.party_alert_rows_sql()
+    select = translate_for_duckdb(_inline(sql, params))
+    db.execute(f"CREATE OR REPLACE {kind} party_alert_summary AS SELECT party_id, open_alert_count, "
+               f"associated_accounts FROM ({select})")
+    for table_name, insert_sql in summary_tables._login_rollup_inserts.items():
+        insert_sql = insert_sql.format(where='')
+        columns = re.search(r"\(([^)]*)\)", insert_sql).group(1)
+        select = translate_for_duckdb(insert_sql[insert_sql.index('SELECT'):])
+        db.execute(f"CREATE OR REPLACE {kind} {table_name} AS SELECT * FROM ({select}) AS rollup ({columns})")
+
+
+class DuckDBBackend:
+    """Runs the dashboard analyses in-process over the generated CSV/Parquet files.
+
+    Every table becomes a view over its file (or shard files), and the summary
+    and rollup tables bulk_loader maintains in MySQL are views computed from
+    the same SQL, so query_map runs unchanged apart from dialect translation.
+    With `database`, the tables of that DuckDB file are queried instead
+    (see benchmark.load_duckdb, which also materializes the summaries).
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, data_dir='.', file_format='auto', database=None):
+        import duckdb
+        from bulk_loader import csv_to_table, resolve_data_file, data_exists, data_files
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        if database:
+            self._db = duckdb.connect(database, read_only=True)
+            self._files = [database]
+            return
+        self._db = duckdb.connect()
+        self._files = []
+        tables = schema.parse_schema()
+        for csv_file, table_name in csv_to_table.items():
+            data_file = resolve_data_file(os.path.join(data_dir, csv_file), file_format)
+            if table_name not in tables or not data_exists(data_file):
+                continue
+            paths = data_files(data_file)
+            self._files.extend(paths)
+            self._db.execute(f"CREATE VIEW {table_name} AS SELECT * FROM {self._reader(tables[table_name], paths)}")
+        create_summaries(self._db)
+
+    @staticmethod
+    def _reader(table, paths):
+        path_list = '[' + ', '.join("'" + p.replace("'", "''") + "'" for p in paths) + ']'
+        if paths[0].endswith('.parquet'):
+            return f"read_parquet({path_list})"
+        columns = ', '.join(f"'{c.name}': '{schema.duckdb_type(c)}'" for c in table.columns)
+        return f"read_csv({path_list}, header = true, columns = {{{columns}}})"
+
+    def run(self, sql_query, params=None, trace=None, timeout=None):
+        """Query result as a DataFrame with the same compact dtypes as MySQLBackend's.
+
+        With a timeout in seconds, the query is interrupted then.
+        """
+        import duckdb
+        timer = None
+        try:
+            with timed(trace, 'connect'):
+                with self._lock:
+                    cursor = self._db.cursor()
+            if timeout is not None:
+                timer = threading.Timer(timeout, cursor.interrupt)
+                timer.daemon = True
+                timer.start()
+            with timed(trace, 'execute'):
+                cursor.execute(translate_for_duckdb(sql_query), list(params or []))
+            with timed(trace, 'fetch'):
+                result = cursor.arrow()
+                # A RecordBatchReader in recent DuckDB releases, a Table before
+                table = result.read_all() if hasattr(result, 'read_all') else result
+            with timed(trace, 'build'):
+                return arrow_to_frame(table)
+        except duckdb.InterruptException as e:
+            raise QueryError(timeout_message(timeout)) from e
+        except Exception as e:
+            raise QueryError(f"Query failed: {e}") from e
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def explain(self, sql_query, params=None):
+        """EXPLAIN plan of a query as text"""
+        try:
+            with self._lock:
+                cursor = self._db.cursor()
+            rows = cursor.execute("EXPLAIN " + translate_for_duckdb(sql_query), list(params or [])).fetchall()
+            return '\n'.join(plan for _, plan in rows)
+        except Exception as e:
+            raise mysql_query_error(e, "EXPLAIN failed") from e
+
+    def data_version(self):
+        """Changes whenever a data file is rewritten"""
+        return max((os.path.getmtime(path) for path in self._files if os.path.exists(path)), default=None)
+
+    def export(self, sql_query, path, file_format):
+        options = "FORMAT parquet, COMPRESSION zstd" if file_format == 'parquet' else "FORMAT csv, HEADER"
+        try:
+            with self._lock:
+                cursor = self._db.cursor()
+            cursor.execute(f"COPY ({translate_for_duckdb(sql_query)}) TO '{path}' ({options})")
+            return cursor.execute(f"SELECT COUNT(*) FROM '{path}'").fetchone()[0]
+        except Exception as e:
+            raise QueryError(f"Export failed: {e}") from e
+
+    def stats(self):
+        return None
+
+
+# -------------------
+# Comparing backends
+# -------------------
+def normalize_result(df):
+    """Result as plain comparable values, rows in a fixed order"""
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            df[column] = pd.to_datetime(values).astype('datetime64[us]')
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            df[column] = numeric.astype('float64') if numeric.notna().sum() == values.notna().sum() \
+                else values.astype('string')
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def results_match(a, b):
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    try:
+        pd.testing.assert_frame_equal(normalize_result(a), normalize_result(b), check_dtype=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the dashboard analyses on the embedded backend, "
+                                                 "optionally checking them against MySQL")
+    parser.add_argument('--data-dir', default='.', help="directory with the generated CSV/Parquet files")
+    parser.add_argument('--format', choices=['auto', 'csv', 'parquet'], default='auto')
+    parser.add_argument('--compare-mysql', action='store_true',
+                        help="also run every analysis on MySQL and fail when results differ")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from fraud_queries import query_map
+    args = parse_args(argv)
+    duck = DuckDBBackend(args.data_dir, args.format)
+    mysql_backend = None
+    if args.compare_mysql:
+        from db_pool import ConnectionPool
+        from migrations import connect_args
+        mysql_backend = MySQLBackend(ConnectionPool(1, **connect_args(args.secrets)))
+    mismatches = 0
+    for name, sql_query in query_map.items():
+        try:
+            result = duck.run(sql_query)
+        except QueryError as e:
+            print(f"FAIL  {name}: {e}")
+            mismatches += 1
+            continue
+        line = f"{len(result):>8,} rows  {name}"
+        if mysql_backend is not None:
+            expected = mysql_backend.run(sql_query)
+            same = results_match(result, expected)
+            mismatches += not same
+            line = f"{'ok' if same else 'DIFF':<5} {line}" + ('' if same else f" (MySQL: {len(expected):,} rows)")
+        print(line)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Table bulk_loader.py appends a row to after every table it loads
+load_log_table = 'load_log'
+
+load_log_ddl = f"""
+    CREATE TABLE IF NOT EXISTS {load_log_table} (
+        load_id BIGINT NOT NULL AUTO_INCREMENT,
+        table_name VARCHAR(64) NOT NULL,
+        load_mode VARCHAR(16) NOT NULL,
+        rows_loaded BIGINT DEFAULT NULL,
+        finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (load_id)
+    )
+"""
+
+# Primary key lookup, answered from the index without touching the rows
+data_version_sql = f"SELECT MAX(load_id) FROM {load_log_table}"
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results (DataFrames) shared by all sessions.
+
+    Entries expire after `ttl` seconds, and the least recently used ones are
+    evicted once the results held exceed `max_bytes`. Every entry is tagged
+    with the data version it was read at; when the version changes (a new
+    row in load_log), the whole cache is dropped. A result whose query
+    started before the change is refused by put(), and any entry of another
+    version is never served.
+    """
+
+    def __init__(self, ttl=600, max_bytes=256 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (result, size, stored_at, version)
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(sql_query, params=None):
+        return ' '.join(sql_query.split()), tuple(params or ())
+
+    @property
+    def version(self):
+        """Current data version; pass it to put() with a result read after looking it up"""
+        with self._lock:
+            return self._version
+
+    def version_is_stale(self, max_age):
+        """Whether the data version was last checked more than max_age seconds ago"""
+        return time.monotonic() - self._version_checked >= max_age
+
+    def set_version(self, version):
+        with self._lock:
+            self._version_checked = time.monotonic()
+            if version != self._version:
+                self._entries.clear()
+                self.bytes = 0
+                self._version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[2] > self.ttl or entry[3] != self._version:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, version):
+        """Store a result read at `version` (cache.version taken before the query ran);
+        dropped when the data changed in the meantime"""
+        size = int(result.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, time.monotonic(), version)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits,
+                    'misses': self.misses, 'data_version': self._version}
+
+    def _remove(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self.bytes -= size
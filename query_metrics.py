@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Prometheus textfile directory (point node_exporter's textfile collector at it)
+# and the structured JSON-lines log, shared by the dashboard and bulk_loader
+metrics_dir = 'metrics'
+dashboard_metrics_file = 'dashboard.prom'
+load_metrics_file = 'bulk_loader.prom'
+log_file = 'performance.jsonl'
+log_max_mb = 50                 # the log is rotated to performance.jsonl.1 (.2, ...) beyond this size
+log_backups = 3                 # rotated logs kept; older ones are deleted
+
+# Upper bounds (seconds) of the latency histogram buckets
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+recent_requests = 200           # requests kept for the dashboard's Performance panel
+
+# Phases of a dashboard request, in the order they happen
+phases = ('cache', 'connect', 'execute', 'fetch', 'build', 'render')
+
+
+# -------------------
+# Output
+# -------------------
+_write_lock = threading.Lock()
+
+
+def rotate_log(path, max_bytes=None, backups=None):
+    """Shift path to path.1 (path.1 to path.2, ...) once it reaches max_bytes, keeping `backups` old logs"""
+    max_bytes = log_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    backups = log_backups if backups is None else backups
+    try:
+        if os.path.getsize(path) < max_bytes:
+            return
+    except OSError:
+        return
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    if backups:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+
+
+def log_event(record, directory=None):
+    """Append one JSON line to the performance log (rotated by size, see rotate_log())"""
+    directory = directory or metrics_dir
+    line = json.dumps({'time': datetime.now().isoformat(timespec='milliseconds'), **record}, default=str)
+    path = os.path.join(directory, log_file)
+    with _write_lock:
+        os.makedirs(directory, exist_ok=True)
+        rotate_log(path)
+        with open(path, 'a') as f:
+            f.write(line + '\n')
+
+
+def write_textfile(path, text):
+    """Replace a Prometheus textfile atomically, so a scrape never reads half of it"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+_sample_re = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_label_re = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def read_textfile(path):
+    """Samples of a Prometheus textfile as [(name, {label: value}, value)]"""
+    samples = []
+    if not os.path.exists(path):
+        return samples
+    with open(path) as f:
+        for line in f:
+            match = _sample_re.match(line.strip())
+            if match:
+                labels = {k: re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), v)
+                          for k, v in _label_re.findall(match.group(2) or '')}
+                samples.append((match.group(1), labels, float(match.group(3))))
+    return samples
+
+
+# -------------------
+# Dashboard requests
+# -------------------
+class QueryTrace:
+    """Timings and row counts of one dashboard request, filled in phase by phase"""
+
+    def __init__(self, query_name, backend=None):
+        self.query_name = query_name
+        self.backend = backend
+        self.phases = {}
+        self.sql_query = None
+        self.params = None
+        self.cache_hit = False
+        self.rows_returned = None
+        self.rows_examined = None
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+    @property
+    def outcome(self):
+        return 'error' if self.error else 'cached' if self.cache_hit else 'executed'
+
+    def as_record(self):
+        return {'event': 'query', 'query': self.query_name, 'backend': self.backend, 'outcome': self.outcome,
+                'rows_returned': self.rows_returned, 'rows_examined': self.rows_examined,
+                'total_ms': round(self.total * 1000, 3),
+                'phases_ms': {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+                'error': self.error}
+
+
+def timed(trace, name):
+    """trace.phase(name), or nothing when the caller passed no trace"""
+    return trace.phase(name) if trace is not None else nullcontext()
+
+
+class QueryMetrics:
+    """Thread-safe latency histograms and counters of dashboard requests, shared by all sessions.
+
+    Every recorded request is appended to the JSON-lines log and the whole
+    metric set is rewritten as a Prometheus textfile; prometheus_text() is
+    also what serve() answers on /metrics.
+    """
+
+    def __init__(self, directory=None, buckets=latency_buckets, keep=recent_requests):
+        self.directory = directory or metrics_dir
+        self.buckets = buckets
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._histograms = {}   # (query, phase) -> [count per bucket..., +Inf count, sum]
+        self._requests = {}     # (query, outcome) -> count
+        self._rows = {}         # (query, 'returned' | 'examined') -> total rows
+
+    def record(self, trace):
+        with self._lock:
+            timings = dict(trace.phases, total=trace.total)
+            for phase, seconds in timings.items():
+                histogram = self._histograms.setdefault((trace.query_name, phase), [0] * (len(self.buckets) + 2))
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        histogram[i] += 1
+                histogram[-2] += 1
+                histogram[-1] += seconds
+            key = (trace.query_name, trace.outcome)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for kind, rows in (('returned', trace.rows_returned), ('examined', trace.rows_examined)):
+                if rows is not None:
+                    self._rows[(trace.query_name, kind)] = self._rows.get((trace.query_name, kind), 0) + rows
+            self.recent.append(trace)
+        try:
+            log_event(trace.as_record(), self.directory)
+            write_textfile(os.path.join(self.directory, dashboard_metrics_file), self.prometheus_text())
+        except OSError as e:
+            print(f"Warning: could not write query metrics to {self.directory}: {e}")
+
+    def prometheus_text(self):
+        with self._lock:
+            lines = ["# HELP fraud_query_phase_seconds Time spent in each phase of a dashboard request",
+                     "# TYPE fraud_query_phase_seconds histogram"]
+            for (query, phase), histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f"fraud_query_phase_seconds_bucket{_labels(query=query, phase=phase, le=bound)} {count}")
+                lines.append(f"fraud_query_phase_seconds_bucket{_labels(query=query, phase=phase, le='+Inf')} {histogram[-2]}")
+                lines.append(f"fraud_query_phase_seconds_sum{_labels(query=query, phase=phase)} {histogram[-1]:.6f}")
+                lines.append(f"fraud_query_phase_seconds_count{_labels(query=query, phase=phase)} {histogram[-2]}")
+            lines += ["# HELP fraud_query_requests_total Dashboard requests by outcome (executed, cached, error)",
+                      "# TYPE fraud_query_requests_total counter"]
+            lines += [f"fraud_query_requests_total{_labels(query=query, outcome=outcome)} {count}"
+                      for (query, outcome), count in sorted(self._requests.items())]
+            lines += ["# HELP fraud_query_rows_total Rows returned to the dashboard and examined by the server",
+                      "# TYPE fraud_query_rows_total counter"]
+            lines += [f"fraud_query_rows_total{_labels(query=query, kind=kind)} {rows}"
+                      for (query, kind), rows in sorted(self._rows.items())]
+        return '\n'.join(lines) + '\n'
+
+    def recent_records(self):
+        with self._lock:
+            return [trace.as_record() for trace in self.recent]
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.metrics.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(metrics, port, host='0.0.0.0'):
+    """Answer Prometheus scrapes of /metrics from a background thread"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+# -------------------
+# Table loads
+# -------------------
+_load_lock = threading.Lock()
+_table_loads = {}   # (table, mode) -> (rows, seconds, finished_at)
+
+
+def record_table_load(table_name, mode, rows, seconds, directory=None):
+    """Log one table load and rewrite bulk_loader's Prometheus textfile"""
+    directory = directory or metrics_dir
+    rows_per_sec = rows / seconds if rows is not None and seconds > 0 else None
+    with _load_lock:
+        _table_loads[(table_name, mode)] = (rows, seconds, time.time())
+        lines = ["# HELP fraud_load_seconds Duration of the last load of each table",
+                 "# TYPE fraud_load_seconds gauge"]
+        lines += [f"fraud_load_seconds{_labels(table=t, mode=m)} {s:.6f}"
+                  for (t, m), (_, s, _) in sorted(_table_loads.items())]
+        lines += ["# HELP fraud_load_rows Rows written by the last load of each table (absent when it failed)",
+                  "# TYPE fraud_load_rows gauge"]
+        lines += [f"fraud_load_rows{_labels(table=t, mode=m)} {r}"
+                  for (t, m), (r, _, _) in sorted(_table_loads.items()) if r is not None]
+        lines += ["# HELP fraud_load_finished_timestamp_seconds When the last load of each table finished",
+                  "# TYPE fraud_load_finished_timestamp_seconds gauge"]
+        lines += [f"fraud_load_finished_timestamp_seconds{_labels(table=t, mode=m)} {f:.0f}"
+                  for (t, m), (_, _, f) in sorted(_table_loads.items())]
+        try:
+            write_textfile(os.path.join(directory, load_metrics_file), '\n'.join(lines) + '\n')
+        except OSError as e:
+            print(f"Warning: could not write load metrics to {directory}: {e}")
+    try:
+        log_event({'event': 'load', 'table': table_name, 'mode': mode, 'rows': rows,
+                   'seconds': round(seconds, 3),
+                   'rows_per_sec': round(rows_per_sec) if rows_per_sec is not None else None,
+                   'failed': rows is None}, directory)
+    except OSError as e:
+        print(f"Warning: could not log the load of {table_name}: {e}")
+
+
+def table_load_timings(directory=None):
+    """Last load of each table as written by bulk_loader: {(table, mode): {metric: value}}"""
+    directory = directory or metrics_dir
+    timings = {}
+    for name, labels, value in read_textfile(os.path.join(directory, load_metrics_file)):
+        if 'table' in labels:
+            timings.setdefault((labels['table'], labels.get('mode')), {})[name] = value
+    return timings
@@ -0,0 +1,170 @@
+from decimal import Decimal
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from mysql.connector import Error, FieldType, FieldFlag
+from result_frames import schema_types
+
+# Rows pulled from the server and written per chunk
+export_chunk_rows = 50000
+
+# Scale of a DECIMAL result column that is not a bank_fraud.sql column and is
+# NULL throughout the first chunk (the protocol does not report the scale)
+default_decimal_scale = 10
+
+
+# -------------------
+# Keyset pagination
+# -------------------
+def keyset_page_sql(sql_query, page_keys, after=None, page_rows=100):
+    """Wrap a query so only one page of its rows is returned.
+
+    page_keys is a list of (column, 'ASC' | 'DESC') that uniquely orders the
+    rows; `after` holds the key values of the last row of the previous page.
+    Instead of OFFSET, the next page starts strictly after that row, so the
+    server never re-reads and discards earlier pages.
+    Returns (sql, params).
+    """
+    params = []
+    where = ''
+    if after is not None:
+        # (k1, k2, ...) after (v1, v2, ...) with a direction per key:
+        # k1 beyond v1, or k1 = v1 and k2 beyond v2, ...
+        terms = []
+        for i, (column, direction) in enumerate(page_keys):
+            op = '<' if direction.upper() == 'DESC' else '>'
+            equal = [f"page.{c} = %s" for c, _ in page_keys[:i]]
+            terms.append('(' + ' AND '.join(equal + [f"page.{column} {op} %s"]) + ')')
+            params.extend(list(after[:i]) + [after[i]])
+        where = 'WHERE ' + ' OR '.join(terms)
+    order_by = ', '.join(f"page.{column} {direction}" for column, direction in page_keys)
+    sql = f"SELECT page.* FROM ({sql_query.strip()}) AS page {where} ORDER BY {order_by} LIMIT {int(page_rows)}"
+    return sql, params
+
+
+def page_key_values(df, page_keys):
+    """Key values of the last row of a page, to fetch the page after it"""
+    last = df.iloc[-1]
+    return tuple(last[column].item() if hasattr(last[column], 'item') else last[column]
+                 for column, _ in page_keys)
+
+
+# -------------------
+# Streaming export
+# -------------------
+_field_types = {
+    FieldType.TINY: pa.int8(), FieldType.SHORT: pa.int16(), FieldType.YEAR: pa.int16(),
+    FieldType.INT24: pa.int32(), FieldType.LONG: pa.int32(), FieldType.LONGLONG: pa.int64(),
+    FieldType.FLOAT: pa.float32(), FieldType.DOUBLE: pa.float64(),
+    FieldType.DATE: pa.date32(), FieldType.NEWDATE: pa.date32(),
+    FieldType.DATETIME: pa.timestamp('us'), FieldType.TIMESTAMP: pa.timestamp('us'),
+    FieldType.TIME: pa.duration('us'), FieldType.BIT: pa.int64(), FieldType.NULL: pa.string(),
+}
+_unsigned_types = {pa.int8(): pa.int16(), pa.int16(): pa.int32(), pa.int32(): pa.int64(), pa.int64(): pa.uint64()}
+_binary_charset = 63
+
+
+def decimal_type(name, values):
+    """DECIMAL result column type: the bank_fraud.sql column of that name, else the scale
+    of its first value (MySQL writes every value of a column with the same scale)"""
+    known = schema_types().get(name)
+    if known is not None and pa.types.is_decimal(known):
+        return known
+    first = next((value for value in values if isinstance(value, Decimal)), None)
+    scale = default_decimal_scale if first is None else max(0, -first.as_tuple().exponent)
+    return pa.decimal128(38, scale)
+
+
+def result_schema(description, rows):
+    """Arrow schema of a result from the cursor's column metadata.
+
+    Every chunk is written with it, so the Parquet types do not depend on
+    which values happen to be in the first chunk.
+    """
+    fields = []
+    for i, (name, type_code, *details) in enumerate(description):
+        # After the seven DB-API fields, MySQL adds the column flags and character set
+        flags = details[5] if len(details) > 5 else 0
+        charset = details[6] if len(details) > 6 else None
+        if type_code in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+            arrow_type = decimal_type(name, [row[i] for row in rows])
+        elif type_code in _field_types:
+            arrow_type = _field_types[type_code]
+            if flags & FieldFlag.UNSIGNED:
+                arrow_type = _unsigned_types.get(arrow_type, arrow_type)
+        else:
+            arrow_type = pa.binary() if charset == _binary_charset else pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def rows_to_table(rows, result_schema):
+    """Rows as an Arrow table of the given schema"""
+    columns = list(zip(*rows)) if rows else [[] for _ in result_schema]
+    return pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, result_schema)],
+                                schema=result_schema)
+
+
+def iter_result_chunks(connection, sql_query, params=None, chunk_rows=None):
+    """Yield a query result as DataFrames of chunk_rows rows (see iter_result_rows)"""
+    for description, rows in iter_result_rows(connection, sql_query, params, chunk_rows):
+        if rows:
+            yield pd.DataFrame(rows, columns=[column[0] for column in description])
+
+def iter_result_rows(connection, sql_query, params=None, chunk_rows=None):
+    """Yield (cursor description, rows) for each chunk_rows rows of a query result.
+
+    The cursor is unbuffered, so rows stay on the server until they are
+    fetched and only one chunk is held in memory at a time. An empty result
+    yields the description once with no rows.
+    """
+    chunk_rows = chunk_rows or export_chunk_rows
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(sql_query, params or ())
+        first = True
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows and not first:
+                break
+            yield cursor.description, rows
+            if not rows:
+                break
+            first = False
+    finally:
+        # A partly read unbuffered result blocks the connection until it is drained
+        if connection.unread_result:
+            connection.consume_results()
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+
+def export_query(connection, sql_query, out, file_format='csv', params=None, chunk_rows=None):
+    """Stream a query result into a CSV or Parquet file chunk by chunk.
+
+    `out` is a path or a binary file object. Returns the number of rows written.
+    """
+    total_rows = 0
+    writer = None
+    try:
+        for i, (description, rows) in enumerate(iter_result_rows(connection, sql_query, params, chunk_rows)):
+            if file_format == 'parquet':
+                if writer is None:
+                    writer = pq.ParquetWriter(out, result_schema(description, rows), compression='zstd')
+                if rows:
+                    writer.write_table(rows_to_table(rows, writer.schema))
+            else:
+                chunk = pd.DataFrame(rows, columns=[column[0] for column in description])
+                data = chunk.to_csv(index=False, header=(i == 0)).encode('utf-8')
+                if hasattr(out, 'write'):
+                    out.write(data)
+                else:
+                    with open(out, 'wb' if i == 0 else 'ab') as f:
+                        f.write(data)
+            total_rows += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total_rows
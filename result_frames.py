@@ -0,0 +1,159 @@
+from decimal import Decimal
+from functools import lru_cache
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import schema
+
+# Rows turned into column arrays at a time; only this many row tuples are alive at once
+fetch_chunk_rows = 50000
+
+# Text columns holding one of a handful of values (the generator's fixed lists), read as categoricals
+category_columns = {
+    'status', 'role', 'team', 'party_type', 'currency', 'device_type', 'os', 'operating_system',
+    'browser', 'generated_by', 'alert_level', 'conclusion', 'category_code', 'country'
+}
+# Other text columns become categoricals too when this large and this repetitive
+category_min_rows = 1000
+category_max_distinct_ratio = 0.5
+
+_narrow_ints = [pa.int8(), pa.int16(), pa.int32(), pa.int64()]
+
+
+# -------------------
+# Column types
+# -------------------
+@lru_cache(maxsize=None)
+def schema_types():
+    """Arrow type of every column name in bank_fraud.sql, for names with one type across tables"""
+    types = {}
+    for table in schema.parse_schema().values():
+        for column in table.columns:
+            types.setdefault(column.name, set()).add(schema.arrow_type(column))
+    return {name: found.pop() for name, found in types.items() if len(found) == 1}
+
+
+def value_type(values):
+    """Arrow type for values Arrow is slow to infer: decimals, typed by the scale of the first one"""
+    first = next((value for value in values if value is not None), None)
+    if isinstance(first, Decimal):
+        return pa.decimal128(38, max(0, -first.as_tuple().exponent))
+    return None
+
+
+def to_arrow(values, name):
+    """One column of row values as an Arrow array, typed like the schema column of that name if any"""
+    arrow_type = schema_types().get(name) or value_type(values)
+    if arrow_type is not None:
+        try:
+            return pa.array(values, type=arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+            # An expression aliased to a schema column name, or decimals of mixed scale
+            pass
+    return pa.array(values)
+
+
+def compact(column, name):
+    """Smallest exact representation of a result column.
+
+    Whole-number decimals (MySQL's SUM of integers) become integers, integers
+    are narrowed to the smallest width holding their range, and repetitive
+    text is dictionary encoded so pandas reads it as a categorical.
+    """
+    if pa.types.is_decimal(column.type) and column.type.scale == 0:
+        try:
+            column = column.cast(pa.int64())
+        except pa.ArrowInvalid:
+            pass
+    if pa.types.is_integer(column.type) and pa.types.is_signed_integer(column.type) and len(column):
+        bounds = pc.min_max(column)
+        low, high = bounds['min'].as_py(), bounds['max'].as_py()
+        if low is not None:
+            for narrow in _narrow_ints:
+                if narrow.bit_width >= column.type.bit_width:
+                    break
+                limit = 1 << (narrow.bit_width - 1)
+                if -limit <= low and high < limit:
+                    return column.cast(narrow)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        rows = len(column) - column.null_count
+        if name in category_columns or (rows >= category_min_rows and
+                                        pc.count_distinct(column).as_py() <= rows * category_max_distinct_ratio):
+            return column.dictionary_encode()
+    return column
+
+
+def _pandas_type(arrow_type):
+    """pandas dtype for columns with nulls: masked integers and booleans, fixed-precision decimals"""
+    if pa.types.is_decimal(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    if pa.types.is_integer(arrow_type):
+        return pd.api.types.pandas_dtype(
+            f"{'UInt' if pa.types.is_unsigned_integer(arrow_type) else 'Int'}{arrow_type.bit_width}")
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    return None
+
+
+def to_series(column, name):
+    if pa.types.is_decimal(column.type) or column.null_count:
+        return pd.Series(column.to_pandas(types_mapper=_pandas_type), name=name)
+    return pd.Series(column.to_pandas(), name=name)
+
+
+# -------------------
+# Fetching
+# -------------------
+def fetch_columns(cursor, chunk_rows=None):
+    """Read a cursor's whole result as {column name: Arrow ChunkedArray}.
+
+    Every chunk of rows is transposed straight into typed Arrow arrays, one per
+    column, so the per-cell Python objects of a chunk are freed before the
+    next one is read instead of the whole result living as row tuples.
+    """
+    chunk_rows = chunk_rows or fetch_chunk_rows
+    names = list(cursor.column_names)
+    chunks = [[] for _ in names]
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        for i, (chunk, name) in enumerate(zip(chunks, names)):
+            chunk.append(to_arrow([row[i] for row in rows], name))
+        del rows
+    return {name: _combine(chunk) for name, chunk in zip(names, chunks)}
+
+
+def _combine(arrays):
+    """One ChunkedArray of a column's chunks, whose inferred types may differ
+    (a chunk of only NULLs, decimals of different precision)"""
+    if not arrays:
+        return pa.chunked_array([], type=pa.null())
+    types = {array.type for array in arrays}
+    if len(types) > 1:
+        target = pa.unify_schemas([pa.schema([('column', t)]) for t in types],
+                                  promote_options='permissive').field('column').type
+        arrays = [array.cast(target) for array in arrays]
+    return pa.chunked_array(arrays)
+
+
+def compact_frame(columns):
+    """DataFrame of {name: Arrow array} with compact dtypes (see compact())"""
+    return pd.DataFrame({name: to_series(compact(column, name), name)
+                         for name, column in columns.items()}, columns=list(columns))
+
+
+def arrow_to_frame(table):
+    """Compact DataFrame of an Arrow table, e.g. a DuckDB result"""
+    return compact_frame(dict(zip(table.column_names, table.columns)))
+
+
+def fetch_frame(cursor, chunk_rows=None):
+    return compact_frame(fetch_columns(cursor, chunk_rows))
+
+
+def for_statistics(df):
+    """df with decimal columns as float64: describe() and select_dtypes('number') skip or fail on them"""
+    decimals = [name for name, dtype in df.dtypes.items()
+                if isinstance(dtype, pd.ArrowDtype) and pa.types.is_decimal(dtype.pyarrow_dtype)]
+    return df.astype({name: 'float64' for name in decimals}) if decimals else df
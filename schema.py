@@ -0,0 +1,166 @@
+import os
+import re
+from functools import lru_cache
+from dataclasses import dataclass, field
+
+# Schema dump the database is created from
+schema_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bank_fraud.sql')
+
+# -------------------
+# Table definitions
+# -------------------
+@dataclass
+class Column:
+    name: str
+    sql_type: str          # base type, e.g. 'int', 'varchar', 'decimal'
+    length: int = None     # VARCHAR length or DECIMAL precision
+    scale: int = None      # DECIMAL scale
+    nullable: bool = True
+
+
+@dataclass
+class ForeignKey:
+    name: str
+    column: str
+    ref_table: str
+    ref_column: str
+
+
+@dataclass
+class Table:
+    name: str
+    columns: list = field(default_factory=list)
+    primary_key: list = field(default_factory=list)
+    keys: dict = field(default_factory=dict)          # secondary index name -> columns
+    foreign_keys: list = field(default_factory=list)
+
+    def column(self, name):
+        return next(c for c in self.columns if c.name == name)
+
+
+_create_table_re = re.compile(r"CREATE TABLE `(\w+)` \((.*?)\n\) ENGINE", re.S)
+_column_re = re.compile(r"`(\w+)` (\w+)(?:\((\d+)(?:,(\d+))?\))?(.*)")
+_key_re = re.compile(r"KEY `(\w+)` \((.*?)\)")
+_fk_re = re.compile(r"CONSTRAINT `(\w+)` FOREIGN KEY \(`(\w+)`\) REFERENCES `(\w+)` \(`(\w+)`\)")
+
+
+def _column_names(column_list):
+    return re.findall(r"`(\w+)`", column_list)
+
+
+@lru_cache(maxsize=None)
+def parse_schema(path=schema_file):
+    """Parse the CREATE TABLE statements of a mysqldump file into Table objects"""
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+
+    tables = {}
+    for name, body in _create_table_re.findall(sql):
+        table = Table(name)
+        for line in body.splitlines():
+            line = line.strip().rstrip(',')
+            if line.startswith('PRIMARY KEY'):
+                table.primary_key = _column_names(line)
+            elif line.startswith('CONSTRAINT'):
+                fk = _fk_re.match(line)
+                if fk:
+                    table.foreign_keys.append(ForeignKey(*fk.groups()))
+            elif line.startswith(('KEY', 'UNIQUE KEY')):
+                key = _key_re.search(line)
+                table.keys[key.group(1)] = _column_names(key.group(2))
+            elif line.startswith('`'):
+                column_name, sql_type, length, scale, rest = _column_re.match(line).groups()
+                table.columns.append(Column(
+                    name=column_name,
+                    sql_type=sql_type.lower(),
+                    length=int(length) if length else None,
+                    scale=int(scale) if scale else None,
+                    nullable='NOT NULL' not in rest
+                ))
+        tables[name] = table
+    return tables
+
+
+# -------------------
+# Foreign key dependency graph
+# -------------------
+def dependency_graph(tables, table_names=None):
+    """Map each table to the set of tables it references through foreign keys.
+
+    When table_names is given, the graph is restricted to those tables, so
+    parents that are not part of the load do not block their children.
+    """
+    names = set(table_names) if table_names is not None else set(tables)
+    graph = {}
+    for name in names:
+        table = tables.get(name)
+        parents = {fk.ref_table for fk in table.foreign_keys} if table else set()
+        graph[name] = {parent for parent in parents if parent in names and parent != name}
+    return graph
+
+
+def load_levels(graph):
+    """Group tables into levels where each level only depends on earlier ones"""
+    remaining = {name: set(parents) for name, parents in graph.items()}
+    levels = []
+    while remaining:
+        ready = sorted(name for name, parents in remaining.items() if not parents)
+        if not ready:
+            raise ValueError(f"Foreign key cycle between tables: {sorted(remaining)}")
+        levels.append(ready)
+        for name in ready:
+            del remaining[name]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return levels
+
+
+# -------------------
+# Column types for pandas and Arrow
+# -------------------
+# Dates, datetimes and decimals are read from CSV as text so MySQL parses them exactly
+_pandas_types = {
+    'tinyint': 'Int8', 'smallint': 'Int16', 'int': 'Int32', 'bigint': 'Int64',
+    'float': 'float32', 'double': 'float64', 'decimal': 'string',
+    'char': 'string', 'varchar': 'string', 'text': 'string',
+    'date': 'string', 'datetime': 'string', 'timestamp': 'string'
+}
+
+
+def pandas_dtypes(table):
+    """dtype mapping for pd.read_csv matching the table's column types"""
+    return {c.name: 'boolean' if (c.sql_type, c.length) == ('tinyint', 1) else _pandas_types.get(c.sql_type, 'string')
+            for c in table.columns}
+
+
+def arrow_type(column):
+    import pyarrow as pa
+    if (column.sql_type, column.length) == ('tinyint', 1):
+        return pa.bool_()
+    if column.sql_type == 'decimal':
+        return pa.decimal128(column.length or 10, column.scale or 0)
+    return {
+        'tinyint': pa.int8(), 'smallint': pa.int16(), 'int': pa.int32(), 'bigint': pa.int64(),
+        'float': pa.float32(), 'double': pa.float64(),
+        'date': pa.date32(), 'datetime': pa.timestamp('us'), 'timestamp': pa.timestamp('us')
+    }.get(column.sql_type, pa.string())
+
+
+def arrow_schema(table, column_names=None):
+    """Arrow schema for the table, optionally restricted to and ordered by column_names"""
+    import pyarrow as pa
+    columns = table.columns if column_names is None else [table.column(name) for name in column_names]
+    return pa.schema([pa.field(c.name, arrow_type(c), nullable=c.nullable) for c in columns])
+
+
+def duckdb_type(column):
+    """DuckDB column type matching the MySQL one, for reading the CSV files with fixed types"""
+    if (column.sql_type, column.length) == ('tinyint', 1):
+        return 'BOOLEAN'
+    if column.sql_type == 'decimal':
+        return f"DECIMAL({column.length or 10}, {column.scale or 0})"
+    return {
+        'tinyint': 'TINYINT', 'smallint': 'SMALLINT', 'int': 'INTEGER', 'bigint': 'BIGINT',
+        'float': 'FLOAT', 'double': 'DOUBLE',
+        'date': 'DATE', 'datetime': 'TIMESTAMP', 'timestamp': 'TIMESTAMP'
+    }.get(column.sql_type, 'VARCHAR')
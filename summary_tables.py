@@ -0,0 +1,282 @@
+import pandas as pd
+from mysql.connector import Error
+
+# Alert statuses the dashboard treats as open
+open_alert_statuses = ('active', 'open')
+
+# Parties refreshed per statement during an incremental refresh
+refresh_batch_size = 1000
+
+# -------------------
+# Party-alert summary
+# -------------------
+party_alert_summary_ddl = """
+    CREATE TABLE IF NOT EXISTS party_alert_summary (
+        party_id INT NOT NULL,
+        open_alert_count INT NOT NULL,
+        associated_accounts TEXT,
+        refreshed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (party_id),
+        KEY idx_party_alert_count (open_alert_count, party_id)
+    )
+"""
+
+# Columns of the source tables whose values identify the parties a changed row affects
+party_alert_sources = {
+    'fraud_alert_data': ['transaction_id'],
+    'transaction_data': ['payer_party_id', 'payee_party_id'],
+    'customer_account_data': ['party_id'],
+}
+
+
+def summary_table_names():
+    """Tables created by migrations.py that the dashboard analyses read"""
+    return ['party_alert_summary', *_login_rollup_inserts]
+
+
+def _in_list(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def party_alert_rows_sql(party_ids=None):
+    """SELECT building summary rows, for every party or only the given ones.
+
+    Payer and payee alerts are read by two index lookups combined with UNION
+    instead of one join on `payer = party OR payee = party`. The count keeps
+    the semantics of that join: each open alert counts once per
+    customer_account_data row of the party.
+    """
+    payer_filter = payee_filter = ''
+    if party_ids is not None:
+        payer_filter = f"AND td.payer_party_id IN ({_in_list(party_ids)})"
+        payee_filter = f"AND td.payee_party_id IN ({_in_list(party_ids)})"
+    statuses = _in_list(open_alert_statuses)
+    sql = f"""
+        SELECT alerts.party_id,
+               COUNT(*) * (SELECT COUNT(*) FROM customer_account_data ca
+                           WHERE ca.party_id = alerts.party_id) AS open_alert_count,
+               (SELECT GROUP_CONCAT(DISTINCT ca.account_id ORDER BY ca.account_id)
+                FROM customer_account_data ca WHERE ca.party_id = alerts.party_id) AS associated_accounts
+        FROM (
+            SELECT td.payer_party_id AS party_id, fa.alert_id
+            FROM fraud_alert_data fa
+            JOIN transaction_data td ON fa.transaction_id = td.transaction_id
+            WHERE fa.status IN ({statuses}) {payer_filter}
+            UNION
+            SELECT td.payee_party_id AS party_id, fa.alert_id
+            FROM fraud_alert_data fa
+            JOIN transaction_data td ON fa.transaction_id = td.transaction_id
+            WHERE fa.status IN ({statuses}) {payee_filter}
+        ) alerts
+        WHERE EXISTS (SELECT 1 FROM customer_account_data ca WHERE ca.party_id = alerts.party_id)
+        GROUP BY alerts.party_id
+    """
+    params = list(open_alert_statuses) + list(party_ids or []) + list(open_alert_statuses) + list(party_ids or [])
+    return sql, params
+
+
+def refresh_party_alert_summary(connection, party_ids=None):
+    """Recompute summary rows for the given parties, or rebuild the whole table.
+
+    Each batch is replaced in one transaction, so readers never see a party
+    without its row. Returns the number of parties refreshed.
+    """
+    cursor = connection.cursor()
+    if party_ids is None:
+        sql, params = party_alert_rows_sql()
+        cursor.execute("DELETE FROM party_alert_summary")
+        cursor.execute(f"INSERT INTO party_alert_summary (party_id, open_alert_count, associated_accounts) {sql}",
+                       params)
+        connection.commit()
+        cursor.execute("SELECT COUNT(*) FROM party_alert_summary")
+        refreshed = cursor.fetchone()[0]
+        cursor.close()
+        return refreshed
+
+    party_ids = sorted(party_ids)
+    for i in range(0, len(party_ids), refresh_batch_size):
+        batch = party_ids[i:i + refresh_batch_size]
+        sql, params = party_alert_rows_sql(batch)
+        cursor.execute(f"DELETE FROM party_alert_summary WHERE party_id IN ({_in_list(batch)})", batch)
+        cursor.execute(f"INSERT INTO party_alert_summary (party_id, open_alert_count, associated_accounts) {sql}",
+                       params)
+        connection.commit()
+    cursor.close()
+    return len(party_ids)
+
+
+def parties_for_transactions(connection, transaction_ids):
+    """Payer and payee party ids of the given transactions"""
+    cursor = connection.cursor()
+    parties = set()
+    transaction_ids = sorted(transaction_ids)
+    for i in range(0, len(transaction_ids), refresh_batch_size):
+        batch = transaction_ids[i:i + refresh_batch_size]
+        cursor.execute(f"SELECT payer_party_id, payee_party_id FROM transaction_data "
+                       f"WHERE transaction_id IN ({_in_list(batch)})", batch)
+        for payer, payee in cursor.fetchall():
+            parties.update(p for p in (payer, payee) if p is not None)
+    cursor.close()
+    return parties
+
+
+# -------------------
+# Hourly login rollups
+# -------------------
+# Start of the hour a login timestamp falls in
+hour_of_login = "TIMESTAMP(DATE(lid.timestamp), MAKETIME(HOUR(lid.timestamp), 0, 0))"
+
+login_rollup_ddl = [
+    """
+    CREATE TABLE IF NOT EXISTS login_hourly_party (
+        hour DATETIME NOT NULL,
+        party_id INT NOT NULL,
+        failed INT NOT NULL,
+        succeeded INT NOT NULL,
+        last_failed_at DATETIME DEFAULT NULL,
+        PRIMARY KEY (hour, party_id),
+        KEY idx_login_hourly_party (party_id, hour)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS login_hourly_device (
+        hour DATETIME NOT NULL,
+        device_id INT NOT NULL,
+        failed INT NOT NULL,
+        succeeded INT NOT NULL,
+        PRIMARY KEY (hour, device_id)
+    )
+    """,
+    # Distinct device/party pairs per hour; accounts are reached through
+    # customer_account_data at query time, so account changes need no refresh
+    """
+    CREATE TABLE IF NOT EXISTS login_hourly_device_party (
+        hour DATETIME NOT NULL,
+        device_id INT NOT NULL,
+        party_id INT NOT NULL,
+        logins INT NOT NULL,
+        PRIMARY KEY (hour, device_id, party_id)
+    )
+    """,
+]
+
+_login_rollup_inserts = {
+    'login_hourly_party': f"""
+        INSERT INTO login_hourly_party (hour, party_id, failed, succeeded, last_failed_at)
+        SELECT {hour_of_login} AS hour, lid.party_id,
+               COALESCE(SUM(lid.successful = FALSE), 0), COALESCE(SUM(lid.successful = TRUE), 0),
+               MAX(CASE WHEN lid.successful = FALSE THEN lid.timestamp END)
+        FROM login_instance_data lid
+        WHERE lid.timestamp IS NOT NULL AND lid.party_id IS NOT NULL {{where}}
+        GROUP BY hour, lid.party_id
+    """,
+    'login_hourly_device': f"""
+        INSERT INTO login_hourly_device (hour, device_id, failed, succeeded)
+        SELECT {hour_of_login} AS hour, lid.device_id,
+               COALESCE(SUM(lid.successful = FALSE), 0), COALESCE(SUM(lid.successful = TRUE), 0)
+        FROM login_instance_data lid
+        WHERE lid.timestamp IS NOT NULL AND lid.device_id IS NOT NULL {{where}}
+        GROUP BY hour, lid.device_id
+    """,
+    'login_hourly_device_party': f"""
+        INSERT INTO login_hourly_device_party (hour, device_id, party_id, logins)
+        SELECT {hour_of_login} AS hour, lid.device_id, lid.party_id, COUNT(*)
+        FROM login_instance_data lid
+        WHERE lid.timestamp IS NOT NULL AND lid.device_id IS NOT NULL AND lid.party_id IS NOT NULL {{where}}
+        GROUP BY hour, lid.device_id, lid.party_id
+    """,
+}
+
+
+def refresh_login_rollups(connection, hours=None):
+    """Recompute the hourly rollups for the given hours (datetimes), or rebuild them all.
+
+    Hours are refreshed in batches, each replaced in one transaction; the raw
+    rows are read through a timestamp range so the timestamp index applies.
+    Returns the number of hours refreshed (None for a full rebuild).
+    """
+    cursor = connection.cursor()
+    if hours is None:
+        for table_name, insert_sql in _login_rollup_inserts.items():
+            cursor.execute(f"DELETE FROM {table_name}")
+            cursor.execute(insert_sql.format(where=''))
+        connection.commit()
+        cursor.close()
+        return None
+
+    hours = sorted(hours)
+    for i in range(0, len(hours), refresh_batch_size):
+        batch = hours[i:i + refresh_batch_size]
+        where = (f"AND lid.timestamp >= %s AND lid.timestamp < %s + INTERVAL 1 HOUR "
+                 f"AND {hour_of_login} IN ({_in_list(batch)})")
+        for table_name, insert_sql in _login_rollup_inserts.items():
+            cursor.execute(f"DELETE FROM {table_name} WHERE hour IN ({_in_list(batch)})", batch)
+            cursor.execute(insert_sql.format(where=where), [batch[0], batch[-1]] + batch)
+        connection.commit()
+    cursor.close()
+    return len(hours)
+
+
+def trim_login_rollups(connection, start, end):
+    """Delete the rollup hours in [start, end) (no lower limit when start is None),
+    after the logins of that range were dropped"""
+    cursor = connection.cursor()
+    where, params = ("hour >= %s AND hour < %s", [start, end]) if start is not None else ("hour < %s", [end])
+    for table_name in _login_rollup_inserts:
+        cursor.execute(f"DELETE FROM {table_name} WHERE {where}", params)
+    connection.commit()
+    cursor.close()
+
+
+# -------------------
+# Refresh after a load
+# -------------------
+def touched_keys(table_name, chunk, touched):
+    """Collect the key values of written rows that summaries depend on into touched[table_name]"""
+    if table_name == 'login_instance_data' and 'timestamp' in chunk.columns:
+        hours = pd.to_datetime(chunk['timestamp'], errors='coerce', format='ISO8601').dropna().dt.floor('h')
+        touched.setdefault(table_name, set()).update(hours.drop_duplicates().dt.to_pydatetime())
+        return
+    columns = [c for c in party_alert_sources.get(table_name, []) if c in chunk.columns]
+    if not columns:
+        return
+    keys = touched.setdefault(table_name, set())
+    for column in columns:
+        keys.update(int(v) for v in pd.unique(chunk[column].dropna()))
+
+
+def refresh_after_load(connection, loaded_tables, touched=None):
+    """Bring the summary tables up to date after bulk_loader loaded some tables.
+
+    With `touched` (key values collected during an incremental load) only the
+    affected parties are recomputed; a full reload of a source table rebuilds
+    the summary. A party whose transaction moved to another payer is only
+    refreshed under its new payer until the next full rebuild.
+    """
+    if 'login_instance_data' in loaded_tables:
+        try:
+            if touched is None:
+                refresh_login_rollups(connection)
+                print("Rebuilt the hourly login rollups")
+            elif touched.get('login_instance_data'):
+                hours = refresh_login_rollups(connection, touched['login_instance_data'])
+                print(f"Refreshed the hourly login rollups for {hours:,} hours")
+        except Error as e:
+            print(f"Warning: could not refresh the hourly login rollups (run migrations.py first?): {e}")
+
+    sources = [t for t in loaded_tables if t in party_alert_sources]
+    if not sources:
+        return
+    try:
+        if touched is None:
+            rows = refresh_party_alert_summary(connection)
+            print(f"Rebuilt party_alert_summary ({rows:,} parties)")
+            return
+        parties = set(touched.get('transaction_data', set())) | set(touched.get('customer_account_data', set()))
+        if touched.get('fraud_alert_data'):
+            parties |= parties_for_transactions(connection, touched['fraud_alert_data'])
+        if parties:
+            refresh_party_alert_summary(connection, parties)
+            print(f"Refreshed party_alert_summary for {len(parties):,} parties")
+    except Error as e:
+        print(f"Warning: could not refresh party_alert_summary (run migrations.py first?): {e}")
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scratch database the MySQL tests create their tables in (never the configured one)
+test_database = os.environ.get('FRAUD_TEST_DATABASE', 'fraud_detection_test')
+
+
+@pytest.fixture
+def mysql_connection():
+    """Connection to a scratch database on the MySQL server from bulk_loader's config
+    (or FRAUD_TEST_SECRETS); the test is skipped when no server is reachable"""
+    import mysql.connector
+    from mysql.connector import Error
+    from migrations import connect_args
+    args = {key: value for key, value in connect_args(os.environ.get('FRAUD_TEST_SECRETS')).items()
+            if key != 'database'}
+    try:
+        connection = mysql.connector.connect(**args, allow_local_infile=True)
+    except Error as e:
+        pytest.skip(f"MySQL not reachable: {e}")
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {test_database}")
+    cursor.execute(f"USE {test_database}")
+    cursor.close()
+    yield connection
+    connection.close()
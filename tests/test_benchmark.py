@@ -0,0 +1,40 @@
+import os
+import copy
+import benchmark
+import Create_Tables
+from fraud_queries import query_map
+
+
+def report(scale=1.0, p95=1.0, rss=1.0):
+    timing = {'p50': 0.1 * scale, 'p95': 0.2 * p95}
+    return {'backend': 'duckdb', 'scale_factors': {'0.005': {
+        'generate': {'seconds': 1.0 * scale, 'rows_per_sec': 1000.0, 'peak_rss_mb': 100.0},
+        'load': {'seconds': 1.0, 'rows_per_sec': 1000.0 / scale, 'peak_rss_mb': 200.0 * rss},
+        'query_peak_rss_mb': 300.0,
+        'queries': {'Top Failed Logins (7 days)': {'rows': 10, 'cold': dict(timing), 'warm': dict(timing)}}}}}
+
+
+def test_p95_and_peak_rss_regressions_are_reported():
+    assert benchmark.compare_reports(report(), report(scale=1.1, p95=1.1, rss=1.1)) == []
+    regressions = benchmark.compare_reports(report(), report(p95=2.0, rss=1.5))
+    assert sorted(line.split(':')[0] for line in regressions) == [
+        'SF0.005 Top Failed Logins (7 days) cold p95', 'SF0.005 Top Failed Logins (7 days) warm p95',
+        'SF0.005 load peak RSS']
+    assert 'SF0.005 load peak RSS: 200 MB -> 300 MB (+50% worse)' in regressions
+
+
+def test_older_reports_without_query_rss_still_compare():
+    baseline = report()
+    del baseline['scale_factors']['0.005']['query_peak_rss_mb']
+    assert benchmark.compare_reports(baseline, copy.deepcopy(report())) == []
+
+
+def test_queries_read_the_loaded_duckdb_file(tmp_path):
+    Create_Tables.main(['--output-dir', str(tmp_path), '--sf', '0.002'])
+    benchmark.load_duckdb(str(tmp_path), benchmark.duckdb_file(str(tmp_path)))
+    for name in os.listdir(tmp_path):
+        if not name.endswith('.duckdb'):
+            os.remove(tmp_path / name)
+    backend = benchmark.open_backend('duckdb', str(tmp_path), None)
+    results = {name: backend.run(sql_query) for name, sql_query in query_map.items()}
+    assert len(results['Parties with Active Fraud Alerts']) > 0
@@ -0,0 +1,98 @@
+import re
+import pytest
+from mysql.connector import errors
+import bulk_loader
+
+
+def test_sequential_load_skips_children_of_a_failed_table(monkeypatch):
+    jobs = {table_name: f"{table_name}.csv" for table_name in
+            ['card_data', 'customer_account_data', 'login_instance_data', 'party_table', 'customer_data',
+             'merchant_data', 'account_data', 'device_data', 'location_data']}
+    calls = []
+
+    def load(csv_path, table_name, connection, **kwargs):
+        calls.append(table_name)
+        return None if table_name == 'party_table' else 10
+
+    monkeypatch.setattr(bulk_loader, 'load_csv_streaming', load)
+    monkeypatch.setattr(bulk_loader, 'record_load', lambda *args: None)
+    loaded, failed, touched = bulk_loader.load_tables_sequential(jobs, connection=None)
+
+    # Everything below party_table goes in with foreign key checks off, so none of it may load
+    assert failed == {'party_table', 'customer_data', 'merchant_data', 'customer_account_data',
+                      'login_instance_data'}
+    assert set(calls).isdisjoint(failed - {'party_table'})
+    assert sorted(loaded) == ['account_data', 'card_data', 'device_data', 'location_data']
+    assert calls.index('account_data') < calls.index('card_data')
+    assert touched is None
+
+
+class SwapDatabase:
+    """Stands in for a MySQL connection holding child foreign keys, keeping the statements it was sent.
+
+    Adding a foreign key that points at fail_target fails `failures` times.
+    """
+
+    add_re = re.compile(r"ALTER TABLE (\w+) ADD CONSTRAINT `(\w+)` FOREIGN KEY \((\w+)\) REFERENCES (\w+) \((\w+)\)")
+
+    def __init__(self, keys, tables=(), fail_target=None, failures=0):
+        self.keys = dict(keys)          # name -> (child, column, ref_table, ref_column)
+        self.tables = set(tables)
+        self.fail_target, self.failures = fail_target, failures
+        self.statements = []
+        self.rows = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.statements.append(sql)
+        self.rows = []
+        if 'REFERENCED_TABLE_NAME = %s' in sql:
+            self.rows = [(name, child, column, ref_table, ref_column, 'CASCADE', 'RESTRICT')
+                         for name, (child, column, ref_table, ref_column) in sorted(self.keys.items())
+                         if ref_table == params[0]]
+        elif 'information_schema.TABLES' in sql:
+            self.rows = [(name,) for name in sorted(self.tables) if name.endswith('__old')]
+        elif match := re.match(r"ALTER TABLE (\w+) DROP FOREIGN KEY `(\w+)`", sql):
+            del self.keys[match.group(2)]
+        elif match := self.add_re.match(sql):
+            child, name, column, ref_table, ref_column = match.groups()
+            if ref_table == self.fail_target and self.failures:
+                self.failures -= 1
+                raise errors.OperationalError(msg="Lock wait timeout exceeded", errno=1205)
+            self.keys[name] = (child, column, ref_table, ref_column)
+        elif match := re.match(r"DROP TABLE IF EXISTS (\w+)", sql):
+            self.tables.discard(match.group(1))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def test_failed_repoint_keeps_the_foreign_key_and_a_rerun_finishes_the_swap():
+    database = SwapDatabase({'card_fk': ('card_data', 'account_id', 'account_data__old', 'account_id')},
+                            tables={'account_data', 'account_data__old'}, fail_target='account_data', failures=1)
+    with pytest.raises(errors.Error):
+        bulk_loader.finish_swap(database, 'account_data')
+    # The child still has its constraint, on the old table, and the old table is kept
+    assert database.keys['card_fk'][2] == 'account_data__old'
+    assert 'account_data__old' in database.tables
+
+    bulk_loader.finish_swap(database, 'account_data')
+    assert database.keys['card_fk'][2] == 'account_data'
+    assert 'account_data__old' not in database.tables
+
+
+def test_finish_swaps_completes_every_leftover_swap():
+    database = SwapDatabase({'card_fk': ('card_data', 'account_id', 'account_data__old', 'account_id'),
+                             'login_fk': ('login_instance_data', 'device_id', 'device_data', 'device_id')},
+                            tables={'account_data', 'account_data__old', 'device_data'})
+    assert bulk_loader.finish_swaps(database) == ['account_data']
+    assert database.keys['card_fk'][2] == 'account_data'
+    assert database.keys['login_fk'][2] == 'device_data'
+    assert database.tables == {'account_data', 'device_data'}
+    assert database.statements[-1] == "SET FOREIGN_KEY_CHECKS = COALESCE(@fk_checks, 1)"
@@ -0,0 +1,105 @@
+import pytest
+import mysql.connector
+from mysql.connector import errors
+import db_pool
+import query_backends
+
+
+class FakeCursor:
+    """Prepared-statement cursor that fails once for SQL containing 'fail'"""
+
+    column_names = ['n']
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+        self.rows = []
+
+    def execute(self, operation, params=()):
+        self.connection.executed.append(operation)
+        if 'fail' in operation and not self.connection.failed:
+            self.connection.failed = True
+            raise errors.DatabaseError(msg="Deadlock found", errno=1213)
+        self.rows = [(1,)]
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursors = []
+        self.executed = []
+        self.failed = False
+        self.alive = True
+        self.reconnects = 0
+
+    def cursor(self, prepared=False):
+        cursor = FakeCursor(self)
+        if prepared:
+            self.cursors.append(cursor)
+        return cursor
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise errors.InterfaceError(msg="Lost connection")
+
+    def reconnect(self, attempts=1):
+        self.alive = True
+        self.reconnects += 1
+
+    def is_connected(self):
+        return self.alive
+
+    def close(self):
+        self.alive = False
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(mysql.connector, 'connect', lambda **kwargs: FakeConnection())
+    return db_pool.ConnectionPool(1, ping_after=0, statement_cache_size=2)
+
+
+def test_least_recently_used_statement_is_closed(pool):
+    conn = pool.get_connection()
+    a, _ = pool.prepared(conn, "SELECT a")
+    b, _ = pool.prepared(conn, "SELECT b")
+    assert pool.prepared(conn, "SELECT a")[0] is a
+    c, _ = pool.prepared(conn, "SELECT c")
+    # b was used least recently
+    assert b.closed and not a.closed and not c.closed
+    assert pool.prepared(conn, "SELECT b")[0] is not b
+    stats = pool.stats()
+    assert (stats['statements'], stats['statement_hits'], stats['prepares']) == (2, 1, 4)
+
+
+def test_failed_statement_is_prepared_again(pool):
+    backend = query_backends.MySQLBackend(pool)
+    with pytest.raises(query_backends.QueryError):
+        backend.run("SELECT fail")
+    conn = pool.get_connection()
+    failed = conn.cursors[0]
+    assert failed.closed
+    pool.release(conn)
+    assert backend.run("SELECT fail")['n'].tolist() == [1]
+    assert len(conn.cursors) == 2 and not conn.cursors[1].closed
+    # The new statement is reused from then on
+    backend.run("SELECT fail")
+    assert len(conn.cursors) == 2
+
+
+def test_reconnect_drops_the_statements_of_the_old_session(pool):
+    conn = pool.get_connection()
+    old, _ = pool.prepared(conn, "SELECT a")
+    pool.release(conn)
+    conn.alive = False
+    conn = pool.get_connection()
+    assert conn.reconnects == 1
+    assert old.closed
+    assert pool.stats()['statements'] == 0
+    assert pool.prepared(conn, "SELECT a")[0] is not old
@@ -0,0 +1,120 @@
+import os
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import numpy as np
+import pytest
+import bulk_loader
+import Create_Tables
+import load_validation
+import schema
+
+modes = ['stream', 'incremental', 'swap', 'full']
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    """Dataset written by Create_Tables.py with its default settings"""
+    output_dir = tmp_path_factory.mktemp('generated')
+    Create_Tables.main(['--output-dir', str(output_dir)])
+    return output_dir
+
+
+def generated_tables(output_dir):
+    return {re.sub(r'\.part-\d+$', '', os.path.splitext(name)[0]) for name in os.listdir(output_dir)}
+
+
+def file_rows(data_file, table_name):
+    return sum(len(chunk) for chunk in bulk_loader.read_chunks(data_file, table_name, bulk_loader.chunk_size))
+
+
+def test_loader_finds_and_reads_every_generated_table(generated, monkeypatch):
+    monkeypatch.setattr(bulk_loader, 'folder', str(generated))
+    jobs = bulk_loader.data_jobs()
+    assert set(jobs) == generated_tables(generated)
+    for table_name, data_file in jobs.items():
+        assert file_rows(data_file, table_name) > 0
+    assert load_validation.validate_tables(jobs) == {}
+
+
+def create_tables(cursor):
+    with open(schema.schema_file) as f:
+        statements = re.sub(r'/\*.*?\*/|--[^\n]*', '', f.read(), flags=re.S).split(';')
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for statement in statements:
+        if statement.strip():
+            cursor.execute(statement)
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+@pytest.mark.parametrize('mode', modes)
+def test_default_output_loads_in_every_mode(generated, mode, mysql_connection, monkeypatch):
+    monkeypatch.setattr(bulk_loader, 'folder', str(generated))
+    cursor = mysql_connection.cursor()
+    create_tables(cursor)
+    jobs = bulk_loader.data_jobs()
+    state = {}
+    for table_name, data_file in jobs.items():
+        if mode == 'stream':
+            rows = bulk_loader.load_csv_streaming(data_file, table_name, mysql_connection, load_data=False)
+        elif mode == 'incremental':
+            rows = bulk_loader.load_csv_incremental(data_file, table_name, mysql_connection, state)
+        elif mode == 'swap':
+            rows = bulk_loader.load_csv_swap(data_file, table_name, mysql_connection, load_data=False)
+        else:
+            rows = bulk_loader.load_csv_to_mysql(data_file, table_name, mysql_connection)
+        assert rows == file_rows(data_file, table_name)
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        assert cursor.fetchone()[0] == rows
+    cursor.close()
+
+
+def test_tiny_scale_factor_generates_without_alerts(tmp_path, monkeypatch):
+    Create_Tables.main(['--output-dir', str(tmp_path), '--sf', '0.00001'])
+    monkeypatch.setattr(bulk_loader, 'folder', str(tmp_path))
+    jobs = bulk_loader.data_jobs()
+    assert file_rows(jobs['party_table'], 'party_table') == 2
+    assert file_rows(jobs['transaction_data'], 'transaction_data') > 0
+    assert file_rows(jobs['fraud_alert_data'], 'fraud_alert_data') == 0
+    assert file_rows(jobs['investigation_data'], 'investigation_data') == 0
+    assert load_validation.validate_tables(jobs) == {}
+    rng = Create_Tables.table_rng(42, 'fraud_alert_data')
+    assert Create_Tables.build_fraud_alert(rng, 10, np.array([], dtype=np.int64), np.datetime64('now', 's')).empty
+
+
+def driver_value(value):
+    """Numbers by value (CSV has 8281.8 where Parquet has the DECIMAL 8281.80), anything else as text"""
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return str(value)
+
+
+def driver_rows(data_file, table_name):
+    """Rows as the loader sends them; dates go as text from CSV and as date objects from Parquet"""
+    return [tuple(None if v is None else driver_value(v) for v in row)
+            for chunk in bulk_loader.read_chunks(data_file, table_name, 100)
+            for row in zip(*bulk_loader.chunk_to_columns(chunk))]
+
+
+class FixedNow(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 5, 1, 12, 0, 0)
+
+
+def test_parquet_is_typed_and_loads_the_same_values_as_csv(tmp_path, monkeypatch):
+    # Both runs must generate the same timestamps
+    monkeypatch.setattr(Create_Tables, 'datetime', FixedNow)
+    # main() keeps the last --format as the default of the next run
+    monkeypatch.setattr(Create_Tables, 'output_format', Create_Tables.output_format)
+    for file_format in ('parquet', 'csv'):
+        Create_Tables.main(['--output-dir', str(tmp_path / file_format), '--sf', '0.0005', '--format', file_format])
+    tables = schema.parse_schema()
+    for table_name in generated_tables(tmp_path / 'parquet'):
+        parquet_file = str(tmp_path / 'parquet' / f"{table_name}.parquet")
+        chunk = next(bulk_loader.read_chunks(parquet_file, table_name, 100))
+        target = schema.arrow_schema(tables[table_name], list(chunk.columns))
+        assert [dtype.pyarrow_dtype for dtype in chunk.dtypes] == target.types
+        assert driver_rows(parquet_file, table_name) == \
+            driver_rows(str(tmp_path / 'csv' / f"{table_name}.csv"), table_name)
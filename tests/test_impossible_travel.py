@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import Create_Tables
+import impossible_travel
+
+# London, New York, Paris and two points either side of the dateline
+coordinates = impossible_travel.Coordinates([1, 2, 3, 4, 5], [51.5, 40.7, 48.9, 10.0, 10.0],
+                                            [-0.1, -74.0, 2.4, 179.9, -179.9])
+
+
+def logins(rows):
+    """Login arrays from (login_id, party_id, location_id, timestamp) rows"""
+    return {column: np.array(values, dtype=np.int64)
+            for column, values in zip(impossible_travel.login_columns, zip(*rows))}
+
+
+def test_consecutive_hops_pair_each_login_with_the_partys_previous_one():
+    batch = logins([(3, 7, 2, 7200), (1, 7, 1, 0), (4, 8, 3, 30), (2, 7, 3, 3600), (5, 8, 1, 0),
+                    (6, -1, 1, 10), (7, 8, 2, np.iinfo(np.int64).min)])
+    current, previous, distance, seconds, speed = impossible_travel.consecutive_hops(batch, coordinates)
+    pairs = sorted(zip(batch['login_id'][previous].tolist(), batch['login_id'][current].tolist()))
+    assert pairs == [(1, 2), (2, 3), (5, 4)]
+    by_pair = {(int(batch['login_id'][p]), int(batch['login_id'][c])): (d, s, v)
+               for p, c, d, s, v in zip(previous, current, distance, seconds, speed)}
+    d, s, v = by_pair[(1, 2)]
+    assert np.isclose(d, impossible_travel.haversine_km(51.5, -0.1, 48.9, 2.4), rtol=1e-4)
+    assert s == 3600 and np.isclose(v, d)
+    # 30 seconds apart count as min_gap_seconds
+    d, s, v = by_pair[(5, 4)]
+    assert s == 30 and np.isclose(v, d / (impossible_travel.min_gap_seconds / 3600))
+
+
+def test_consecutive_hops_without_the_packed_sort_key():
+    rows = [(1, 7, 1, 0), (2, 7, 3, 3600), (3, 8, 2, 100), (4, 8, 1, 5000)]
+    packed = impossible_travel.consecutive_hops(logins(rows), coordinates)
+    # A party id past 2**31 falls back to the multi-key sort
+    wide = [(login_id, party + 2 ** 31 if party == 8 else party, location, ts) for login_id, party, location, ts in rows]
+    fallback = impossible_travel.consecutive_hops(logins(wide), coordinates)
+    for a, b in zip(packed, fallback):
+        assert np.array_equal(np.sort(a), np.sort(b))
+
+
+def test_a_pair_across_batches_is_flagged():
+    state = impossible_travel.TravelState()
+    assert state.check(logins([(1, 7, 1, 0), (2, 8, 3, 0)]), coordinates).empty
+    # London to New York in an hour, with the London login in the earlier batch
+    flagged = state.check(logins([(3, 7, 2, 3600), (4, 8, 3, 7200)]), coordinates)
+    assert flagged[['party_id', 'previous_login_id', 'login_id']].values.tolist() == [[7, 1, 3]]
+    assert state.last_login_id == 4
+
+
+def test_state_carries_over_between_runs(tmp_path):
+    path = str(tmp_path / 'travel.npz')
+    state = impossible_travel.TravelState()
+    state.check(logins([(1, 7, 1, 0)]), coordinates)
+    state.save(path)
+    state = impossible_travel.TravelState.load(path)
+    flagged = state.check(logins([(2, 7, 2, 3600)]), coordinates)
+    assert flagged['previous_login_id'].tolist() == [1]
+
+
+def test_incremental_runs_flag_the_same_pairs_as_a_full_run(tmp_path):
+    data_dir = tmp_path / 'data'
+    Create_Tables.main(['--output-dir', str(data_dir), '--sf', '0.002'])
+    full, state_run = tmp_path / 'full.csv', tmp_path / 'state.csv'
+    state = str(tmp_path / 'travel.npz')
+    assert impossible_travel.main(['--data-dir', str(data_dir), '--output', str(full)]) == 0
+    assert impossible_travel.main(['--data-dir', str(data_dir), '--state', state, '--output', str(state_run)]) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(full), pd.read_csv(state_run))
+    # Nothing new since the last run
+    assert impossible_travel.main(['--data-dir', str(data_dir), '--state', state, '--output', str(state_run)]) == 0
+    assert len(pd.read_csv(state_run)) == 0
+
+
+def test_grid_matches_a_brute_force_search():
+    rng = np.random.default_rng(7)
+    n = 5000
+    lat = np.concatenate([rng.uniform(-90, 90, n), rng.uniform(85, 90, 300), rng.uniform(-90, -85, 300),
+                          rng.uniform(-5, 5, 300)])
+    lon = np.concatenate([rng.uniform(-180, 180, n), rng.uniform(-180, 180, 600),
+                          np.where(rng.random(300) < 0.5, rng.uniform(177, 180, 300), rng.uniform(-180, -177, 300))])
+    points = impossible_travel.Coordinates(np.arange(len(lat)), lat, lon)
+    grid = impossible_travel.LocationGrid(points)
+    # Across the dateline, around both poles and in the open
+    for point_lat, point_lon, radius in [(0.0, 179.9, 300), (0.0, -179.95, 150), (89.5, 0.0, 200),
+                                         (-89.9, 120.0, 500), (88.0, 179.0, 400), (45.0, 10.0, 800),
+                                         (-30.0, -60.0, 300)]:
+        distances = impossible_travel.haversine_km(point_lat, point_lon, points.lat, points.lon)
+        expected = np.flatnonzero(distances <= radius)
+        found, found_distances = grid.near(point_lat, point_lon, radius)
+        assert len(expected) > 0
+        assert np.array_equal(np.sort(found), expected)
+        assert np.all(np.diff(found_distances) >= 0)
@@ -0,0 +1,133 @@
+import numpy as np
+import link_graph
+
+device, party, account = (link_graph.node_kinds.index(kind) for kind in ('device', 'party', 'account'))
+
+
+def reference_components(links):
+    """Clusters of (kind, id) entities from a dict-based union-find"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in links:
+        parent[find(a)] = find(b)
+    clusters = {}
+    for x in parent:
+        clusters.setdefault(find(x), set()).add(x)
+    return {frozenset(members) for members in clusters.values()}
+
+
+def graph_components(graph):
+    clusters = {}
+    for kind, entity_id, root in zip(graph.kinds, graph.ids, graph.root):
+        clusters.setdefault(int(root), set()).add((int(kind), int(entity_id)))
+    return {frozenset(members) for members in clusters.values()}
+
+
+def random_graph(seed=3, batches=6):
+    rng = np.random.default_rng(seed)
+    graph = link_graph.LinkGraph()
+    links = []
+    for _ in range(batches):
+        parties = rng.integers(0, 400, 300)
+        devices = rng.integers(0, 500, 300)
+        graph.add_logins(np.arange(300), parties, devices)
+        links += [((device, int(d)), (party, int(p))) for p, d in zip(parties, devices)]
+        parties, accounts = rng.integers(0, 400, 100), rng.integers(0, 600, 100)
+        graph.add_accounts(parties, accounts)
+        links += [((party, int(p)), (account, int(a))) for p, a in zip(parties, accounts)]
+    return graph, links
+
+
+def test_clusters_match_a_reference_union_find():
+    graph, links = random_graph()
+    assert graph_components(graph) == reference_components(links)
+    # Every root is the smallest node of its cluster and points at itself
+    for root in np.unique(graph.root):
+        assert graph.root[root] == root
+        assert np.flatnonzero(graph.root == root).min() == root
+    # Looking up any member gives its cluster's counts
+    largest = max(reference_components(links), key=len)
+    kind, entity_id = next(iter(largest))
+    found = graph.cluster(link_graph.node_kinds[kind], entity_id)
+    assert found['devices'] + found['parties'] + found['accounts'] == len(largest)
+    members = graph.members(found['cluster_id'])
+    assert {(link_graph.node_kinds.index(k), i) for k, i in zip(members['kind'], members['id'])} == largest
+
+
+def test_queries_after_more_links_see_them():
+    graph = link_graph.LinkGraph()
+    graph.add_logins([1, 2], [10, 11], [100, 100])
+    assert graph.cluster('party', 10)['parties'] == 2
+    graph.add_accounts([11, 12], [500, 500])
+    assert graph.cluster('device', 100) == graph.cluster('account', 500)
+    assert graph.cluster('account', 500)['parties'] == 3
+    assert graph.largest(1)['accounts'].tolist() == [1]
+    assert graph.cluster('account', 501) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    graph, _ = random_graph(seed=5, batches=2)
+    path = str(tmp_path / 'graph.npz')
+    graph.save(path)
+    loaded = link_graph.LinkGraph.load(path)
+    for name in ('kinds', 'ids', 'root'):
+        assert np.array_equal(getattr(loaded, name), getattr(graph, name))
+    assert loaded.last_login_id == graph.last_login_id == 299
+    assert loaded.largest(20).equals(graph.largest(20))
+    # A loaded graph keeps growing like the original
+    for g in (graph, loaded):
+        g.add_logins([300], [1], [499])
+    assert graph_components(loaded) == graph_components(graph)
+
+
+class FakeConnection:
+    """Stands in for MySQL, answering login and account link queries and keeping their SQL"""
+
+    unread_result = False
+
+    def __init__(self, logins, accounts):
+        self.logins, self.accounts = logins, accounts
+        self.statements = []
+
+    def cursor(self, buffered=None):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if 'login_instance_data' in sql:
+            self.description = [('login_id',), ('party_id',), ('device_id',)]
+            self.rows = [row for row in self.logins if row[0] > params[0]]
+        else:
+            self.description = [('party_id',), ('account_id',)]
+            self.rows = [row for row in self.accounts if 'WHERE' not in sql or row[0] in params]
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+def test_incremental_update_reads_only_the_written_parties_links():
+    connection = FakeConnection([(1, 10, 100), (2, 11, 101)], [(10, 500), (11, 501), (12, 500)])
+    graph = link_graph.update_from_database(connection)
+    assert graph.cluster('party', 10) == graph.cluster('party', 12)
+
+    connection.logins.append((3, 11, 100))
+    connection.accounts.append((12, 502))
+    connection.statements = []
+    link_graph.update_from_database(connection, graph, account_parties={12})
+    assert graph.cluster('party', 11) == graph.cluster('account', 502)
+    assert any('party_id IN (%s)' in sql for sql in connection.statements)
+
+    connection.statements = []
+    link_graph.update_from_database(connection, graph, account_parties=set())
+    assert not any('customer_account_data' in sql for sql in connection.statements)
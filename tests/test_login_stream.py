@@ -0,0 +1,167 @@
+import re
+import time
+import socket
+import threading
+import pandas as pd
+import bulk_loader
+import login_stream
+import migrations
+import schema
+
+
+def stream_alert(login_id, entity_id=7):
+    return {'rule': 'device_failures_7d', 'entity_type': 'device', 'entity_id': entity_id,
+            'login_id': login_id, 'event_time': 1_700_000_000, 'count': 11}
+
+
+class RecordingConnection:
+    """Stands in for a MySQL connection, keeping the statements it was sent"""
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statements.append(' '.join(sql.split()))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_stream_alerts_leave_ids_to_the_database():
+    connection = RecordingConnection()
+    writer = login_stream.AlertWriter(connection)
+    writer.flush([stream_alert(1), stream_alert(2)])
+    writer.flush([stream_alert(3)])
+    inserts = [sql for sql in connection.statements if sql.startswith('INSERT')]
+    assert len(inserts) == 2
+    assert all(f"INTO {login_stream.stream_alerts_table} " in sql for sql in inserts)
+    assert not any('alert_id' in sql for sql in inserts)
+    assert not any('MAX(' in sql for sql in connection.statements)
+    assert writer.written == 3
+
+
+def create_alert_tables(cursor):
+    """fraud_alert_data as in bank_fraud.sql plus the migrations login_stream depends on"""
+    with open(schema.schema_file, encoding='utf-8') as f:
+        ddl = re.search(r"CREATE TABLE `fraud_alert_data` \(.*?\n\) ENGINE[^;]*", f.read(), re.S).group(0)
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cursor.execute(f"DROP TABLE IF EXISTS fraud_alert_data, {login_stream.stream_alerts_table}")
+    cursor.execute(ddl)
+    for version, _, steps in migrations.migrations:
+        if version in (6, 7):
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+
+
+def test_streamed_alerts_survive_loads(mysql_connection, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_loader, 'state_file', str(tmp_path / 'state.json'))
+    cursor = mysql_connection.cursor()
+    create_alert_tables(cursor)
+
+    writer = login_stream.AlertWriter(mysql_connection)
+    writer.flush([stream_alert(1), stream_alert(2)])
+
+    csv_path = tmp_path / 'fraud_alert_data.csv'
+    pd.DataFrame({'alert_id': [1, 2, 3], 'transaction_id': [10, 11, 12], 'generated_by': 'model',
+                  'alert_level': 'high', 'status': 'open', 'created_at': '2024-05-01 10:00:00'}
+                 ).to_csv(csv_path, index=False)
+    assert bulk_loader.load_csv_incremental(str(csv_path), 'fraud_alert_data', mysql_connection, {}) == 3
+    writer.flush([stream_alert(3)])
+    assert bulk_loader.load_csv_streaming(str(csv_path), 'fraud_alert_data', mysql_connection,
+                                          load_data=False) == 3
+
+    cursor.execute(f"SELECT login_id FROM {login_stream.stream_alerts_table} ORDER BY alert_id")
+    assert [row[0] for row in cursor.fetchall()] == [1, 2, 3]
+    cursor.execute("SELECT alert_id, generated_by FROM fraud_alert_data ORDER BY alert_id")
+    assert cursor.fetchall() == [(1, 'model'), (2, 'model'), (3, 'model')]
+    cursor.execute(f"DROP TABLE fraud_alert_data, {login_stream.stream_alerts_table}")
+    cursor.close()
+
+
+class CollectingWriter(login_stream.AlertWriter):
+    """AlertWriter keeping what it writes and when, instead of inserting it"""
+
+    def __init__(self):
+        super().__init__(connection=object())
+        self.batches = []
+
+    def _insert(self, pending):
+        self.batches.append((time.monotonic(), list(pending)))
+
+
+def until(stop, events):
+    for event in events:
+        if stop.is_set():
+            return
+        yield event
+
+
+def run_in_background(events, writer):
+    stop = threading.Event()
+    detector = login_stream.LoginAnomalyDetector({})
+    thread = threading.Thread(target=login_stream.run, args=(until(stop, events), detector, writer), daemon=True)
+    thread.start()
+    return stop, thread
+
+
+def wait_for(condition, seconds=5.0):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+# Two locations for one party within the hour: raises party_distinct_locations_60m
+logins = "1,42,7,100,2024-05-01 10:00:00,1\n2,42,7,200,2024-05-01 10:05:00,1\n"
+
+
+def test_tailed_alerts_are_flushed_while_the_file_is_quiet(tmp_path, monkeypatch):
+    monkeypatch.setattr(login_stream, 'alert_flush_seconds', 0.2)
+    path = tmp_path / 'logins.csv'
+    path.write_text("login_id,party_id,device_id,location_id,timestamp,successful\n")
+    writer = CollectingWriter()
+    stop, thread = run_in_background(login_stream.tail_events(str(path), poll_seconds=0.05), writer)
+    time.sleep(0.2)
+    with open(path, 'a') as f:
+        f.write(logins)
+    written_at = time.monotonic()
+    # No further line is appended: only the idle flush can write the alert
+    assert wait_for(lambda: writer.batches)
+    flushed_at, alerts = writer.batches[0]
+    assert [alert['rule'] for alert in alerts] == ['party_distinct_locations_60m']
+    assert flushed_at - written_at < 1.0
+    stop.set()
+    thread.join(timeout=2)
+
+
+def test_socket_alerts_are_flushed_while_the_client_is_quiet(monkeypatch):
+    monkeypatch.setattr(login_stream, 'alert_flush_seconds', 0.2)
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    writer = CollectingWriter()
+    stop, thread = run_in_background(login_stream.socket_events('127.0.0.1', port, poll_seconds=0.05), writer)
+    client = None
+    for _ in range(50):
+        try:
+            client = socket.create_connection(('127.0.0.1', port))
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    # The client stays connected and silent after these two logins
+    client.sendall(logins.encode())
+    sent_at = time.monotonic()
+    assert wait_for(lambda: writer.batches)
+    assert writer.batches[0][0] - sent_at < 1.0
+    client.close()
+    stop.set()
+    thread.join(timeout=2)
@@ -0,0 +1,108 @@
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pytest
+import bulk_loader
+import partitions
+
+layout = [('p_missing', datetime(1970, 1, 2)), ('p202401', datetime(2024, 2, 1)),
+          ('p202402', datetime(2024, 3, 1)), ('p_future', None)]
+
+
+def pieces(chunk):
+    return {name: rows['login_id'].tolist() for name, rows in
+            partitions.split_by_partition(chunk, layout, 'timestamp')}
+
+
+def test_rows_follow_the_partition_bounds():
+    chunk = pd.DataFrame({'login_id': [1, 2, 3],
+                          'timestamp': ['2024-01-31 23:59:59', '2024-02-01 00:00:00', '2025-06-01 00:00:00']})
+    assert pieces(chunk) == {'p202401': [1], 'p202402': [2], 'p_future': [3]}
+
+
+@pytest.mark.parametrize('dtype', ['string', pd.ArrowDtype(pa.timestamp('us'))])
+def test_null_timestamp_goes_to_the_missing_partition_as_the_sentinel(dtype):
+    timestamps = pd.Series(['2024-02-10 08:00:00', None], dtype='string')
+    if dtype != 'string':
+        timestamps = pd.to_datetime(timestamps).astype(dtype)
+    chunk = pd.DataFrame({'login_id': [1, 2], 'timestamp': timestamps})
+    split = dict(partitions.split_by_partition(chunk, layout, 'timestamp'))
+    assert set(split) == {'p_missing', 'p202402'}
+    assert split['p_missing']['login_id'].tolist() == [2]
+    assert pd.Timestamp(split['p_missing']['timestamp'].iloc[0]) == pd.Timestamp(partitions.missing_timestamp)
+
+
+def test_malformed_timestamp_is_rejected():
+    chunk = pd.DataFrame({'login_id': [1, 2], 'timestamp': ['2024-02-10 08:00:00', '16:45.0']})
+    with pytest.raises(ValueError, match='16:45.0'):
+        partitions.split_by_partition(chunk, layout, 'timestamp')
+
+
+class FakeConnection:
+    """Stands in for a MySQL connection: answers the partition layout query and
+    the given SELECTs, and keeps every statement it was sent"""
+
+    def __init__(self, layout, answers=None):
+        self.layout = layout
+        self.answers = answers or {}
+        self.statements = []
+        self.rows = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.statements.append((sql, list(params or [])))
+        if 'information_schema.PARTITIONS' in sql:
+            self.rows = [(name, 'MAXVALUE' if bound is None else f"'{bound:%Y-%m-%d %H:%M:%S}'")
+                         for name, bound in self.layout]
+        else:
+            self.rows = next((rows for prefix, rows in self.answers.items() if sql.startswith(prefix)), [])
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_expiry_keeps_the_missing_partition_and_trims_the_rollups():
+    connection = FakeConnection(layout)
+    expired = partitions.expire_partitions(connection, 'login_instance_data', keep_months=0, archive=False)
+    assert expired == ['p202401', 'p202402']
+    statements = [sql for sql, _ in connection.statements]
+    assert 'ALTER TABLE login_instance_data DROP PARTITION p_missing' not in statements
+    trims = [(sql, params) for sql, params in connection.statements if sql.startswith('DELETE FROM login_hourly')]
+    assert len(trims) == 3
+    assert all(params == [datetime(1970, 1, 2), datetime(2024, 3, 1)] for _, params in trims)
+
+
+def test_expired_transactions_refresh_their_parties():
+    connection = FakeConnection(layout, {'SELECT payer_party_id': [(1, 2), (2, None)]})
+    partitions.expire_partitions(connection, 'transaction_data', keep_months=0, archive=False)
+    refreshed = [params for sql, params in connection.statements if sql.startswith('DELETE FROM party_alert_summary')]
+    assert refreshed == [[1, 2]]
+
+
+def test_missing_partition_is_split_off_an_existing_layout():
+    connection = FakeConnection(layout[1:])
+    assert partitions.add_missing_partition(connection, 'login_instance_data')
+    sql = connection.statements[-1][0]
+    assert "REORGANIZE PARTITION p202401 INTO ( PARTITION p_missing VALUES LESS THAN ('1970-01-02')," in sql
+    assert "PARTITION p202401 VALUES LESS THAN ('2024-02-01 00:00:00') )" in sql
+    assert not partitions.add_missing_partition(FakeConnection(layout), 'login_instance_data')
+
+
+def test_upsert_replaces_a_row_whose_timestamp_changed():
+    connection = FakeConnection(layout, {'SELECT timestamp': [('2024-01-05 10:00:00',)]})
+    chunk = pd.DataFrame({'login_id': [1, 2], 'timestamp': ['2024-02-10 08:00:00', '2024-02-11 09:00:00']})
+    moved = bulk_loader.delete_moved_rows(connection, 'login_instance_data', chunk, ['login_id'], 'timestamp')
+    assert moved == ['2024-01-05 10:00:00']
+    sql, params = connection.statements[-1]
+    assert sql.startswith('DELETE FROM login_instance_data WHERE (login_id) IN ((%s), (%s)) '
+                          'AND (login_id, timestamp) NOT IN ((%s, %s), (%s, %s))')
+    assert params == [1, 2, 1, '2024-02-10 08:00:00', 2, '2024-02-11 09:00:00']
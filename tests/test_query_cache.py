@@ -0,0 +1,26 @@
+import pandas as pd
+from query_cache import QueryCache
+
+result = pd.DataFrame({'party_id': [1, 2]})
+
+
+def test_result_read_before_a_reload_is_not_stored():
+    cache = QueryCache()
+    cache.set_version(1)
+    key = QueryCache.key("SELECT party_id FROM party_table")
+    version = cache.version
+    # A load finishes while the query runs
+    cache.set_version(2)
+    cache.put(key, result, version)
+    assert cache.get(key) is None
+
+
+def test_entries_of_another_version_are_not_served():
+    cache = QueryCache()
+    cache.set_version(1)
+    key = QueryCache.key("SELECT party_id FROM party_table")
+    cache.put(key, result, cache.version)
+    assert cache.get(key) is result
+    cache._version = 2
+    assert cache.get(key) is None
+    assert cache.stats()['entries'] == 0
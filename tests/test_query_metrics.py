@@ -0,0 +1,12 @@
+import query_metrics
+
+
+def test_log_is_rotated_by_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_metrics, 'log_max_mb', 1 / 1024)   # 1 KB
+    monkeypatch.setattr(query_metrics, 'log_backups', 2)
+    for i in range(200):
+        query_metrics.log_event({'event': 'query', 'query': 'Top Failed Logins', 'i': i}, str(tmp_path))
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert names == ['performance.jsonl', 'performance.jsonl.1', 'performance.jsonl.2']
+    assert all(path.stat().st_size < 1024 + 200 for path in tmp_path.iterdir())
+    assert '"i": 199' in (tmp_path / 'performance.jsonl').read_text()
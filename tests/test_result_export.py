@@ -0,0 +1,88 @@
+from datetime import datetime
+from decimal import Decimal
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from mysql.connector import FieldType
+import query_backends
+import result_export
+
+
+def column(name, type_code):
+    return (name, type_code, None, None, None, None, 1, 0, 45)
+
+
+class FakeConnection:
+    """Stands in for a MySQL connection returning a fixed result"""
+
+    unread_result = False
+
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = list(rows)
+
+    def cursor(self, buffered=None):
+        return self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+description = [column('party_id', FieldType.LONG), column('note', FieldType.VAR_STRING),
+               column('total', FieldType.NEWDECIMAL), column('last_seen', FieldType.DATETIME)]
+
+
+def test_parquet_types_come_from_the_column_metadata(tmp_path):
+    # The first chunk is NULL throughout but the party_id column
+    rows = [(1, None, None, None), (2, None, None, None),
+            (3, 'late', Decimal('12.50'), datetime(2024, 5, 1, 10)), (4, 'x', Decimal('123456789.05'), None)]
+    path = tmp_path / 'out.parquet'
+    assert result_export.export_query(FakeConnection(description, rows), 'SELECT', str(path), 'parquet',
+                                      chunk_rows=2) == 4
+    table = pq.read_table(path)
+    assert table.schema.field('party_id').type == pa.int32()
+    assert table.schema.field('note').type == pa.string()
+    assert table.schema.field('total').type == pa.decimal128(38, result_export.default_decimal_scale)
+    assert table.schema.field('last_seen').type == pa.timestamp('us')
+    assert table.column('total').to_pylist()[2:] == [Decimal('12.50'), Decimal('123456789.05')]
+
+
+def test_decimal_scale_is_fixed_by_the_first_value(tmp_path):
+    rows = [(1, 'a', Decimal('1.50'), None), (2, 'b', Decimal('99999.25'), None)]
+    path = tmp_path / 'out.parquet'
+    result_export.export_query(FakeConnection(description, rows), 'SELECT', str(path), 'parquet', chunk_rows=1)
+    assert pq.read_table(path).schema.field('total').type == pa.decimal128(38, 2)
+
+
+def test_empty_result_still_writes_the_schema(tmp_path):
+    path = tmp_path / 'out.parquet'
+    assert result_export.export_query(FakeConnection(description, []), 'SELECT', str(path), 'parquet') == 0
+    assert pq.read_table(path).schema.names == ['party_id', 'note', 'total', 'last_seen']
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_connection(self, timeout=None):
+        return self.connection
+
+    def release(self, connection):
+        pass
+
+
+def test_export_errors_become_query_errors(tmp_path):
+    # A value of a finer scale than the first one does not fit the column
+    rows = [(1, 'a', Decimal('1.5'), None), (2, 'b', Decimal('1.25'), None)]
+    backend = query_backends.MySQLBackend(FakePool(FakeConnection(description, rows)))
+    with pytest.raises(query_backends.QueryError, match="Export failed"):
+        backend.export('SELECT', str(tmp_path / 'out.parquet'), 'parquet')
+    with pytest.raises(query_backends.QueryError, match="Export failed"):
+        backend.export('SELECT', str(tmp_path / 'missing' / 'out.csv'), 'csv')
@@ -0,0 +1,39 @@
+import pandas as pd
+from mysql.connector import errors
+import fraud_queries
+import query_backends
+
+tables = {
+    'customer_account_data': pd.DataFrame({'party_id': [1, 1, 2, 3], 'account_id': [10, 11, 20, 30],
+                                           'role': 'owner'}),
+    # Party 1 pays party 2 twice and itself once; party 3 has a closed alert only
+    'transaction_data': pd.DataFrame({'transaction_id': [100, 101, 102, 103], 'payer_party_id': [1, 1, 1, 3],
+                                      'payee_party_id': [2, 2, 1, 2], 'amount': 5.0, 'currency': 'USD',
+                                      'timestamp': '2024-05-01 10:00:00', 'is_fraud': 1, 'fraud_score': 0.5}),
+    'fraud_alert_data': pd.DataFrame({'alert_id': [1, 2, 3, 4], 'transaction_id': [100, 101, 102, 103],
+                                      'generated_by': 'model', 'alert_level': 'high',
+                                      'status': ['open', 'active', 'open', 'closed'],
+                                      'created_at': '2024-05-01 10:00:00'}),
+    'login_instance_data': pd.DataFrame(columns=['login_id', 'party_id', 'device_id', 'location_id',
+                                                 'timestamp', 'successful']),
+}
+
+
+def test_alerts_count_once_per_account_like_the_original_join(tmp_path):
+    for table_name, df in tables.items():
+        df.to_csv(tmp_path / f"{table_name}.csv", index=False)
+    backend = query_backends.DuckDBBackend(str(tmp_path))
+    sql_query, params = fraud_queries.bind("Multiple Alerts per Party", {'min_alerts': 0})
+    result = backend.run(sql_query, params)
+    counts = dict(zip(result['party_id'].astype(int), result['fraud_alert_count'].astype(int)))
+    # Party 1: three open alerts (one as payer and payee) times two accounts
+    assert counts == {1: 6, 2: 2}
+    accounts = dict(zip(result['party_id'].astype(int), result['associated_accounts'].astype(str)))
+    assert accounts[1] == '10,11'
+
+
+def test_missing_summary_table_asks_for_migrations():
+    e = errors.ProgrammingError(msg="Table 'fraud_detection.party_alert_summary' doesn't exist", errno=1146)
+    assert 'run migrations.py' in str(query_backends.mysql_query_error(e, "Query failed"))
+    e = errors.ProgrammingError(msg="Table 'fraud_detection.party_table' doesn't exist", errno=1146)
+    assert str(query_backends.mysql_query_error(e, "Query failed")).startswith("Query failed")
@@ -0,0 +1,77 @@
+import numpy as np
+import transaction_scoring
+
+
+def transactions(rows):
+    """Arrays of (transaction_id, payer, payee, amount, currency, timestamp) rows"""
+    columns = list(zip(*rows))
+    arrays = {name: np.array(values, dtype=np.int64)
+              for name, values in zip(['transaction_id', 'payer_party_id', 'payee_party_id'], columns)}
+    arrays['amount'] = np.array(columns[3], dtype=np.float64)
+    arrays['currency'] = np.array(columns[4], dtype=object)
+    arrays['timestamp'] = np.array(columns[5], dtype=np.int64)
+    return arrays
+
+
+def failed_logins(rows=()):
+    return {'party_id': np.array([party for party, _ in rows], dtype=np.int64),
+            'timestamp': np.array([ts for _, ts in rows], dtype=np.int64)}
+
+
+# Payer 1: five transactions, two of them in the same second; payer 2: one
+rows = [
+    (4, 1, 8, 40.0, 'EUR', 3000),
+    (1, 1, 7, 10.0, 'USD', 0),
+    (6, 1, 7, 25.0, 'EUR', 80000),
+    (3, 1, 7, 20.0, 'USD', 3000),
+    (5, 2, 7, 99.0, 'GBP', 50),
+    (2, 1, 7, 10.0, 'USD', 100),
+]
+
+
+def by_id(values, arrays):
+    return dict(zip(arrays['transaction_id'].tolist(), np.asarray(values).tolist()))
+
+
+def test_velocity_counts_earlier_transactions_of_the_payer_only():
+    arrays = transactions(rows)
+    features = transaction_scoring.compute_features(arrays, failed_logins())
+    # 3 and 4 share a second: 4 sees 3, but 3 does not see 4
+    assert by_id(features['velocity_1h'], arrays) == {1: 0, 2: 1, 3: 2, 4: 3, 5: 0, 6: 0}
+    assert by_id(features['velocity_24h'], arrays) == {1: 0, 2: 1, 3: 2, 4: 3, 5: 0, 6: 4}
+
+
+def test_amount_zscore_needs_two_earlier_amounts():
+    arrays = transactions(rows)
+    zscore = by_id(transaction_scoring.compute_features(arrays, failed_logins())['amount_zscore'], arrays)
+    assert zscore[1] == zscore[2] == zscore[5] == 0.0
+    # Earlier amounts 10, 10: no spread, no score
+    assert zscore[3] == 0.0
+    # Earlier amounts 10, 10, 20: mean 40/3, population std sqrt(200)/3
+    assert np.isclose(zscore[4], (40 - 40 / 3) / (np.sqrt(200) / 3))
+
+
+def test_new_payee_and_currency_switch_flags():
+    arrays = transactions(rows)
+    features = transaction_scoring.compute_features(arrays, failed_logins())
+    # The payer's first transaction is never flagged, whatever the previous payer did
+    assert by_id(features['new_payee'], arrays) == {1: False, 2: False, 3: False, 4: True, 5: False, 6: False}
+    assert by_id(features['currency_switch'], arrays) == {1: False, 2: False, 3: False, 4: True, 5: False,
+                                                           6: False}
+
+
+def test_failed_logins_count_the_payers_window():
+    arrays = transactions(rows)
+    logins = failed_logins([(1, 2900), (1, -90000), (2, 2900), (1, 3000)])
+    features = transaction_scoring.compute_features(arrays, logins)
+    assert by_id(features['failed_logins_24h'], arrays) == {1: 0, 2: 0, 3: 2, 4: 2, 5: 0, 6: 2}
+
+
+def test_scoring_after_an_id_keeps_the_payers_history():
+    arrays = transactions(rows)
+    logins = failed_logins([(1, 2900)])
+    all_ids, all_scores = transaction_scoring.score_transactions(arrays, logins)
+    assert all_ids.tolist() == [1, 2, 3, 4, 5, 6]
+    ids, scores = transaction_scoring.score_transactions(arrays, logins, after_id=3)
+    assert ids.tolist() == [4, 5, 6]
+    assert np.array_equal(scores, all_scores[3:])
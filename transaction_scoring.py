@@ -0,0 +1,354 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+
+# -------------------
+# Scoring settings
+# -------------------
+# Trailing windows (seconds) for the payer velocity features
+velocity_windows = {
+    'velocity_1h': 3600,
+    'velocity_24h': 24 * 3600,
+}
+failed_login_window = 24 * 3600     # failed logins of the payer counted before each transaction
+
+# Hand-set weights of the logistic score; features are capped so one cannot dominate
+score_weights = {
+    'velocity_1h': 0.6,
+    'velocity_24h': 0.15,
+    'amount_zscore': 0.5,
+    'new_payee': 0.8,
+    'currency_switch': 0.7,
+    'failed_logins_24h': 0.4,
+}
+score_bias = -4.0
+feature_caps = {
+    'velocity_1h': 10,
+    'velocity_24h': 20,
+    'amount_zscore': 6,
+    'failed_logins_24h': 10,
+}
+
+write_chunk_rows = 100_000      # scores written per staging load + UPDATE
+read_chunk_rows = 500_000
+
+score_log_table = 'score_log'
+score_log_ddl = f"""
+    CREATE TABLE IF NOT EXISTS {score_log_table} (
+        run_id BIGINT NOT NULL AUTO_INCREMENT,
+        score_mode VARCHAR(16) NOT NULL,
+        after_transaction_id INT DEFAULT NULL,
+        max_transaction_id INT DEFAULT NULL,
+        rows_scored BIGINT NOT NULL,
+        finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id)
+    )
+"""
+
+staging_table = 'transaction_score_staging'
+staging_ddl = f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} (
+        transaction_id INT NOT NULL,
+        fraud_score FLOAT NOT NULL,
+        PRIMARY KEY (transaction_id)
+    )
+"""
+
+# -------------------
+# Reading the inputs as arrays
+# -------------------
+transaction_columns = ['transaction_id', 'payer_party_id', 'payee_party_id', 'amount', 'currency', 'timestamp']
+
+def frame_to_arrays(df):
+    """Transaction or login columns as NumPy arrays; ids become int64 (-1 when missing), times epoch seconds"""
+    arrays = {}
+    for column in df.columns:
+        values = df[column]
+        if column == 'timestamp':
+            # Parquet and MySQL give timestamps already; parsing those again goes row by row
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, errors='coerce', format='ISO8601')
+            arrays[column] = values.to_numpy(dtype='datetime64[s]', na_value=np.datetime64('NaT')).astype(np.int64)
+        elif column == 'amount':
+            arrays[column] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        elif column == 'currency':
+            arrays[column] = values.astype('string').fillna('').to_numpy(dtype=object)
+        else:
+            arrays[column] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.int64, na_value=-1)
+    return arrays
+
+def concat_arrays(parts, columns):
+    if not parts:
+        return {column: np.empty(0, dtype=object if column == 'currency' else np.int64) for column in columns}
+    return {column: np.concatenate([part[column] for part in parts]) for column in columns}
+
+def read_files(data_dir, file_format='auto', after_id=None):
+    """Transactions and failed logins from the generated CSV/Parquet files.
+
+    With after_id, only payers of transactions past it are read (with their whole history).
+    """
+    from bulk_loader import read_chunks, resolve_data_file
+    transactions = concat_arrays([
+        frame_to_arrays(chunk[transaction_columns]) for chunk in read_chunks(
+            resolve_data_file(os.path.join(data_dir, 'transaction_data.csv'), file_format),
+            'transaction_data', read_chunk_rows)], transaction_columns)
+    if after_id is not None:
+        payers = np.unique(transactions['payer_party_id'][transactions['transaction_id'] > after_id])
+        keep = np.isin(transactions['payer_party_id'], payers)
+        transactions = {column: values[keep] for column, values in transactions.items()}
+    parts = []
+    for chunk in read_chunks(resolve_data_file(os.path.join(data_dir, 'login_instance_data.csv'), file_format),
+                             'login_instance_data', read_chunk_rows):
+        failed = chunk[~chunk['successful'].fillna(True).astype(bool)]
+        parts.append(frame_to_arrays(failed[['party_id', 'timestamp']]))
+    return transactions, concat_arrays(parts, ['party_id', 'timestamp'])
+
+def read_database(connection, after_id=None):
+    """Transactions and failed logins from MySQL, streamed in chunks.
+
+    With after_id, only payers of transactions past it are read (with their whole history).
+    """
+    from result_export import iter_result_chunks
+    payer_filter = ''
+    params = ()
+    if after_id is not None:
+        payer_filter = ("WHERE payer_party_id IN (SELECT payer_party_id FROM transaction_data "
+                        "WHERE transaction_id > %s)")
+        params = (after_id,)
+    transactions = concat_arrays([
+        frame_to_arrays(chunk) for chunk in iter_result_chunks(
+            connection, f"SELECT {', '.join(transaction_columns)} FROM transaction_data {payer_filter}",
+            params, read_chunk_rows)], transaction_columns)
+    party_filter = payer_filter.replace('WHERE payer_party_id', 'AND party_id')
+    logins = concat_arrays([
+        frame_to_arrays(chunk) for chunk in iter_result_chunks(
+            connection, f"SELECT party_id, timestamp FROM login_instance_data WHERE successful = FALSE {party_filter}",
+            params, read_chunk_rows)], ['party_id', 'timestamp'])
+    return transactions, logins
+
+# -------------------
+# Features
+# -------------------
+def trailing_counts(keys, window, points):
+    """Number of keys in (point - window, point] for each point (keys sorted).
+
+    Keys are group * span + time, so a window never reaches into another group.
+    """
+    return np.searchsorted(keys, points, side='right') - np.searchsorted(keys, points - window, side='right')
+
+def compute_features(transactions, failed_logins):
+    """Per-transaction features, in the order of the input arrays.
+
+    Transactions are sorted by payer then time once; every feature is then a
+    vectorized pass over that order (searchsorted for windows, cumulative
+    sums for the payer's history, shifted comparisons for changes).
+    """
+    payer = transactions['payer_party_id']
+    ts = transactions['timestamp']
+    n = len(payer)
+    if n == 0:
+        return {name: np.zeros(0) for name in score_weights}
+    order = np.lexsort((transactions['transaction_id'], ts, payer))
+    payer_codes, sorted_codes = np.unique(payer[order], return_inverse=True)
+    sorted_ts = ts[order]
+    amount = transactions['amount'][order]
+
+    widest = max(max(velocity_windows.values()), failed_login_window)
+    origin = sorted_ts.min() - widest
+    span = sorted_ts.max() - origin + widest + 1
+    keys = sorted_codes * span + (sorted_ts - origin)
+
+    first = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    prior = np.arange(n) - group_start
+
+    features = {}
+    position = np.arange(n)
+    for name, window in velocity_windows.items():
+        # Earlier transactions of the payer in the window; a transaction in the same
+        # second only counts when its transaction_id is lower (the sort order)
+        features[name] = position - np.searchsorted(keys, keys - window, side='right')
+
+    # Amount against the mean and standard deviation of the payer's earlier amounts
+    # (centred first, so the running sums of squares keep their precision)
+    filled = np.nan_to_num(amount - np.nanmean(amount))
+    sums = np.r_[0.0, np.cumsum(filled)]
+    squares = np.r_[0.0, np.cumsum(filled * filled)]
+    prior_sum = sums[:-1] - sums[group_start]
+    prior_squares = squares[:-1] - squares[group_start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = prior_sum / prior
+        std = np.sqrt(np.maximum(prior_squares / prior - mean * mean, 0))
+        zscore = (filled - mean) / std
+    features['amount_zscore'] = np.where((prior >= 2) & (std > 0) & ~np.isnan(amount), zscore, 0.0)
+
+    # First payment to this payee, by a payer that has paid someone before
+    payee = transactions['payee_party_id'][order]
+    pair = sorted_codes * (payee.max() + 2) + (payee + 1)
+    seen_first = np.zeros(n, dtype=bool)
+    seen_first[np.unique(pair, return_index=True)[1]] = True
+    features['new_payee'] = seen_first & (prior > 0) & (payee >= 0)
+
+    currency = transactions['currency'][order]
+    switch = np.zeros(n, dtype=bool)
+    switch[1:] = (currency[1:] != currency[:-1]) & ~first[1:]
+    features['currency_switch'] = switch
+
+    # Failed logins of the payer in the window before the transaction
+    login_party = failed_logins['party_id']
+    login_ts = failed_logins['timestamp']
+    positions = np.minimum(np.searchsorted(payer_codes, login_party), len(payer_codes) - 1)
+    # Logins outside the transactions' time range would fall into a neighbouring payer's keys
+    keep = (payer_codes[positions] == login_party) & (login_ts >= origin) & (login_ts <= sorted_ts.max())
+    login_keys = np.sort(positions[keep] * span + (login_ts[keep] - origin))
+    features['failed_logins_24h'] = trailing_counts(login_keys, failed_login_window, keys)
+
+    # Back to input order
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = np.arange(n)
+    return {name: values[inverse] for name, values in features.items()}
+
+def score(features):
+    """Logistic combination of the capped features, scaled to 0-100 like the generated fraud_score"""
+    logit = np.full(len(next(iter(features.values()))), score_bias)
+    for name, weight in score_weights.items():
+        values = features[name].astype(np.float64)
+        cap = feature_caps.get(name)
+        if cap is not None:
+            values = np.clip(values, 0, cap)
+        logit += weight * values
+    return np.round(100 / (1 + np.exp(-logit)), 2)
+
+def score_transactions(transactions, failed_logins, after_id=None):
+    """(transaction ids, scores) of the transactions past after_id (all by default).
+
+    Transactions without a payer or timestamp are left unscored.
+    """
+    valid = (transactions['payer_party_id'] >= 0) & (transactions['timestamp'] != np.iinfo(np.int64).min)
+    transactions = {column: values[valid] for column, values in transactions.items()}
+    valid_logins = failed_logins['timestamp'] != np.iinfo(np.int64).min
+    failed_logins = {column: values[valid_logins] for column, values in failed_logins.items()}
+    scores = score(compute_features(transactions, failed_logins))
+    ids = transactions['transaction_id']
+    if after_id is not None:
+        target = ids > after_id
+        ids, scores = ids[target], scores[target]
+    order = np.argsort(ids)
+    return ids[order], scores[order]
+
+# -------------------
+# Writing scores
+# -------------------
+def last_scored_id(connection):
+    """Highest transaction id scored by an earlier run, None when there was none"""
+    cursor = connection.cursor()
+    cursor.execute(score_log_ddl)
+    cursor.execute(f"SELECT MAX(max_transaction_id) FROM {score_log_table}")
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0]
+
+def write_scores(connection, ids, scores, chunk_rows=None):
+    """Bulk-update transaction_data.fraud_score: each chunk is loaded into a
+    temporary staging table and applied with one UPDATE ... JOIN"""
+    from bulk_loader import insert_rows
+    chunk_rows = chunk_rows or write_chunk_rows
+    cursor = connection.cursor()
+    cursor.execute(staging_ddl)
+    start = time.perf_counter()
+    for i in range(0, len(ids), chunk_rows):
+        chunk = pd.DataFrame({'transaction_id': ids[i:i + chunk_rows], 'fraud_score': scores[i:i + chunk_rows]})
+        cursor.execute(f"DELETE FROM {staging_table}")
+        insert_rows(cursor, staging_table, chunk)
+        cursor.execute(f"UPDATE transaction_data td JOIN {staging_table} s ON td.transaction_id = s.transaction_id "
+                       f"SET td.fraud_score = s.fraud_score")
+        connection.commit()
+        done = min(i + chunk_rows, len(ids))
+        print(f"  {done:,} scores written ({done / max(time.perf_counter() - start, 1e-9):,.0f} rows/sec)")
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+    cursor.close()
+
+def record_scoring(connection, mode, after_id, ids):
+    from bulk_loader import record_load
+    cursor = connection.cursor()
+    cursor.execute(score_log_ddl)
+    cursor.execute(f"INSERT INTO {score_log_table} (score_mode, after_transaction_id, max_transaction_id, rows_scored) "
+                   f"VALUES (%s, %s, %s, %s)",
+                   (mode, after_id, int(ids.max()) if len(ids) else after_id, len(ids)))
+    connection.commit()
+    cursor.close()
+    # Cached dashboard results that show fraud_score are out of date
+    record_load(connection, 'transaction_data', 'score', len(ids))
+
+def write_scores_file(path, ids, scores):
+    df = pd.DataFrame({'transaction_id': ids, 'fraud_score': scores.astype(np.float32)})
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score transactions from payer behaviour and fill fraud_score")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only score transactions past the last scoring run (or --after-id)")
+    parser.add_argument('--after-id', type=int, help="only score transactions with a larger transaction_id")
+    parser.add_argument('--data-dir', help="read the generated CSV/Parquet files instead of MySQL")
+    parser.add_argument('--format', choices=['auto', 'csv', 'parquet'], default='auto')
+    parser.add_argument('--output', help="write transaction_id,fraud_score to this .csv/.parquet file "
+                                         "instead of updating transaction_data")
+    parser.add_argument('--secrets', help="MySQL connection from the [mysql] section of this secrets.toml")
+    args = parser.parse_args(argv)
+    if args.data_dir and not args.output:
+        parser.error("--data-dir needs --output, the files are not updated in place")
+    if args.incremental and args.data_dir and args.after_id is None:
+        parser.error("--incremental with --data-dir needs --after-id")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    connection = None
+    try:
+        if not args.data_dir:
+            from migrations import connect_args
+            connection = mysql.connector.connect(**connect_args(args.secrets))
+        after_id = args.after_id
+        if args.incremental and after_id is None:
+            after_id = last_scored_id(connection) or 0
+        start = time.perf_counter()
+        if args.data_dir:
+            transactions, failed_logins = read_files(args.data_dir, args.format, after_id)
+        else:
+            transactions, failed_logins = read_database(connection, after_id)
+        read_seconds = time.perf_counter() - start
+        print(f"Read {len(transactions['transaction_id']):,} transactions and "
+              f"{len(failed_logins['party_id']):,} failed logins in {read_seconds:.1f}s")
+
+        start = time.perf_counter()
+        ids, scores = score_transactions(transactions, failed_logins, after_id)
+        elapsed = time.perf_counter() - start
+        print(f"Scored {len(ids):,} transactions in {elapsed:.1f}s "
+              f"({len(ids) / max(elapsed, 1e-9) * 60:,.0f} per minute)")
+        if not len(ids):
+            return 0
+
+        if args.output:
+            write_scores_file(args.output, ids, scores)
+            print(f"Wrote scores to {args.output}")
+        else:
+            write_scores(connection, ids, scores)
+            record_scoring(connection, 'incremental' if after_id is not None else 'full', after_id, ids)
+        return 0
+    except Error as e:
+        print(f"Scoring failed: {e}")
+        return 1
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())